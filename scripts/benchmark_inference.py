@@ -0,0 +1,158 @@
+"""
+Smoke benchmark for local inference.
+
+Builds a tiny randomly initialised Llama model and word-level tokenizer in a temporary
+directory (no network access required), loads it through `Agent.from_model_id` with the
+detected hardware profile, and reports load time, throughput and the scaled max_new_tokens.
+
+Usage:
+    python scripts/benchmark_inference.py [--tokens 64] [--runs 3] [--quantization auto|int8|none] [--concurrency 4]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from atomonous import settings
+
+CHAT_TEMPLATE = (
+    "{% for message in messages %}"
+    "{{ message['role'] }}: "
+    "{% if message['content'] is string %}{{ message['content'] }}"
+    "{% else %}{% for part in message['content'] %}{{ part['text'] }}{% endfor %}{% endif %}\n"
+    "{% endfor %}"
+    "{% if add_generation_prompt %}assistant: {% endif %}"
+)
+
+
+def build_tiny_model(target_dir: Path, hidden_size: int = 64, num_layers: int = 2) -> Path:
+    """
+    Write a tiny random Llama checkpoint plus tokenizer to `target_dir`.
+    """
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    words = ["<unk>", "<pad>", "<s>", "</s>", "system", "user", "assistant", ":"]
+    words += [f"w{i}" for i in range(248)]
+    words += "count from one to one hundred hello thought code final answer the a of".split()
+    vocab = {w: i for i, w in enumerate(dict.fromkeys(words))}
+
+    tokenizer = Tokenizer(models.WordLevel(vocab=vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    hf_tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        unk_token="<unk>",
+        pad_token="<pad>",
+        bos_token="<s>",
+        eos_token="</s>",
+    )
+    hf_tokenizer.chat_template = CHAT_TEMPLATE
+    hf_tokenizer.save_pretrained(target_dir)
+
+    config = LlamaConfig(
+        vocab_size=len(vocab),
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 2,
+        num_hidden_layers=num_layers,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=2048,
+        pad_token_id=vocab["<pad>"],
+        bos_token_id=vocab["<s>"],
+        eos_token_id=vocab["</s>"],
+    )
+    LlamaForCausalLM(config).save_pretrained(target_dir)
+    return target_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Smoke benchmark for local inference profiles.")
+    parser.add_argument("--tokens", type=int, default=64, help="New tokens per timed generation.")
+    parser.add_argument("--runs", type=int, default=3, help="Number of timed generations.")
+    parser.add_argument("--prefix-tokens", type=int, default=1024, help="System prompt length for the prefix cache check.")
+    parser.add_argument("--quantization", default=settings.inference_quantization, choices=["auto", "int8", "none"])
+    parser.add_argument("--concurrency", type=int, default=4, help="Simultaneous model calls for the batching check.")
+    args = parser.parse_args()
+
+    from atomonous.agent.core import Agent
+    from atomonous.utils.hardware import measure_tokens_per_second
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.artifacts_dir = str(Path(tmp) / "artifacts")
+        settings.inference_quantization = args.quantization
+        model_dir = build_tiny_model(Path(tmp) / "tiny-llama")
+
+        start = time.perf_counter()
+        agent = Agent.from_model_id(model_id=str(model_dir), session_name="benchmark")
+        load_s = time.perf_counter() - start
+
+        profile = agent.hardware_profile
+        print("\n" + "=" * 60)
+        print("HARDWARE PROFILE")
+        print("=" * 60)
+        print(f"Device:            {profile.device} (device_map={profile.device_map})")
+        print(f"CPU capability:    {profile.cpu_capability or 'n/a'}")
+        print(f"Dtype:             {profile.torch_dtype}")
+        print(f"Quantization:      {profile.quantization or 'none'}")
+        print(f"Threads:           intra-op={profile.intra_op_threads}, inter-op={profile.inter_op_threads}")
+        print(f"RAM:               {profile.total_ram_gb:.1f} GB")
+        for note in profile.notes:
+            print(f"Note:              {note}")
+        print("-" * 60)
+        print(f"Load + probe time: {load_s:.2f} s")
+        print(f"Probe throughput:  {agent.tokens_per_second:.1f} tokens/s")
+        print(f"max_new_tokens:    {agent.gen_params['max_new_tokens']} (budget {settings.generation_time_budget_s:.0f} s)")
+
+        rates = [measure_tokens_per_second(agent.model, n_tokens=args.tokens) for _ in range(args.runs)]
+        print(f"Timed runs:        {', '.join(f'{r:.1f}' for r in rates)} tokens/s")
+        print(f"Mean:              {sum(rates) / len(rates):.1f} tokens/s")
+
+        prefix_cache = getattr(agent.model, "prefix_cache", None)
+        if prefix_cache is not None:
+            # Simulate agent steps: a long fixed system prompt followed by a growing history
+            system = " ".join(f"w{i % 248}" for i in range(args.prefix_tokens))
+            messages = [{"role": "system", "content": [{"type": "text", "text": system}]}]
+            latencies = []
+            for step in range(4):
+                messages.append({"role": "user", "content": [{"type": "text", "text": f"count w{step} w{step + 1}"}]})
+                start = time.perf_counter()
+                response = agent.model.generate(messages, max_new_tokens=1, do_sample=False)
+                latencies.append(time.perf_counter() - start)
+                messages.append({"role": "assistant", "content": [{"type": "text", "text": response.content or "the"}]})
+            stats = prefix_cache.stats()
+            print("-" * 60)
+            print(f"Prefix cache:      {stats['hits']} hits, {stats['misses']} misses")
+            print(f"Tokens reused:     {stats['reused_tokens']} (encoded {stats['encoded_tokens']})")
+            print(f"Step prefill:      {', '.join(f'{l * 1000:.0f}' for l in latencies)} ms")
+
+        batcher = getattr(agent.model, "batcher", None)
+        if batcher is not None and args.concurrency > 1:
+            # Simulate several sessions calling the shared model at once
+            messages = [{"role": "user", "content": [{"type": "text", "text": "count from one to one hundred"}]}]
+            before = batcher.stats()
+            threads = [
+                threading.Thread(target=agent.model.generate, args=(messages,), kwargs={"max_new_tokens": args.tokens, "do_sample": False})
+                for _ in range(args.concurrency)
+            ]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            stats = batcher.stats()
+            batches = stats["batches"] - before["batches"]
+            print("-" * 60)
+            print(f"Concurrent calls:  {args.concurrency} in {batches} batch(es), {elapsed:.2f} s")
+            print(f"Batch throughput:  {args.concurrency * args.tokens / elapsed:.1f} tokens/s")
+        print("=" * 60 + "\n")
+
+
+if __name__ == "__main__":
+    main()
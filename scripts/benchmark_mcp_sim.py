@@ -0,0 +1,97 @@
+"""
+End-to-end MCP throughput benchmark against the local microscope simulator.
+
+Starts the simulator as a stdio subprocess, connects an ExtendedMCPClient to it as an agent
+would, and acquires images with a fixed number of calls in flight. Each payload is decoded
+with MCPJsonConverter, so the numbers cover transport, JSON and base64 decoding. Reports
+throughput, per-call latency and how many calls the injected faults broke.
+
+Usage:
+    python scripts/benchmark_mcp_sim.py [--calls 50] [--concurrency 4] [--size 1024] [--dtype uint16]
+                                        [--latency-mean 0.05] [--failure-rate 0.0]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from atomonous import ExtendedMCPClient
+from atomonous.data.default_converters.mcp_converter import MCPJsonConverter
+from atomonous.sim import sim_server_parameters
+
+
+async def run_benchmark(client: ExtendedMCPClient, n_calls: int, concurrency: int, size: int) -> None:
+    converter = MCPJsonConverter()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, decode_times, payload_bytes, errors = [], [], 0, 0
+
+    async def acquire():
+        nonlocal payload_bytes, errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await client.acall_tool("get_scanned_image", {"size": size})
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+        if result.isError:
+            errors += 1
+            return
+        text = result.content[0].text
+        payload_bytes += len(text)
+        start = time.perf_counter()
+        converter.convert(text)
+        decode_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(acquire() for _ in range(n_calls)))
+    elapsed = time.perf_counter() - start
+
+    print(f"Calls:          {n_calls} ({concurrency} in flight, {size}x{size} images)")
+    print(f"Failed:         {errors}")
+    print(f"Wall time:      {elapsed:.2f} s")
+    print(f"Throughput:     {n_calls / elapsed:.1f} calls/s, {payload_bytes / elapsed / 1e6:.1f} MB/s of payload")
+    if latencies:
+        latencies.sort()
+        print(f"Call latency:   median {statistics.median(latencies) * 1000:.1f} ms, "
+              f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    if decode_times:
+        print(f"Decode:         median {statistics.median(decode_times) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50, help="Number of images to acquire")
+    parser.add_argument("--concurrency", type=int, default=4, help="Calls in flight at once")
+    parser.add_argument("--size", type=int, default=1024, help="Image edge length in pixels")
+    parser.add_argument("--dtype", default="uint16", help="Image dtype")
+    parser.add_argument("--latency", default="lognormal", help="Latency distribution of the simulator")
+    parser.add_argument("--latency-mean", type=float, default=0.05, help="Mean simulated latency in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability of an injected failure")
+    args = parser.parse_args()
+
+    # The simulator subprocess reads its sim_* settings from the environment
+    os.environ.update({
+        "MICROSCOPE_SIM_IMAGE_DTYPE": args.dtype,
+        "MICROSCOPE_SIM_LATENCY": args.latency,
+        "MICROSCOPE_SIM_LATENCY_MEAN_S": str(args.latency_mean),
+        "MICROSCOPE_SIM_FAILURE_RATE": str(args.failure_rate),
+    })
+
+    start = time.perf_counter()
+    client = ExtendedMCPClient(sim_server_parameters(), timeout=120)
+    print(f"Connected:      {time.perf_counter() - start:.2f} s")
+    try:
+        asyncio.run(run_benchmark(client, args.calls, args.concurrency, args.size))
+    finally:
+        client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Load test for the API server's worker pool and per-session queues.
+
+Serves the FastAPI app in-process with a fake model that sleeps instead of generating, creates
+several sessions sharing that model, fires concurrent /chat requests from all of them, and
+polls /health during the runs. Reports session creation time, per-request latency, how many
+requests were rejected with 429, and /health latency, which should stay in the millisecond
+range while runs are in progress.
+
+Usage:
+    python scripts/load_test_api.py [--sessions 4] [--requests 3] [--latency 0.5] [--workers 2]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from smolagents.models import ChatMessage, ChatMessageStreamDelta, MessageRole, Model
+from smolagents.monitoring import TokenUsage
+
+from atomonous import settings
+
+
+class FakeModel(Model):
+    """
+    Answers every query after a fixed delay, in one step.
+    """
+
+    def __init__(self, latency_s: float):
+        super().__init__(model_id="fake-model")
+        self.latency_s = latency_s
+
+    def generate(self, messages, stop_sequences=None, **kwargs):
+        time.sleep(self.latency_s)
+        content = "Thought: answering directly.\n<code>\nfinal_answer('done')\n</code>"
+        return ChatMessage(role=MessageRole.ASSISTANT, content=content, token_usage=TokenUsage(100, 20))
+
+    def generate_stream(self, messages, stop_sequences=None, **kwargs):
+        message = self.generate(messages, stop_sequences, **kwargs)
+        yield ChatMessageStreamDelta(content=message.content, token_usage=message.token_usage)
+
+
+async def _chat(client, session_id: str, query: str) -> tuple[int, float]:
+    start = time.perf_counter()
+    response = await client.post("/chat", json={"query": query, "session_id": session_id}, timeout=None)
+    return response.status_code, time.perf_counter() - start
+
+
+async def _poll_health(client, stop: asyncio.Event) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/health")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+    return latencies
+
+
+async def run_load_test(n_sessions: int, n_requests: int) -> None:
+    import httpx
+    from atomonous.api.server import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        session_ids, create_latencies = [], []
+        for _ in range(n_sessions):
+            start = time.perf_counter()
+            response = await client.post("/sessions", json={})
+            create_latencies.append(time.perf_counter() - start)
+            session_ids.append(response.json()["session_id"])
+
+        stop = asyncio.Event()
+        health = asyncio.create_task(_poll_health(client, stop))
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            _chat(client, session_id, f"query {r}")
+            for session_id in session_ids
+            for r in range(n_requests)
+        ))
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        health_latencies = await health
+
+    served = [latency for status, latency in results if status == 200]
+    rejected = sum(1 for status, _ in results if status == 429)
+    failed = len(results) - len(served) - rejected
+
+    print(f"Requests:        {len(results)} ({n_sessions} sessions x {n_requests})")
+    print(f"Served:          {len(served)}")
+    print(f"Rejected (429):  {rejected}")
+    print(f"Failed:          {failed}")
+    print(f"Wall time:       {elapsed:.2f} s")
+    print(f"Session create:  median {statistics.median(create_latencies) * 1000:.1f} ms, "
+          f"max {max(create_latencies) * 1000:.1f} ms")
+    if served:
+        print(f"Chat latency:    median {statistics.median(served):.2f} s, max {max(served):.2f} s")
+    if health_latencies:
+        print(f"/health latency: median {statistics.median(health_latencies) * 1000:.1f} ms, "
+              f"max {max(health_latencies) * 1000:.1f} ms over {len(health_latencies)} probes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=4, help="Number of concurrent sessions")
+    parser.add_argument("--requests", type=int, default=3, help="Requests sent by each session")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds the fake model takes per call")
+    parser.add_argument("--workers", type=int, default=2, help="Size of the server's worker pool")
+    parser.add_argument("--queue", type=int, default=4, help="Maximum waiting runs per session")
+    args = parser.parse_args()
+
+    settings.artifacts_dir = tempfile.mkdtemp(prefix="atomonous-loadtest-")
+    settings.agent_autorun = True
+    settings.api_max_workers = args.workers
+    settings.api_max_queue_per_session = args.queue
+
+    from atomonous.api import server
+
+    # One shared model for all sessions, as after POST /initialize
+    server.sessions.register_model("fake-model", FakeModel(args.latency))
+
+    asyncio.run(run_load_test(args.sessions, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Approval of dangerous tool calls.
+
+The SupervisedExecutor asks an ApprovalBroker before running code that calls a dangerous tool
+(e.g. `set_beam_current`). The agent thread blocks on the broker, never on stdin directly:
+
+- CLIApprovalBroker prompts on the terminal, as the executor always did.
+- QueueApprovalBroker holds requests as pending approvals that another thread or the API
+  server resolves. The agent thread waits on an event, and a request that is not answered
+  within the timeout is denied.
+
+One request covers every dangerous tool in a code action, so a single decision approves or
+denies the whole action. Pending requests can also be resolved in bulk, e.g. all pending
+`set_beam_current` calls of a session at once.
+"""
+
+import abc
+import asyncio
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+APPROVAL_STATUSES = ("pending", "approved", "denied", "expired", "cancelled")
+
+
+@dataclass
+class ApprovalRequest:
+    tools: list[str]
+    code: str
+    owner: Optional[str] = None
+    approval_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    created_at: float = field(default_factory=time.time)
+    timeout_s: Optional[float] = None
+    status: str = "pending"
+    reason: Optional[str] = None
+    decided_at: Optional[float] = None
+    _event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def approved(self) -> bool:
+        return self.status == "approved"
+
+    def info(self) -> dict[str, Any]:
+        return {
+            "approval_id": self.approval_id,
+            "owner": self.owner,
+            "tools": list(self.tools),
+            "code": self.code,
+            "status": self.status,
+            "reason": self.reason,
+            "created_at": self.created_at,
+            "expires_at": self.created_at + self.timeout_s if self.timeout_s else None,
+            "decided_at": self.decided_at,
+        }
+
+    def message(self) -> str:
+        """Observation returned to the agent when the action does not run."""
+        names = ", ".join(f"'{t}'" for t in self.tools)
+        if self.status == "expired":
+            return f"Execution aborted. Tool call {names} was not approved within {self.timeout_s:.0f}s."
+        if self.status == "cancelled":
+            return f"Execution aborted. The run was cancelled while tool call {names} awaited approval."
+        reason = f" Reason: {self.reason}" if self.reason else ""
+        return f"Execution aborted by user. Tool call {names} was not approved.{reason}"
+
+
+class ApprovalBroker(abc.ABC):
+    """
+    Decides whether a code action calling dangerous tools may run.
+    """
+
+    @abc.abstractmethod
+    def request(self, request: ApprovalRequest) -> ApprovalRequest:
+        """
+        Block until the request is decided and return it with its final status.
+        Called on the agent's executing thread.
+        """
+
+    def cancel(self, owner: Optional[str] = None) -> int:
+        """Deny the pending requests made by `owner`. Returns how many were cancelled."""
+        return 0
+
+
+class CLIApprovalBroker(ApprovalBroker):
+    """
+    Asks on the terminal. Without an interactive terminal (EOF), requests are denied.
+    """
+
+    def __init__(self, input_fn: Callable[[str], str] = input):
+        self.input_fn = input_fn
+
+    def request(self, request: ApprovalRequest) -> ApprovalRequest:
+        names = ", ".join(f"'{t}'" for t in request.tools)
+        print(f"The agent is trying to call: {names}")
+        while True:
+            try:
+                response = self.input_fn(f"Approve tool call {names}? (y/n): ").strip().lower()
+            except EOFError:
+                # Non-interactive environment: fail closed.
+                print("No interactive input available. Denying execution by default.")
+                response = "n"
+
+            if response in ["y", "yes", "n", "no"]:
+                request.status = "approved" if response in ["y", "yes"] else "denied"
+                request.decided_at = time.time()
+                return request
+            print("Invalid input. Please enter 'y' or 'n'.")
+
+
+class QueueApprovalBroker(ApprovalBroker):
+    """
+    Keeps requests pending until `resolve` is called from another thread, or the timeout passes.
+
+    Args:
+        timeout_s: Seconds a request waits for a decision before it is denied as expired.
+        history_size: Number of decided requests kept for listing.
+    """
+
+    def __init__(self, timeout_s: float = 300.0, history_size: int = 256):
+        self.timeout_s = timeout_s
+        self.history_size = history_size
+        self._requests: dict[str, ApprovalRequest] = {}
+        self._lock = threading.Lock()
+        self._subscribers: list = []
+
+    def request(self, request: ApprovalRequest) -> ApprovalRequest:
+        request.timeout_s = self.timeout_s
+        with self._lock:
+            self._requests[request.approval_id] = request
+        self._publish("approval_requested", request)
+
+        if not request._event.wait(self.timeout_s):
+            self._decide(request, "expired", None)
+        return request
+
+    def _decide(self, request: ApprovalRequest, status: str, reason: Optional[str]) -> bool:
+        with self._lock:
+            if request.status != "pending":
+                return False
+            request.status, request.reason, request.decided_at = status, reason, time.time()
+            self._trim()
+        request._event.set()
+        self._publish("approval_resolved", request)
+        return True
+
+    def _trim(self) -> None:
+        # Caller holds self._lock
+        decided = [r for r in self._requests.values() if r.status != "pending"]
+        for request in decided[: max(0, len(decided) - self.history_size)]:
+            del self._requests[request.approval_id]
+
+    def resolve(self, approval_id: str, approved: bool, reason: Optional[str] = None) -> ApprovalRequest:
+        """
+        Decide one pending request.
+
+        Raises:
+            KeyError: If the request is unknown.
+            ValueError: If it was already decided.
+        """
+        with self._lock:
+            request = self._requests[approval_id]
+        if not self._decide(request, "approved" if approved else "denied", reason):
+            raise ValueError(f"Approval '{approval_id}' is already {request.status}.")
+        return request
+
+    def resolve_many(
+        self,
+        approved: bool,
+        approval_ids: Optional[list[str]] = None,
+        tool: Optional[str] = None,
+        owner: Optional[str] = None,
+        reason: Optional[str] = None,
+    ) -> list[ApprovalRequest]:
+        """
+        Decide all pending requests matching every given filter, e.g. each pending
+        `set_beam_current` call of one session. Returns the requests decided.
+        """
+        decided = []
+        for request in self.pending(owner=owner):
+            if approval_ids is not None and request.approval_id not in approval_ids:
+                continue
+            if tool is not None and tool not in request.tools:
+                continue
+            if self._decide(request, "approved" if approved else "denied", reason):
+                decided.append(request)
+        return decided
+
+    def cancel(self, owner: Optional[str] = None) -> int:
+        return sum(self._decide(r, "cancelled", None) for r in self.pending() if r.owner == owner)
+
+    def get(self, approval_id: str) -> ApprovalRequest:
+        """
+        Raises:
+            KeyError: If the request is unknown.
+        """
+        with self._lock:
+            return self._requests[approval_id]
+
+    def pending(self, owner: Optional[str] = None) -> list[ApprovalRequest]:
+        with self._lock:
+            requests = list(self._requests.values())
+        return [r for r in requests if r.status == "pending" and (owner is None or r.owner == owner)]
+
+    def _publish(self, event_type: str, request: ApprovalRequest) -> None:
+        event = {"type": event_type, **request.info()}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                pass
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Queue of approval events for the calling event loop, starting with the currently pending requests.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            for request in self._requests.values():
+                if request.status == "pending":
+                    queue.put_nowait({"type": "approval_requested", **request.info()})
+            self._subscribers.append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers = [(l, q) for l, q in self._subscribers if q is not queue]
@@ -0,0 +1,310 @@
+"""
+In-process micro-batching for local transformers models.
+
+When several sessions share one local model, every `generate` call used to run its own
+forward passes. The BatchScheduler owns the model's generation loop instead: it collects the
+requests that arrive within a short window, left-pads them into one batch, runs a single
+`model.generate`, and streams each row's tokens back to its caller as they are produced.
+Rows stop independently on their own token limit, stop sequences or EOS.
+
+A batch of one still reuses the prompt-prefix KV cache, so a single session loses nothing.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Iterator, Optional
+
+import torch
+
+from atomonous.agent.prefix_cache import PrefixKVCache
+from atomonous.utils.metrics import registry
+
+BATCH_SIZE = registry.histogram(
+    "model_batch_size", "Requests decoded together per local model batch.", buckets=(1, 2, 3, 4, 6, 8, 12, 16)
+)
+
+# Marks the end of a request's token stream
+_DONE = object()
+
+
+class GenerationRequest:
+    """
+    Handle for one queued generation. Iterating it yields generated token ids as they arrive.
+    """
+
+    def __init__(
+        self,
+        input_ids: torch.Tensor,
+        max_new_tokens: int,
+        stop_sequences: Optional[list[str]],
+        generate_kwargs: dict[str, Any],
+        streamer: Any = None,
+    ):
+        self.input_ids = input_ids
+        self.max_new_tokens = max_new_tokens
+        self.stop_sequences = stop_sequences or []
+        self.generate_kwargs = generate_kwargs
+        self.streamer = streamer
+        self.tokens: list[int] = []
+        self.finished = False
+        self.cancelled = False
+        self.error: Optional[BaseException] = None
+        self.batch_size = 0
+        self._queue: queue.Queue = queue.Queue()
+
+    @property
+    def batch_key(self) -> str:
+        """Requests can share a batch only if their sampling parameters match."""
+        return repr(sorted(self.generate_kwargs.items()))
+
+    def cancel(self) -> None:
+        """Stop generating for this request; the rest of its batch continues."""
+        self.cancelled = True
+
+    def _push(self, token: int) -> None:
+        self.tokens.append(token)
+        self._queue.put(token)
+
+    def _close(self, error: Optional[BaseException] = None) -> None:
+        if not self.finished:
+            self.finished = True
+            self.error = error
+            self._queue.put(_DONE)
+
+    def __iter__(self) -> Iterator[int]:
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+
+    def result(self) -> list[int]:
+        """Block until generation finishes and return all generated token ids."""
+        for _ in self:
+            pass
+        return self.tokens
+
+
+class _BatchStreamer:
+    """
+    transformers streamer that fans each generation step out to the rows' requests.
+    The first `put` carries the prompts, every later one the next token of each row.
+    """
+
+    def __init__(self, requests: list[GenerationRequest], tokenizer: Any, eos_token_ids: set[int]):
+        self.requests = requests
+        self.tokenizer = tokenizer
+        self.eos_token_ids = eos_token_ids
+        self.row_done = [False] * len(requests)
+        self._prompt_seen = False
+
+    def put(self, value: torch.Tensor) -> None:
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            for request in self.requests:
+                if request.streamer is not None:
+                    request.streamer.put(request.input_ids.unsqueeze(0))
+            return
+        for row, token in enumerate(value.reshape(-1).tolist()):
+            if self.row_done[row]:
+                continue
+            request = self.requests[row]
+            if request.cancelled or token in self.eos_token_ids:
+                self.row_done[row] = True
+                continue
+            request._push(token)
+            if request.streamer is not None:
+                request.streamer.put(torch.tensor([token]))
+            if len(request.tokens) >= request.max_new_tokens or self._hit_stop(request):
+                self.row_done[row] = True
+
+    def _hit_stop(self, request: GenerationRequest) -> bool:
+        if not request.stop_sequences:
+            return False
+        longest = max(len(s) for s in request.stop_sequences)
+        # A stop string spans at most one token per character
+        tail = self.tokenizer.decode(request.tokens[-longest:], skip_special_tokens=True)
+        return any(stop in tail for stop in request.stop_sequences)
+
+    def end(self) -> None:
+        for request in self.requests:
+            if request.streamer is not None:
+                request.streamer.end()
+
+
+class _RowStoppingCriteria:
+    """Per-row stopping: a row is done once the streamer has closed it."""
+
+    def __init__(self, streamer: _BatchStreamer):
+        self.streamer = streamer
+
+    def __call__(self, input_ids: torch.Tensor, scores: Any, **kwargs: Any) -> torch.BoolTensor:
+        return torch.tensor(self.streamer.row_done, dtype=torch.bool, device=input_ids.device)
+
+
+class BatchScheduler:
+    """
+    Collects concurrent generation requests for one model and runs them as batches.
+
+    Args:
+        model: The transformers model whose `generate` is driven.
+        tokenizer: Tokenizer used for padding, EOS and stop-sequence checks.
+        max_batch_size: Maximum number of requests decoded together.
+        max_wait_s: How long the first request of a batch waits for others to join.
+        prefix_cache: Prompt-prefix KV cache reused for batches of one.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        tokenizer: Any,
+        max_batch_size: int = 4,
+        max_wait_s: float = 0.01,
+        prefix_cache: Optional[PrefixKVCache] = None,
+    ):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_s
+        self.prefix_cache = prefix_cache
+
+        pad_id = tokenizer.pad_token_id
+        if pad_id is None:
+            pad_id = tokenizer.eos_token_id
+        self.pad_token_id = pad_id if pad_id is not None else 0
+        eos = getattr(model.generation_config, "eos_token_id", None) or tokenizer.eos_token_id
+        self.eos_token_ids = set(eos if isinstance(eos, (list, tuple)) else [eos]) - {None}
+
+        self._pending: list[GenerationRequest] = []
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.batches = 0
+        self.batched_requests = 0
+        self.max_batch_seen = 0
+
+        self._worker = threading.Thread(target=self._loop, name="batch-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(
+        self,
+        input_ids: torch.Tensor,
+        max_new_tokens: int,
+        stop_sequences: Optional[list[str]] = None,
+        generate_kwargs: Optional[dict[str, Any]] = None,
+        streamer: Any = None,
+    ) -> GenerationRequest:
+        """
+        Queue a single prompt for generation.
+
+        Args:
+            input_ids: Prompt token ids, shape (seq,) or (1, seq).
+            max_new_tokens: Token limit for this request.
+            stop_sequences: Strings that end this request's generation.
+            generate_kwargs: Sampling parameters passed to `model.generate`.
+            streamer: Optional transformers-style streamer receiving this row's tokens.
+        """
+        if input_ids.dim() == 2:
+            input_ids = input_ids[0]
+        request = GenerationRequest(input_ids, max_new_tokens, stop_sequences, generate_kwargs or {}, streamer)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchScheduler is closed.")
+            self._pending.append(request)
+            self._cond.notify_all()
+        return request
+
+    def _next_batch(self) -> list[GenerationRequest]:
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return []
+            deadline = time.monotonic() + self.max_wait_s
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            key = self._pending[0].batch_key
+            batch = [r for r in self._pending if r.batch_key == key][: self.max_batch_size]
+            self._pending = [r for r in self._pending if r not in batch]
+            return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            try:
+                self._run(batch)
+            except BaseException as e:
+                for request in batch:
+                    request._close(e)
+            else:
+                for request in batch:
+                    request._close()
+
+    def _run(self, batch: list[GenerationRequest]) -> None:
+        self.batches += 1
+        self.batched_requests += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        BATCH_SIZE.observe(len(batch))
+        for request in batch:
+            request.batch_size = len(batch)
+
+        device = self.model.device
+        width = max(len(r.input_ids) for r in batch)
+        input_ids = torch.full((len(batch), width), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+        for row, request in enumerate(batch):
+            # Left padding keeps every row's next token at the same position
+            input_ids[row, width - len(request.input_ids):] = request.input_ids
+            attention_mask[row, width - len(request.input_ids):] = 1
+        input_ids, attention_mask = input_ids.to(device), attention_mask.to(device)
+
+        streamer = _BatchStreamer(batch, self.tokenizer, self.eos_token_ids)
+        from transformers import StoppingCriteriaList
+
+        kwargs = dict(batch[0].generate_kwargs)
+        cache = None
+        if len(batch) == 1 and self.prefix_cache is not None:
+            from transformers import DynamicCache
+
+            cache, _ = self.prefix_cache.take(input_ids)
+            kwargs["past_key_values"] = cache if cache is not None else DynamicCache()
+
+        self.model.generate(
+            inputs=input_ids,
+            attention_mask=attention_mask,
+            max_new_tokens=max(r.max_new_tokens for r in batch),
+            stopping_criteria=StoppingCriteriaList([_RowStoppingCriteria(streamer)]),
+            streamer=streamer,
+            pad_token_id=self.pad_token_id,
+            use_cache=True,
+            **kwargs,
+        )
+
+        if "past_key_values" in kwargs:
+            self.prefix_cache.put(input_ids, kwargs["past_key_values"])
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "requests": self.batched_requests,
+            "mean_batch_size": round(self.batched_requests / self.batches, 3) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "pending": len(self._pending),
+        }
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            pending, self._pending = self._pending, []
+            self._cond.notify_all()
+        for request in pending:
+            request._close(RuntimeError("BatchScheduler closed before the request ran."))
@@ -0,0 +1,254 @@
+"""
+Rolling context compaction for long agent runs.
+
+Keeps the prompt rebuilt from `agent.memory.steps` under a token budget by truncating large
+observation logs to head and tail, and by collapsing old steps into cached one-line summaries.
+The full records stay on disk in the session's step_N.json files.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from smolagents import ActionStep, PlanningStep
+from smolagents.memory import MemoryStep
+from smolagents.models import ChatMessage, MessageRole
+
+POLICIES = ("off", "truncate", "summarize")
+
+# Rough size of one image in the prompt, used when counting tokens
+_IMAGE_TOKENS = 768
+
+
+@dataclass
+class CompactedSteps(MemoryStep):
+    """
+    Stands in for a range of collapsed steps in the agent memory.
+    """
+    first_step: int
+    last_step: int
+    summaries: list[str] = field(default_factory=list)
+    omitted: int = 0
+
+    @property
+    def text(self) -> str:
+        header = f"Summary of earlier steps {self.first_step}-{self.last_step} (full records are saved as step_N.json in the session folder):"
+        lines = [header]
+        if self.omitted:
+            lines.append(f"- ... {self.omitted} earlier step summaries omitted to fit the context budget.")
+        lines.extend(f"- {s}" for s in self.summaries)
+        return "\n".join(lines)
+
+    def to_messages(self, summary_mode: bool = False) -> list[ChatMessage]:
+        return [ChatMessage(role=MessageRole.USER, content=[{"type": "text", "text": self.text}])]
+
+
+class ContextWindowManager:
+    """
+    Enforces a token budget on an agent's memory steps.
+
+    Compaction runs with hysteresis: once the budget is exceeded the history is compacted down
+    to `low_watermark * token_budget`, so the prompt prefix stays stable for several steps
+    afterwards (which keeps prefix KV caches effective).
+    """
+
+    def __init__(
+        self,
+        session_dir: Path,
+        token_budget: int = 12000,
+        observation_max_chars: int = 6000,
+        keep_recent_steps: int = 3,
+        policy: str = "summarize",
+        low_watermark: float = 0.75,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ):
+        """
+        Args:
+            session_dir: Session folder holding the step_N.json records.
+            token_budget: Maximum estimated prompt tokens for system prompt plus memory steps.
+            observation_max_chars: Observations longer than this are cut to head and tail.
+            keep_recent_steps: Number of most recent action steps that are never summarized.
+            policy: "off", "truncate" (observations only) or "summarize" (truncate and collapse old steps).
+            low_watermark: Fraction of the budget to compact down to once it is exceeded.
+            count_tokens: Optional tokenizer-backed counter. Defaults to a 4 characters per token estimate.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown context policy '{policy}'. Expected one of {POLICIES}.")
+        self.session_dir = Path(session_dir)
+        self.token_budget = token_budget
+        self.observation_max_chars = observation_max_chars
+        self.keep_recent_steps = keep_recent_steps
+        self.policy = policy
+        self.low_watermark = low_watermark
+        self.count_tokens = count_tokens or (lambda text: len(text) // 4 + 1)
+
+        self._summaries: dict[int, str] = {}
+        self.truncated_observations = 0
+        self.collapsed_steps = 0
+
+    def reset(self) -> None:
+        """Forget the summaries and counts of the previous run; its step numbers are reused."""
+        self._summaries.clear()
+        self.truncated_observations = 0
+        self.collapsed_steps = 0
+
+    def step_file(self, step_number: int) -> Path:
+        return self.session_dir / f"step_{step_number}.json"
+
+    def _message_tokens(self, messages: list[ChatMessage]) -> int:
+        total = 0
+        for message in messages:
+            content = message.content
+            if isinstance(content, str):
+                total += self.count_tokens(content)
+                continue
+            for part in content or []:
+                if part.get("type") == "text":
+                    total += self.count_tokens(part.get("text", ""))
+                elif part.get("type") == "image":
+                    total += _IMAGE_TOKENS
+        return total
+
+    def estimate_tokens(self, steps: list[MemoryStep], system_prompt: Optional[MemoryStep] = None) -> int:
+        """Estimated prompt tokens for the system prompt and the given steps."""
+        total = self._message_tokens(system_prompt.to_messages()) if system_prompt is not None else 0
+        for step in steps:
+            total += self._message_tokens(step.to_messages())
+        return total
+
+    def truncate_observation(self, text: str, step_number: int) -> str:
+        """Cut `text` to head and tail, pointing at the step file that keeps the full output."""
+        limit = self.observation_max_chars
+        if len(text) <= limit or "characters omitted; full output in" in text:
+            return text
+        head = int(limit * 0.6)
+        tail = int(limit * 0.3)
+        omitted = len(text) - head - tail
+        marker = f"\n...[{omitted} characters omitted; full output in {self.step_file(step_number)}]...\n"
+        self.truncated_observations += 1
+        return text[:head] + marker + text[-tail:]
+
+    @staticmethod
+    def _clip(text: Any, limit: int) -> str:
+        text = " ".join(str(text).split())
+        return text if len(text) <= limit else text[: limit - 3] + "..."
+
+    def summarize_step(self, step: MemoryStep) -> str:
+        """One-line summary of a step, computed once per step number of the current run."""
+        if isinstance(step, ActionStep) and step.step_number in self._summaries:
+            return self._summaries[step.step_number]
+
+        if isinstance(step, PlanningStep):
+            return f"Plan: {self._clip(step.plan, 240)}"
+
+        parts = [f"Step {step.step_number}:"]
+        if step.code_action:
+            parts.append(f"ran `{self._clip(step.code_action, 160)}`")
+        if step.error is not None:
+            parts.append(f"error: {self._clip(step.error, 160)}")
+        elif step.observations:
+            observation = step.observations.replace("Execution logs:", "").strip()
+            parts.append(f"observed: {self._clip(observation, 200)}")
+        if step.is_final_answer:
+            parts.append("(final answer)")
+        summary = " ".join(parts)
+        self._summaries[step.step_number] = summary
+        return summary
+
+    def _collapse(self, steps: list[MemoryStep], collapsible: list[MemoryStep]) -> list[MemoryStep]:
+        """Replace `collapsible` steps with (or merge them into) a single CompactedSteps block."""
+        block = next((s for s in steps if isinstance(s, CompactedSteps)), None)
+        numbers = [s.step_number for s in collapsible if isinstance(s, ActionStep)]
+        if block is None:
+            block = CompactedSteps(first_step=min(numbers, default=0), last_step=max(numbers, default=0))
+        else:
+            block.first_step = min([block.first_step] + numbers)
+            block.last_step = max([block.last_step] + numbers)
+        block.summaries.extend(self.summarize_step(s) for s in collapsible)
+        self.collapsed_steps += len(collapsible)
+
+        removed = {id(s) for s in collapsible}
+        compacted = []
+        inserted = False
+        for step in steps:
+            if id(step) in removed or step is block:
+                if not inserted:
+                    compacted.append(block)
+                    inserted = True
+                continue
+            compacted.append(step)
+        return compacted
+
+    def enforce(self, memory: Any, pending: Optional[list[MemoryStep]] = None) -> int:
+        """
+        Apply the policy to `memory.steps` in place.
+
+        Args:
+            memory: smolagents AgentMemory (needs `steps` and `system_prompt`).
+            pending: Steps not yet appended to memory (e.g. the step passed to a step callback).
+                     They count towards the budget and get observation truncation, but are never collapsed.
+
+        Returns:
+            Estimated prompt tokens after compaction.
+        """
+        pending = pending or []
+        if self.policy == "off":
+            return self.estimate_tokens(memory.steps + pending, memory.system_prompt)
+
+        for step in memory.steps + pending:
+            if isinstance(step, ActionStep) and step.observations:
+                step.observations = self.truncate_observation(step.observations, step.step_number)
+
+        total = self.estimate_tokens(memory.steps + pending, memory.system_prompt)
+        if self.policy != "summarize" or total <= self.token_budget:
+            return total
+
+        target = int(self.token_budget * self.low_watermark)
+        recent_actions = [s for s in memory.steps + pending if isinstance(s, ActionStep)][-self.keep_recent_steps:] if self.keep_recent_steps > 0 else []
+        protected = {id(s) for s in recent_actions}
+        candidates = [
+            s for s in memory.steps
+            if isinstance(s, (ActionStep, PlanningStep)) and id(s) not in protected
+        ]
+
+        collapsible = []
+        for step in candidates:
+            if total <= target:
+                break
+            before = self._message_tokens(step.to_messages())
+            after = self.count_tokens(self.summarize_step(step)) + 2
+            total -= max(0, before - after)
+            collapsible.append(step)
+            # Full prompts per step are only needed for replay; the JSON record keeps the rest
+            if isinstance(step, ActionStep):
+                step.model_input_messages = None
+
+        if collapsible:
+            memory.steps[:] = self._collapse(memory.steps, collapsible)
+
+        # The summary block itself can outgrow the budget on very long sessions
+        block = next((s for s in memory.steps if isinstance(s, CompactedSteps)), None)
+        total = self.estimate_tokens(memory.steps + pending, memory.system_prompt)
+        while block is not None and block.summaries and total > self.token_budget:
+            block.summaries.pop(0)
+            block.omitted += 1
+            total = self.estimate_tokens(memory.steps + pending, memory.system_prompt)
+
+        return total
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "truncated_observations": self.truncated_observations,
+            "collapsed_steps": self.collapsed_steps,
+            "cached_summaries": len(self._summaries),
+        }
+
+
+def token_counter_for(model: Any) -> Optional[Callable[[str], int]]:
+    """Tokenizer-backed token counter for local models, or None to fall back to the estimate."""
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None and hasattr(model, "processor"):
+        tokenizer = getattr(model.processor, "tokenizer", None)
+    if tokenizer is None:
+        return None
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
@@ -1,8 +1,11 @@
 import sys
+import copy
+import threading
 import warnings
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Union, Any, Generator, Self
+from typing import Optional, Union, Any, AsyncGenerator, Callable, Generator, Self
 from datetime import datetime
 import json
 from PIL import Image
@@ -22,24 +25,49 @@ import torch
 import numpy as np
 import yaml
 
-from smolagents import CodeAgent, TransformersModel, ActionStep, Model, LiteLLMModel, Tool
+from smolagents import CodeAgent, TransformersModel, ActionStep, FinalAnswerStep, Model, LiteLLMModel, Tool
 from atomonous.agent.mcp_client import ExtendedMCPClient
+from atomonous.agent.mcp_pool import PooledMCPClient, mcp_pool, server_label
+from atomonous.agent.mcp_recorder import RECORDING_NAME, MCPCallRecorder, MCPCallReplayer
+from atomonous.sim import sim_server_parameters
 import litellm
 
 from atomonous.utils.helpers import get_total_ram_gb
+from atomonous.utils.hardware import (
+    detect_hardware_profile,
+    apply_thread_settings,
+    apply_quantization,
+    measure_tokens_per_second,
+    scale_max_new_tokens,
+)
 from atomonous.utils.memory import SessionMemory
-from atomonous.agent.streamed_run import StreamedRun
+from atomonous.utils.blobs import ResourceFile
+from atomonous.agent.streamed_run import RunCancelled, StreamedRun
 from atomonous.agent.supervised_executor import SupervisedExecutor
-from atomonous.agent.models import SafeLiteLLMModel
+from atomonous.agent.approval import ApprovalBroker
+from atomonous.agent.models import SafeLiteLLMModel, LocalTransformersModel
+from atomonous.agent.prefix_cache import PrefixKVCache
+from atomonous.agent.context_manager import ContextWindowManager, token_counter_for
+from atomonous.agent.telemetry import UsageSummary
+from atomonous.utils import metrics
 from atomonous.config import settings
 from atomonous.data.factory import ConverterFactory
 from atomonous.tools.symbolic_regression_tool import SymbolicRegressionTool
 from atomonous.tools.experiment_tools import ExperimentSearchTool, ExperimentArtifactReadTool
 
 class Agent:
-    def __init__(self, model: Model, session_name: str = "", data_factory: Optional[ConverterFactory] = None):
+    def __init__(
+        self,
+        model: Model,
+        session_name: str = "",
+        data_factory: Optional[ConverterFactory] = None,
+        approval_broker: Optional[ApprovalBroker] = None,
+    ):
         self.model = model
         self.mcp_clients = []
+        self.shared_mcp_clients = []
+        # Names of the tools each attached MCP client added, by id of the client
+        self._mcp_tool_names: dict[int, set[str]] = {}
 
         # Initialize session memory
         self.memory = SessionMemory(
@@ -47,6 +75,11 @@ class Agent:
             session_name=session_name
         )
 
+        # Records the MCP tool calls of this session, see `settings.mcp_record_mode`
+        self.mcp_recorder: Optional[MCPCallRecorder] = None
+        if settings.mcp_record_mode == "record":
+            self.mcp_recorder = MCPCallRecorder(self.memory.session_dir / RECORDING_NAME)
+
         if data_factory is None:
             self.data_factory = ConverterFactory(register_default=True)
         else:
@@ -66,6 +99,7 @@ class Agent:
             step_callbacks={ActionStep : self._process_step},
             executor=SupervisedExecutor(
                 data_factory=self.data_factory,
+                approval_broker=approval_broker,
                 additional_authorized_imports=[
                     "atomonous.config.*", "numpy", "time", "os", "json", "yaml"
                 ]
@@ -83,53 +117,184 @@ class Agent:
             stream_outputs=True
         )
 
+        self.current_run: Optional[StreamedRun] = None
+        self._run_lock = threading.Lock()
+        # The run executing now, guarded so a cancel never reaches the run after it
+        self._active_run: Optional[StreamedRun] = None
+        self._cancel_lock = threading.Lock()
+
+        # Session-level rollup of model calls made by this agent
+        self.usage = UsageSummary()
+
+        self.context_manager = ContextWindowManager(
+            session_dir=self.memory.session_dir,
+            token_budget=settings.context_token_budget,
+            observation_max_chars=settings.context_observation_max_chars,
+            keep_recent_steps=settings.context_keep_recent_steps,
+            policy=settings.context_policy,
+            count_tokens=token_counter_for(self.model),
+        )
+
         self._setup_executor_context()
     
     @property
     def tools(self) -> list[Tool]:
         return list(self.agent.tools.values())
 
+    def save_mcp_resource(self, uri: str, client_index: int = 0, server_index: int = 0, name: Optional[str] = None) -> list[ResourceFile]:
+        """
+        Stream an MCP resource into the session directory, e.g. a dataset too large to hold
+        in memory. The returned paths can be passed to `data_factory.convert`.
+        """
+        clients = self.mcp_clients + self.shared_mcp_clients
+        if not clients:
+            raise RuntimeError("No MCP client connected.")
+        return clients[client_index].read_resource_to_disk(uri, self.memory.session_dir, name, server_index)
+
     def disconnect_mcp_clients(self):
-        """Disconnects all initialized MCP clients."""
+        """Disconnects all MCP clients owned by this agent. Shared clients are only detached."""
         for client in self.mcp_clients:
             try:
                 client.disconnect()
             except Exception:
                 pass
         self.mcp_clients.clear()
+        self.shared_mcp_clients.clear()
+        self._mcp_tool_names.clear()
+
+    def attach_mcp_client(self, client: ExtendedMCPClient | PooledMCPClient | MCPCallReplayer, owned: bool = True):
+        """
+        Adds the tools of an already connected MCP client to the CodeAgent.
+        A client attached with owned=False is shared with other agents and is never
+        disconnected by this one; its tools are copied so per-agent executor wrapping stays local.
+        Pooled clients may start out with cached tool schemas; if the server's live listing
+        differs, the agent's tools are updated to match.
+        While recording, the client's tools are rebuilt so that their calls are recorded; this
+        waits for a pooled client that is still connecting.
+        """
+        if owned:
+            self.mcp_clients.append(client)
+        else:
+            self.shared_mcp_clients.append(client)
+
+        self._mcp_tool_names[id(client)] = set()
+        self._sync_mcp_tools(client, owned, client.get_tools())
+        if isinstance(client, PooledMCPClient):
+            client.on_tools_changed(lambda tools: self._sync_mcp_tools(client, owned, tools))
+
+    def _sync_mcp_tools(self, client: Any, owned: bool, tools: list[Tool]):
+        previous = self._mcp_tool_names.get(id(client))
+        if previous is None:
+            # Detached meanwhile
+            return
+        if self.mcp_recorder is not None and not isinstance(client, MCPCallReplayer):
+            tools = self.mcp_recorder.tools_for(client)
+        current = set()
+        for tool in tools:
+            if tool.name in self.agent.tools and tool.name not in previous:
+                warnings.warn(f"Tool name conflict: '{tool.name}' already exists in the agent's tools. Skipping this tool from MCP client.")
+                continue
+            self.agent.tools[tool.name] = tool if owned else copy.copy(tool)
+            current.add(tool.name)
+        for name in previous - current:
+            self.agent.tools.pop(name, None)
+        self._mcp_tool_names[id(client)] = current
 
     def __del__(self):
         self.disconnect_mcp_clients()
+        if getattr(self, "mcp_recorder", None) is not None:
+            self.mcp_recorder.close()
+
+    def replay_mcp_calls(self, path: str | Path, timing: bool = False) -> MCPCallReplayer:
+        """
+        Registers the tools of a recording made with `settings.mcp_record_mode = "record"` and
+        answers their calls from it, without connecting to a server. With `timing`, each call
+        takes as long as it did when recorded.
+        """
+        replayer = MCPCallReplayer(path, timing=timing)
+        self.attach_mcp_client(replayer)
+        return replayer
 
-    def connect_mcp_client(self, server_parameters: dict[str, Any] | None = None, adapter_kwargs: Optional[dict] = None, structured_output: bool = False):
+    def connect_mcp_client(
+        self,
+        server_parameters: dict[str, Any] | list[dict[str, Any]] | None = None,
+        adapter_kwargs: Optional[dict] = None,
+        structured_output: bool = False,
+        pooled: bool = True,
+    ):
         """
         Connects an MCP client to the specified server parameters and adds its tools to the CodeAgent.
         `server_parameters` can be a dictionary mapping (e.g. {"url": "...", "transport": "streamable-http"})
-        or a list of such dictionaries for connecting multiple servers.
-        If `server_parameters` is None, it will default to connecting to the server specified in the `settings.mcp_url`.
+        or a list of such dictionaries for connecting multiple servers. Servers in a list are connected
+        concurrently, each with its own client; a server that fails to connect is skipped with a warning.
+        If `server_parameters` is None, it will default to connecting to the server specified in the `settings.mcp_url`,
+        or in `settings.sim_mode` to a local microscope simulator started as a subprocess.
+        With `pooled`, agents connecting to the same server share one connection from the process-wide
+        pool, which reconnects automatically if the server drops it. Pooled servers whose tool schemas
+        are cached from an earlier connect are registered at once and connected in the background.
+        In `settings.mcp_record_mode = "replay"`, the recording in `settings.mcp_replay_path` is
+        attached instead and no server is contacted.
         """
+        if settings.mcp_record_mode == "replay":
+            self.replay_mcp_calls(settings.mcp_replay_path, timing=settings.mcp_replay_timing)
+            return
+
         if server_parameters is None:
-            server_parameters = {"url": settings.mcp_url, "transport": "streamable-http"}
+            if settings.sim_mode:
+                server_parameters = sim_server_parameters()
+            else:
+                server_parameters = {"url": settings.mcp_url, "transport": "streamable-http"}
 
-        try:
-            client = ExtendedMCPClient(
-                server_parameters=server_parameters,
+        def connect(params):
+            if pooled:
+                return mcp_pool.acquire(params, adapter_kwargs=adapter_kwargs, structured_output=structured_output)
+            return ExtendedMCPClient(
+                server_parameters=params,
                 adapter_kwargs=adapter_kwargs,
                 structured_output=structured_output,
             )
-            self.mcp_clients.append(client)
-            
-            # Add all the fetched tools
-            for tool in client.get_tools():
-                if tool.name not in self.agent.tools.keys():
-                    self.agent.tools[tool.name] = tool
-                else:
-                    warnings.warn(f"Tool name conflict: '{tool.name}' already exists in the agent's tools. Skipping this tool from MCP client.")
+
+        try:
+            if not isinstance(server_parameters, list):
+                self.attach_mcp_client(connect(server_parameters))
+                return
+
+            with ThreadPoolExecutor(max_workers=max(1, len(server_parameters)), thread_name_prefix="mcp-connect") as pool:
+                futures = [pool.submit(connect, params) for params in server_parameters]
+            # Attach in the given order so tool name conflicts resolve the same way every time
+            for params, future in zip(server_parameters, futures):
+                try:
+                    client = future.result()
+                except ModuleNotFoundError:
+                    raise
+                except Exception as e:
+                    warnings.warn(f"Failed to connect to MCP server {server_label(params)}: {e}")
+                    continue
+                self.attach_mcp_client(client)
         except ModuleNotFoundError:
             warnings.warn("Failed to initialize ExtendedMCPClient. Ensure `smolagents[mcp]` is installed.")
             
     @classmethod
     def from_model_id(cls, model_id: str = "Auto", session_name: str = "", data_factory: Optional[ConverterFactory] = None) -> Self:
+        model = cls.load_model(model_id)
+        instance = cls(model=model, session_name=session_name, data_factory=data_factory)
+        instance.gen_params = model.gen_params
+        instance.hardware_profile = model.hardware_profile
+        instance.tokens_per_second = model.tokens_per_second
+        return instance
+
+    @staticmethod
+    def load_model(model_id: str = "Auto", progress: Optional[Callable[[str], None]] = None) -> LocalTransformersModel:
+        """
+        Loads a local model for the detected hardware. The returned model can be shared by
+        several Agents; its generation parameters, hardware profile and measured tokens/s
+        are kept as `gen_params`, `hardware_profile` and `tokens_per_second`.
+
+        Args:
+            model_id: Hugging Face model ID or local path.
+            progress: Called with the name of each loading phase as it starts.
+        """
+        report = progress or (lambda phase: None)
         model_size_b = 0
         try:
             size_match = re.search(r'(\d+\.?\d*)B', model_id)
@@ -138,6 +303,8 @@ class Agent:
         except:
             pass
         
+        # Sampling parameters still follow model size; max_tokens is only a fallback
+        # when the generation speed cannot be measured.
         if model_size_b < 3:
             max_tokens = 512
             temperature = 0.4
@@ -154,31 +321,62 @@ class Agent:
             top_p = 0.95
             rep_penalty = 1.05
 
-        gen_params = {
-            "max_new_tokens": max_tokens,
-            "temperature": temperature,
-            "top_p": top_p,
-            "repetition_penalty": rep_penalty,
-        }
+        report("detecting_hardware")
+        profile = detect_hardware_profile(quantization=settings.inference_quantization)
+        apply_thread_settings(profile)
+        for note in profile.notes:
+            warnings.warn(note)
 
-        model = TransformersModel(
+        prefix_cache = None
+        if settings.prefix_cache_enabled:
+            prefix_cache = PrefixKVCache(
+                max_tokens=settings.prefix_cache_max_tokens,
+                max_bytes=int(settings.prefix_cache_max_mb * 1024**2),
+            )
+
+        report("loading_weights")
+        model = LocalTransformersModel(
             model_id=model_id,
             max_new_tokens=max_tokens,
-            device_map="mps" if torch.backends.mps.is_available() else "auto",
-            torch_dtype=torch.bfloat16,
+            device_map=profile.device_map,
+            torch_dtype=profile.torch_dtype,
             trust_remote_code=True,
             temperature=temperature,
             top_p=top_p,
             repetition_penalty=rep_penalty,
-            model_kwargs={
-                "low_cpu_mem_usage": True,
-                "use_cache": True,
-                "load_in_4bit": True,
-            }
+            model_kwargs=profile.model_kwargs(),
+            prefix_cache=prefix_cache,
         )
-        instance = cls(model=model, session_name=session_name, data_factory=data_factory)
-        instance.gen_params = gen_params
-        return instance
+        report("quantizing")
+        model.model = apply_quantization(model.model, profile)
+        if settings.local_batching_enabled:
+            model.enable_batching(
+                max_batch_size=settings.local_batch_max_size,
+                max_wait_s=settings.local_batch_max_wait_ms / 1000,
+            )
+
+        tokens_per_second = 0.0
+        if settings.measure_generation_speed:
+            report("measuring_speed")
+            try:
+                tokens_per_second = measure_tokens_per_second(model)
+            except Exception as e:
+                warnings.warn(f"Generation speed probe failed, keeping max_new_tokens={max_tokens}: {e}")
+            # The probe is not part of any agent step
+            model.call_recorder.drain()
+        if tokens_per_second > 0:
+            max_tokens = scale_max_new_tokens(tokens_per_second, settings.generation_time_budget_s)
+            model.kwargs["max_new_tokens"] = max_tokens
+
+        model.gen_params = {
+            "max_new_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "repetition_penalty": rep_penalty,
+        }
+        model.hardware_profile = profile
+        model.tokens_per_second = tokens_per_second
+        return model
 
     @classmethod
     def from_api_key(cls, model_id: str, api_base: str, api_key: str, session_name: str = "", data_factory: Optional[ConverterFactory] = None) -> Self:
@@ -203,13 +401,100 @@ class Agent:
         except Exception:
             pass
 
+    def run(self, query: str, autostart: bool = True) -> StreamedRun:
+        """
+        Creates a StreamedRun for the query. The agent executes once, on the run's worker thread,
+        no matter how many consumers subscribe to it. The latest run is kept as `current_run`.
+        With autostart=False, the run only begins when `start()` is called on it, and it does
+        not replace `current_run`: a caller that queues it sets `current_run` once it is admitted.
+        The progress of long-running MCP tools is published into the run as ToolProgress events.
+        """
+        def execute():
+            steps = 0
+            executor = self.agent.python_executor
+            # A cancelled run finishes its current step before the next one may start
+            with self._run_lock:
+                if run.cancelled:
+                    raise RunCancelled("The run was cancelled before it started.")
+                with self._cancel_lock:
+                    self._active_run = run
+                # Progress of long-running tools goes to this run's consumers
+                executor.progress_sink = run.publish
+                # CodeAgent.run resets the memory, so step numbers start again at 1
+                self.context_manager.reset()
+                try:
+                    for item in self.agent.run(query, stream=True):
+                        # CodeAgent.run clears its interrupt switch when it starts, which can
+                        # undo a cancel that arrived just before; re-apply it between items
+                        if run.cancelled:
+                            self.agent.interrupt()
+                        if isinstance(item, ActionStep):
+                            steps += 1
+                        yield item
+                finally:
+                    with self._cancel_lock:
+                        self._active_run = None
+                    executor.progress_sink = None
+                    metrics.AGENT_STEPS_PER_RUN.observe(steps)
+
+        run = StreamedRun(execute, replay_size=settings.stream_replay_size, autostart=autostart)
+        if autostart:
+            self.current_run = run
+        return run
+
     def chat(self, query: str, stream: bool = False) -> str | Generator:
         """Queries the LLM. If stream is True, returns a Generator."""
-        sr = StreamedRun(lambda: self.agent.run(query, stream=True))
+        sr = self.run(query)
         if stream == True:
             return sr.stream()
         return str(sr.final().output)
 
+    def use_approval_broker(self, broker: ApprovalBroker, owner: Optional[str] = None):
+        """
+        Route approvals of dangerous tool calls to `broker`. `owner` tags this agent's requests,
+        e.g. with its API session ID.
+        """
+        executor = self.agent.python_executor
+        executor.approval_broker = broker
+        executor.approval_owner = owner
+
+    def cancel(self, run: Optional[StreamedRun] = None):
+        """
+        Cooperatively stops `run`, by default the current run. A run that has not started yet
+        never starts. A running one completes its step in progress first; an approval it is
+        waiting for is denied. Other runs of this agent are not affected.
+        """
+        run = run or self.current_run
+        if run is None:
+            return
+        run.cancel()
+        with self._cancel_lock:
+            if run is self._active_run:
+                self.agent.interrupt()
+                executor = self.agent.python_executor
+                executor.approval_broker.cancel(owner=executor.approval_owner)
+
+    async def astream(self, query: str, policy: str = "block") -> AsyncGenerator:
+        """
+        Streams a run to an asyncio consumer without blocking the event loop.
+        If the consumer stops early (e.g. the client disconnected), the run is cancelled.
+        """
+        sr = self.run(query)
+        try:
+            async for item in sr.asubscribe(policy=policy):
+                yield item
+        finally:
+            if not sr.done:
+                self.cancel(sr)
+
+    async def achat(self, query: str) -> str:
+        """Async version of `chat`. Cancelling the awaiting task cancels the run."""
+        final = None
+        async for item in self.astream(query, policy="coalesce"):
+            if isinstance(item, FinalAnswerStep):
+                final = item
+        return str(final.output) if final is not None else ""
+
     def _process_step(self, step: ActionStep, agent: CodeAgent):
         if self.data_factory is None: return
 
@@ -224,7 +509,8 @@ class Agent:
             for artifact in agent.python_executor.intercepted_artifacts:
                 if isinstance(artifact, Image.Image):
                     # Save image to artifact session folder
-                    self.memory.save_pil_image(artifact, description=f"step_{step.step_number}")
+                    with metrics.ARTIFACT_WRITE_LATENCY.time(kind="image"):
+                        self.memory.save_pil_image(artifact, description=f"step_{step.step_number}")
                     
                     # Add to observations only if the model supports vision
                     if not agent.model.flatten_messages_as_text:
@@ -238,6 +524,19 @@ class Agent:
 
         full_output: str = agent.python_executor.last_output.logs if hasattr(agent.python_executor, "last_output") else ""
 
+        # Model calls made on this thread since the previous step
+        recorder = getattr(agent.model, "call_recorder", None)
+        model_calls = recorder.drain() if recorder is not None else []
+        for record in model_calls:
+            self.usage.add(record)
+            metrics.MODEL_CALL_LATENCY.observe(record.total_s, model=record.model_id, streaming=str(record.streaming).lower())
+            if record.ttft_s is not None:
+                metrics.MODEL_TTFT.observe(record.ttft_s, model=record.model_id)
+            metrics.MODEL_TOKENS.inc(record.prompt_tokens, model=record.model_id, kind="prompt")
+            metrics.MODEL_TOKENS.inc(record.completion_tokens, model=record.model_id, kind="completion")
+        if step.timing and step.timing.duration is not None:
+            metrics.AGENT_STEP_DURATION.observe(step.timing.duration)
+
         step_data = {
             "step_number": step.step_number,
             "model_output": step.model_output,
@@ -245,8 +544,16 @@ class Agent:
             "action_output": str(step.action_output) if step.action_output else None,
             "code_action": step.code_action,
             "full_output": full_output,
+            "timing": step.timing.dict() if step.timing else None,
+            "model_calls": [record.dict() for record in model_calls],
+            "usage": UsageSummary.from_records(model_calls).dict(),
         }
         
         step_file = self.memory.session_dir / f"step_{step.step_number}.json"
-        with open(step_file, "w") as f:
-            json.dump(step_data, f, indent=2)
\ No newline at end of file
+        with metrics.ARTIFACT_WRITE_LATENCY.time(kind="step"):
+            with open(step_file, "w") as f:
+                json.dump(step_data, f, indent=2)
+            self.memory.save_usage_summary(self.usage.dict())
+
+        # Compact after the full record is on disk, so truncated observations can point to it
+        self.context_manager.enforce(agent.memory, pending=[step])
\ No newline at end of file
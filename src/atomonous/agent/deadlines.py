@@ -0,0 +1,94 @@
+"""
+Time budgets that flow from an agent step down to the MCP calls it makes.
+
+A budget is an absolute deadline in a context variable. Nested budgets only ever shorten
+it, so a tool call started late in a step gets the time the step has left, not its full
+timeout. MCP clients read the deadline on the caller's thread, before handing the call to
+their event loop, and pass it along explicitly. Threads do not inherit context variables,
+so code that moves work to another thread carries the deadline over with `until`.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+from typing import Any, Awaitable, Iterator, Mapping, Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("atomonous_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """A call ran past its timeout or the time left in the caller's budget."""
+
+
+@contextmanager
+def until(deadline: Optional[float]) -> Iterator[Optional[float]]:
+    """
+    Limit the calls made inside the block to the absolute `deadline` in `time.monotonic()`
+    seconds, or to the enclosing budget if that ends sooner. None leaves it as it is.
+
+    Yields:
+        The effective deadline, or None without a budget.
+    """
+    enclosing = _deadline.get()
+    if deadline is None or (enclosing is not None and enclosing < deadline):
+        deadline = enclosing
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def budget(seconds: Optional[float]):
+    """Like `until`, for `seconds` from now. None or 0 leaves the enclosing budget as it is."""
+    return until(time.monotonic() + seconds if seconds else None)
+
+
+def current() -> Optional[float]:
+    """The absolute deadline of the current budget, or None without one."""
+    return _deadline.get()
+
+
+async def within(deadline: Optional[float], awaitable: Awaitable[Any]) -> Any:
+    """
+    Await under `deadline` in the running task. Tasks scheduled from another thread do not
+    inherit the caller's context, so the caller hands its deadline over explicitly.
+    """
+    _deadline.set(deadline)
+    return await awaitable
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def clamp(timeout: float, what: str = "call") -> float:
+    """
+    Shorten `timeout` to the time left in the current budget.
+
+    Raises:
+        DeadlineExceeded: If the budget has already run out.
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded(f"No time left in the step's budget for {what}.")
+    return min(timeout, left)
+
+
+def timeout_for(name: str, timeouts: Mapping[str, float], default: float) -> float:
+    """
+    Timeout of a tool from a mapping of tool names or glob patterns, e.g.
+    {"get_scanned_image": 120, "set_*": 10}. Exact names win over patterns; among
+    patterns, the first match in mapping order wins.
+    """
+    if name in timeouts:
+        return timeouts[name]
+    for pattern, timeout in timeouts.items():
+        if fnmatchcase(name, pattern):
+            return timeout
+    return default
@@ -0,0 +1,159 @@
+"""
+Per-server cache of MCP listings and resource reads.
+
+Prompt, resource and template listings rarely change during a session, and static resources
+such as calibration tables never do, yet every call used to be a network round trip. Entries
+expire after a TTL and are dropped early when the server announces a change through
+`notifications/*/list_changed` or `notifications/resources/updated`.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+# Returned by `get` on a miss, since None can be a cached value
+MISSING = object()
+
+# Notification method -> cache kinds it invalidates
+_LIST_CHANGED = {
+    "notifications/tools/list_changed": ("tools",),
+    "notifications/prompts/list_changed": ("prompts",),
+    "notifications/resources/list_changed": ("resources", "resource_templates"),
+}
+
+
+def result_nbytes(result: Any) -> int:
+    """Approximate payload size of a ReadResourceResult: text and base64 blob lengths."""
+    total = 0
+    for content in getattr(result, "contents", None) or []:
+        total += len(getattr(content, "text", None) or getattr(content, "blob", None) or "")
+    return total
+
+
+class MCPResponseCache:
+    """
+    LRU cache with per-kind TTLs for the responses of one MCP server.
+
+    Entries are keyed by (kind, key), e.g. ("prompts", None) or ("resource", uri). Listings
+    use `list_ttl_s` and resource reads `resource_ttl_s`; a TTL of 0 disables caching for
+    that group.
+
+    Args:
+        list_ttl_s: Seconds a listing (tools, prompts, resources, templates) stays valid.
+        resource_ttl_s: Seconds a resource read stays valid.
+        max_entries: Maximum number of entries; the least recently used are evicted.
+        max_resource_bytes: Resources larger than this are not cached, and the total size of
+            cached resources stays below it.
+    """
+
+    def __init__(
+        self,
+        list_ttl_s: float = 300.0,
+        resource_ttl_s: float = 3600.0,
+        max_entries: int = 256,
+        max_resource_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.list_ttl_s = list_ttl_s
+        self.resource_ttl_s = resource_ttl_s
+        self.max_entries = max_entries
+        self.max_resource_bytes = max_resource_bytes
+
+        self._lock = threading.Lock()
+        # (kind, key) -> (expires_at, nbytes, value)
+        self._entries: OrderedDict[tuple[str, Any], tuple[float, int, Any]] = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._nbytes = 0
+
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+        self.invalidations = 0
+
+    def _ttl(self, kind: str) -> float:
+        return self.resource_ttl_s if kind == "resource" else self.list_ttl_s
+
+    def generation(self, kind: str) -> int:
+        """Counter bumped by every invalidation of `kind`; pass it to `put` to drop stale fetches."""
+        with self._lock:
+            return self._generations.get(kind, 0)
+
+    def get(self, kind: str, key: Any = None) -> Any:
+        """Return the cached value, or MISSING."""
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end((kind, key))
+                self.hits[kind] = self.hits.get(kind, 0) + 1
+                return entry[2]
+            if entry is not None:
+                self._drop((kind, key))
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+            return MISSING
+
+    def put(self, kind: str, key: Any, value: Any, nbytes: int = 0, generation: Optional[int] = None) -> bool:
+        """
+        Store a value. Returns False if it was not cached: caching is disabled for its kind,
+        it is too large, or `kind` was invalidated since `generation` was read.
+        """
+        ttl = self._ttl(kind)
+        if ttl <= 0 or self.max_entries <= 0 or nbytes > self.max_resource_bytes:
+            return False
+        with self._lock:
+            if generation is not None and generation != self._generations.get(kind, 0):
+                # The server announced a change while this response was in flight
+                return False
+            if (kind, key) in self._entries:
+                self._drop((kind, key))
+            self._entries[(kind, key)] = (time.monotonic() + ttl, nbytes, value)
+            self._nbytes += nbytes
+            while len(self._entries) > self.max_entries or self._nbytes > self.max_resource_bytes:
+                self._drop(next(iter(self._entries)))
+        return True
+
+    def _drop(self, entry_key: tuple[str, Any]) -> None:
+        # Caller holds self._lock
+        _, nbytes, _ = self._entries.pop(entry_key)
+        self._nbytes -= nbytes
+
+    def invalidate(self, kind: Optional[str] = None, key: Any = MISSING) -> int:
+        """
+        Drop entries of `kind` (every kind if None), or only the entry `key` of it.
+        Returns the number of entries dropped.
+        """
+        with self._lock:
+            kinds = {k for k, _ in self._entries} | set(self._generations) if kind is None else {kind}
+            for k in kinds:
+                self._generations[k] = self._generations.get(k, 0) + 1
+            doomed = [
+                ek for ek in self._entries
+                if (kind is None or ek[0] == kind) and (key is MISSING or ek[1] == key)
+            ]
+            for entry_key in doomed:
+                self._drop(entry_key)
+            self.invalidations += len(doomed)
+            return len(doomed)
+
+    def handle_notification(self, method: str, params: Any = None) -> int:
+        """
+        Invalidate the entries a server notification makes stale. Returns the number dropped.
+        """
+        if method == "notifications/resources/updated":
+            uri = getattr(params, "uri", None)
+            return self.invalidate("resource", str(uri)) if uri is not None else self.invalidate("resource")
+        return sum(self.invalidate(kind) for kind in _LIST_CHANGED.get(method, ()))
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+            return {
+                "entries": len(self._entries),
+                "resource_bytes": self._nbytes,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "invalidations": self.invalidations,
+                "by_kind": {
+                    kind: {"hits": self.hits.get(kind, 0), "misses": self.misses.get(kind, 0)}
+                    for kind in sorted(set(self.hits) | set(self.misses))
+                },
+            }
@@ -4,24 +4,68 @@ Extended MCP client that exposes prompts and resources alongside tools.
 smolagents' MCPClient only surfaces tools. The underlying mcp.ClientSession
 already supports the full protocol — we just need sync wrappers around the
 async session methods, reusing mcpadapt's event loop and thread.
+
+Every call has a deadline: the client timeout, a per-tool timeout, or what is left of the
+caller's budget (see `deadlines`), whichever ends first. An expired call is cancelled on the
+adapter loop and the server is sent a `notifications/cancelled` for it, so a hung instrument
+does not keep work running on the loop.
+
+Tool calls made where a progress sink is set (see `progress`) ask the server for progress
+notifications and forward them to the sink while the call runs.
 """
 
 from __future__ import annotations
 
 import asyncio
+import concurrent.futures
+import threading
+import time
 import warnings
-from typing import Any
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable
 
 from smolagents import MCPClient, Tool
 
+from atomonous.agent import deadlines, progress
+from atomonous.agent.deadlines import DeadlineExceeded
+from atomonous.agent.mcp_cache import MISSING, MCPResponseCache, result_nbytes
+from atomonous.utils import metrics
+from atomonous.utils.blobs import ResourceFile, save_resource
+from atomonous.config import settings
+
+from mcp.shared.session import ProgressFnT
 from mcp.types import (
+    CallToolResult,
+    CancelledNotification,
+    CancelledNotificationParams,
+    ClientNotification,
     GetPromptResult,
     ListPromptsResult,
     ListResourcesResult,
     ListResourceTemplatesResult,
     ReadResourceResult,
+    Tool as McpTool,
 )
 
+# Extra seconds a blocking caller waits beyond the deadline the async call enforces itself
+_SYNC_MARGIN_S = 5.0
+
+
+@dataclass
+class ServerResult:
+    """Outcome of one server's call in a fan-out; exactly one of `result` and `error` is set."""
+
+    server_index: int
+    result: Any = None
+    error: BaseException | None = None
+    elapsed_s: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
 
 class ExtendedMCPClient(MCPClient):
     """
@@ -29,6 +73,15 @@ class ExtendedMCPClient(MCPClient):
 
     Reuses the live ClientSession(s) that mcpadapt already manages. All calls
     are bridged from sync to async via the adapter's background event loop.
+
+    Prompt, resource and template listings and resource reads are cached per server
+    (see MCPResponseCache) and invalidated by the server's change notifications.
+    Pass `cache=False` to always query the server.
+
+    Args:
+        timeout: Default seconds a call may take. Defaults to `settings.mcp_call_timeout_s`.
+        tool_timeouts: Seconds per tool name or glob pattern, e.g. {"get_scanned_image": 120}.
+            Defaults to `settings.mcp_tool_timeouts`.
     """
 
     def __init__(
@@ -36,21 +89,201 @@ class ExtendedMCPClient(MCPClient):
         server_parameters,
         adapter_kwargs: dict[str, Any] | None = None,
         structured_output: bool = False,
-        timeout: float = 30,
+        timeout: float | None = None,
+        cache: bool = True,
+        tool_timeouts: dict[str, float] | None = None,
     ):
+        # Set before connecting: the notification hooks and tools are installed by connect()
+        self._timeout = timeout if timeout is not None else settings.mcp_call_timeout_s
+        self._tool_timeouts = dict(settings.mcp_tool_timeouts if tool_timeouts is None else tool_timeouts)
+        self._cache_enabled = cache
+        self._caches: dict[int, MCPResponseCache] = {}
+        self._subscribed: set[tuple[int, str]] = set()
+        # Cancellation notices in flight, referenced until they are sent
+        self._background: set[asyncio.Task] = set()
         super().__init__(
             server_parameters=server_parameters,
             adapter_kwargs=adapter_kwargs,
             structured_output=structured_output,
         )
-        self._timeout = timeout
 
+    def connect(self):
+        super().connect()
+        self._watch_notifications()
+        self._tools = self.adapt_tools()
+
+    def tool_definitions(self) -> list[tuple[int, McpTool]]:
+        """The MCP definitions of the listed tools, with the index of the server that listed each."""
+        return [(index, tool) for index, tools in enumerate(self._adapter.mcp_tools) for tool in tools]
+
+    def adapt_tools(self, call: Callable[[int, str, dict[str, Any] | None], CallToolResult] | None = None) -> list[Tool]:
+        """
+        Build smolagents tools from the server's tool definitions whose calls go through
+        `call(server_index, name, arguments)`. By default that is `call_tool`, with its deadlines
+        and cancellation, instead of mcpadapt's unbounded blocking call. Wrapping `call`
+        intercepts the raw CallToolResult before mcpadapt converts it for the agent.
+        """
+        adapter = self._adapter.adapter
+        call = call or self._call_tool_sync
+        return [adapter.adapt(partial(call, index, tool.name), tool) for index, tool in self.tool_definitions()]
+
+    def _call_tool_sync(self, server_index: int, name: str, arguments: dict[str, Any] | None = None) -> CallToolResult:
+        return self.call_tool(name, arguments, server_index=server_index)
+
+    def tool_timeout(self, name: str) -> float:
+        """Seconds a call of the tool may take before the step's budget is considered."""
+        return deadlines.timeout_for(name, self._tool_timeouts, self._timeout)
+
+    def _watch_notifications(self) -> None:
+        """Chain a handler onto each session's message handler that invalidates its cache."""
+        for index, session in enumerate(self._adapter.sessions):
+            if getattr(session, "_atomonous_watched", False):
+                continue
+            inner = session._message_handler
+
+            async def handler(message, index=index, inner=inner):
+                root = getattr(message, "root", None)
+                method = getattr(root, "method", None)
+                if isinstance(method, str) and method.startswith("notifications/"):
+                    self.cache(index).handle_notification(method, getattr(root, "params", None))
+                await inner(message)
+
+            session._message_handler = handler
+            session._atomonous_watched = True
+
+    def cache(self, server_index: int = 0) -> MCPResponseCache:
+        """The response cache of one server."""
+        cache = self._caches.get(server_index)
+        if cache is None:
+            enabled = self._cache_enabled
+            cache = self._caches.setdefault(server_index, MCPResponseCache(
+                list_ttl_s=settings.mcp_list_cache_ttl_s if enabled else 0,
+                resource_ttl_s=settings.mcp_resource_cache_ttl_s if enabled else 0,
+                max_entries=settings.mcp_cache_max_entries,
+                max_resource_bytes=int(settings.mcp_cache_max_resource_mb * 1024 * 1024),
+            ))
+        return cache
 
-    def _run_sync(self, coro):
-        """Run an async coroutine on mcpadapt's loop and block for the result."""
-        return asyncio.run_coroutine_threadsafe(
-            coro, self._adapter.loop
-        ).result(timeout=self._timeout)
+    def cache_stats(self) -> list[dict[str, Any]]:
+        """Hit/miss statistics of every server's cache, in server order."""
+        return [self.cache(i).stats() for i in range(len(self._adapter.sessions))]
+
+    def invalidate_cache(self, server_index: int | None = None) -> None:
+        for index in range(len(self._adapter.sessions)) if server_index is None else [server_index]:
+            self.cache(index).invalidate()
+
+    async def _fetch(self, server_index: int, kind: str, key: Any, fetch, generation: int):
+        session = self._sessions[server_index]
+        result = await fetch(session)
+        nbytes = result_nbytes(result) if kind == "resource" else 0
+        if self.cache(server_index).put(kind, key, result, nbytes=nbytes, generation=generation):
+            if kind == "resource":
+                await self._subscribe(server_index, session, key)
+        return result
+
+    async def _subscribe(self, server_index: int, session, uri: str) -> None:
+        """Ask for `resources/updated` notifications, so a cached resource is dropped when it changes."""
+        capabilities = session.get_server_capabilities()
+        if (server_index, uri) in self._subscribed or not (capabilities and capabilities.resources and capabilities.resources.subscribe):
+            return
+        self._subscribed.add((server_index, uri))
+        try:
+            await session.subscribe_resource(uri)
+        except Exception as e:
+            self.cache(server_index).invalidate("resource", uri)
+            warnings.warn(f"Could not subscribe to MCP resource '{uri}'; it is cached until its TTL expires: {e}")
+
+    async def _acached(self, server_index: int, kind: str, key: Any, fetch):
+        """Serve from the cache on the calling loop, or fetch on the adapter loop."""
+        cache = self.cache(server_index)
+        value = cache.get(kind, key)
+        if value is not MISSING:
+            return value
+        return await self._on_adapter_loop(
+            self._fetch(server_index, kind, key, fetch, cache.generation(kind)),
+            session=self._sessions[server_index],
+        )
+
+    async def _on_adapter_loop(self, coro, timeout: float | None = None, session=None, what: str = "MCP call"):
+        """
+        Await a coroutine on mcpadapt's loop from any event loop: directly when already on it,
+        otherwise through a future, so the calling loop is never blocked. Cancelling the
+        caller cancels the call on the adapter loop.
+
+        The call is bounded by `timeout`, shortened to the caller's remaining budget. If it
+        expires or is cancelled while a request to `session` is in flight, the server is told
+        to cancel that request.
+
+        Raises:
+            DeadlineExceeded: If the call did not finish in time.
+        """
+        try:
+            timeout = deadlines.clamp(timeout if timeout is not None else self._timeout, what)
+        except DeadlineExceeded:
+            coro.close()
+            raise
+        if session is not None:
+            coro = self._cancellable(session, coro, f"{what} exceeded its {timeout:.1f}s deadline")
+        coro = asyncio.wait_for(coro, timeout)
+        try:
+            if asyncio.get_running_loop() is self._adapter.loop:
+                return await coro
+            return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._adapter.loop))
+        except DeadlineExceeded:
+            raise
+        except TimeoutError as e:
+            raise DeadlineExceeded(f"{what} did not finish within {timeout:.1f}s and was cancelled.") from e
+
+    async def _cancellable(self, session, coro, reason: str):
+        # The session numbers requests in order; the request `coro` sends first gets this ID.
+        # Nothing is awaited between reading it and starting `coro`, so no other call can take it.
+        request_id = getattr(session, "_request_id", None)
+        try:
+            return await coro
+        except asyncio.CancelledError:
+            if request_id is not None:
+                task = asyncio.get_running_loop().create_task(self._send_cancelled(session, request_id, reason))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            raise
+
+    async def _send_cancelled(self, session, request_id: int, reason: str) -> None:
+        metrics.MCP_REQUESTS_CANCELLED.inc()
+        notification = CancelledNotification(
+            method="notifications/cancelled",
+            params=CancelledNotificationParams(requestId=request_id, reason=reason),
+        )
+        try:
+            await session.send_notification(ClientNotification(notification))
+        except Exception as e:
+            # The session may be the reason the call hung; the request dies with it
+            warnings.warn(f"Could not send MCP cancellation for request {request_id}: {e}")
+
+    def _run_sync(self, coro, timeout: float | None = None):
+        """
+        Run an async coroutine on mcpadapt's loop and block for the result. The caller's
+        budget is carried over to the loop, and the call is cancelled there if this thread
+        stops waiting for it.
+        """
+        if threading.current_thread() is self._adapter.thread:
+            coro.close()
+            raise RuntimeError("Sync MCP calls cannot be made from the adapter loop; await the async API instead.")
+        try:
+            timeout = deadlines.clamp(timeout if timeout is not None else self._timeout)
+        except DeadlineExceeded:
+            coro.close()
+            raise
+        future = asyncio.run_coroutine_threadsafe(deadlines.within(deadlines.current(), coro), self._adapter.loop)
+        try:
+            # The async API bounds every call itself; the margin only guards against a stuck loop
+            return future.result(timeout=timeout + _SYNC_MARGIN_S)
+        except concurrent.futures.TimeoutError as e:
+            future.cancel()
+            raise DeadlineExceeded(f"MCP call did not return within {timeout + _SYNC_MARGIN_S:.1f}s; the adapter loop may be stuck.") from e
+        except BaseException:
+            # E.g. KeyboardInterrupt: do not leave the call running on the loop
+            future.cancel()
+            raise
 
     @property
     def _sessions(self):
@@ -59,39 +292,192 @@ class ExtendedMCPClient(MCPClient):
         if not sessions:
             raise RuntimeError("No active MCP sessions; call connect() first")
         return sessions
-        
 
-    def list_prompts(self, server_index: int = 0) -> ListPromptsResult:
-        return self._run_sync(self._sessions[server_index].list_prompts())
+    # Async API. Safe to await from any event loop, e.g. FastAPI's.
 
-    def get_prompt(
+    async def alist_prompts(self, server_index: int = 0) -> ListPromptsResult:
+        return await self._acached(server_index, "prompts", None, lambda s: s.list_prompts())
+
+    async def aget_prompt(
         self, name: str, arguments: dict[str, str] | None = None, server_index: int = 0
     ) -> GetPromptResult:
-        return self._run_sync(
-            self._sessions[server_index].get_prompt(name, arguments)
+        session = self._sessions[server_index]
+        return await self._on_adapter_loop(session.get_prompt(name, arguments), session=session, what=f"MCP prompt '{name}'")
+
+    async def alist_resources(self, server_index: int = 0) -> ListResourcesResult:
+        return await self._acached(server_index, "resources", None, lambda s: s.list_resources())
+
+    async def alist_resource_templates(self, server_index: int = 0) -> ListResourceTemplatesResult:
+        return await self._acached(
+            server_index, "resource_templates", None, lambda s: s.list_resource_templates()
         )
 
+    async def aread_resource(self, uri: str, server_index: int = 0) -> ReadResourceResult:
+        return await self._acached(server_index, "resource", str(uri), lambda s: s.read_resource(uri))
+
+    async def aread_resource_to_disk(
+        self, uri: str, dest_dir: str | Path, name: str | None = None, server_index: int = 0
+    ) -> list[ResourceFile]:
+        """
+        Read a resource and decode its contents into files in `dest_dir`, without keeping a
+        decoded copy in memory. Large datasets should be read this way instead of with
+        `read_resource`; the result bypasses the response cache.
+
+        Returns:
+            One ResourceFile per content, with its path, size and SHA-256.
+        """
+        session = self._sessions[server_index]
+        result = await self._on_adapter_loop(session.read_resource(uri), session=session, what=f"MCP resource '{uri}'")
+        # Decode off the event loop; the encoded text is released when this returns
+        return await asyncio.to_thread(save_resource, result, Path(dest_dir), name)
+
+    def _tool_server(self, name: str) -> int:
+        for index, tools in enumerate(self._adapter.mcp_tools):
+            if any(tool.name == name for tool in tools):
+                return index
+        raise KeyError(f"No connected MCP server has a tool named '{name}'.")
+
+    async def acall_tool(
+        self,
+        name: str,
+        arguments: dict[str, Any] | None = None,
+        server_index: int | None = None,
+        timeout: float | None = None,
+        progress_callback: ProgressFnT | None = None,
+    ) -> CallToolResult:
+        """
+        Call a tool by name. Without `server_index`, the server that listed the tool is used.
+        Without `timeout`, the tool's configured timeout applies (see `tool_timeout`).
+        Without `progress_callback`, progress goes to the current progress sink, if any.
+
+        Raises:
+            KeyError: If no connected server has the tool.
+            DeadlineExceeded: If the call did not finish in time; it is cancelled on the server.
+        """
+        index = self._tool_server(name) if server_index is None else server_index
+        session = self._sessions[index]
+        timeout = timeout if timeout is not None else self.tool_timeout(name)
+        progress_callback = progress_callback or progress.callback(name)
+        return await self._on_adapter_loop(
+            session.call_tool(name, arguments, progress_callback=progress_callback),
+            timeout, session=session, what=f"MCP tool '{name}'",
+        )
+
+    async def _gather(self, call_server, timeout: float) -> list[ServerResult]:
+        async def call(index: int, session) -> ServerResult:
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(call_server(index, session), timeout)
+                return ServerResult(index, result=result, elapsed_s=time.perf_counter() - start)
+            except Exception as e:
+                return ServerResult(index, error=e, elapsed_s=time.perf_counter() - start)
+
+        return list(await asyncio.gather(*(call(i, s) for i, s in enumerate(self._sessions))))
+
+    async def _fan_out(self, call_server, timeout: float | None) -> list[ServerResult]:
+        timeout = deadlines.clamp(timeout if timeout is not None else self._timeout, "MCP fan-out")
+        # Every call is bounded by wait_for; the margin only guards against a stuck loop
+        return await self._on_adapter_loop(self._gather(call_server, timeout), timeout=timeout + _SYNC_MARGIN_S)
+
+    async def acall_all(self, method: str, *args, timeout: float | None = None, **kwargs) -> list[ServerResult]:
+        """
+        Call a ClientSession method on every connected server at once.
+
+        All calls are scheduled on the adapter loop together, so the fan-out takes as long as
+        the slowest server. A server that fails or exceeds `timeout` does not affect the others.
+
+        Args:
+            method: ClientSession method name, e.g. "list_tools" or "send_ping".
+            timeout: Seconds each server may take. Defaults to the client timeout.
+
+        Returns:
+            One ServerResult per server, in server order.
+
+        Raises:
+            AttributeError: If `method` is not a public ClientSession method.
+        """
+        if method.startswith("_") or not callable(getattr(self._sessions[0], method, None)):
+            raise AttributeError(f"'{method}' is not an MCP session method.")
+        return await self._fan_out(lambda i, s: getattr(s, method)(*args, **kwargs), timeout)
+
+    def _partial(self, results: list[ServerResult], what: str) -> list[Any]:
+        for r in results:
+            if not r.ok:
+                warnings.warn(f"Listing {what} from MCP server {r.server_index} failed: {r.error!r}")
+        return [r.result for r in results]
+
+    async def alist_all_prompts(self, timeout: float | None = None) -> list[ListPromptsResult | None]:
+        """Query every connected server for prompts concurrently. Failed servers yield None."""
+        results = await self._fan_out(lambda i, _: self.alist_prompts(i), timeout)
+        return self._partial(results, "prompts")
+
+    async def alist_all_resources(self, timeout: float | None = None) -> list[ListResourcesResult | None]:
+        """Query every connected server for resources concurrently. Failed servers yield None."""
+        results = await self._fan_out(lambda i, _: self.alist_resources(i), timeout)
+        return self._partial(results, "resources")
+
+    # Sync API: blocks the calling thread on the async API above.
+
+    def list_prompts(self, server_index: int = 0) -> ListPromptsResult:
+        return self._run_sync(self.alist_prompts(server_index))
+
+    def get_prompt(
+        self, name: str, arguments: dict[str, str] | None = None, server_index: int = 0
+    ) -> GetPromptResult:
+        return self._run_sync(self.aget_prompt(name, arguments, server_index))
 
     def list_resources(self, server_index: int = 0) -> ListResourcesResult:
-        return self._run_sync(self._sessions[server_index].list_resources())
+        return self._run_sync(self.alist_resources(server_index))
 
     def list_resource_templates(self, server_index: int = 0) -> ListResourceTemplatesResult:
-        return self._run_sync(
-            self._sessions[server_index].list_resource_templates()
-        )
+        return self._run_sync(self.alist_resource_templates(server_index))
 
     def read_resource(self, uri: str, server_index: int = 0) -> ReadResourceResult:
-        return self._run_sync(self._sessions[server_index].read_resource(uri))
+        return self._run_sync(self.aread_resource(uri, server_index))
+
+    def read_resource_to_disk(
+        self, uri: str, dest_dir: str | Path, name: str | None = None, server_index: int = 0
+    ) -> list[ResourceFile]:
+        return self._run_sync(self.aread_resource_to_disk(uri, dest_dir, name, server_index))
 
+    def call_tool(
+        self,
+        name: str,
+        arguments: dict[str, Any] | None = None,
+        server_index: int | None = None,
+        timeout: float | None = None,
+        progress_callback: ProgressFnT | None = None,
+    ) -> CallToolResult:
+        timeout = timeout if timeout is not None else self.tool_timeout(name)
+        # The sink is looked up here: the call itself runs on the adapter loop, outside this context
+        progress_callback = progress_callback or progress.callback(name)
+        return self._run_sync(self.acall_tool(name, arguments, server_index, timeout, progress_callback), timeout=timeout)
+
+    def _fan_out_timeout(self, timeout: float | None) -> float:
+        return (timeout if timeout is not None else self._timeout) + _SYNC_MARGIN_S
+
+    def call_all(self, method: str, *args, timeout: float | None = None, **kwargs) -> list[ServerResult]:
+        """Sync counterpart of `acall_all`."""
+        return self._run_sync(
+            self.acall_all(method, *args, timeout=timeout, **kwargs), timeout=self._fan_out_timeout(timeout)
+        )
 
-    def list_all_prompts(self) -> list[ListPromptsResult]:
-        """Query every connected server for prompts."""
-        return [self.list_prompts(i) for i in range(len(self._sessions))]
+    def list_all_prompts(self, timeout: float | None = None) -> list[ListPromptsResult | None]:
+        return self._run_sync(self.alist_all_prompts(timeout), timeout=self._fan_out_timeout(timeout))
 
-    def list_all_resources(self) -> list[ListResourcesResult]:
-        """Query every connected server for resources."""
-        return [self.list_resources(i) for i in range(len(self._sessions))]
+    def list_all_resources(self, timeout: float | None = None) -> list[ListResourcesResult | None]:
+        return self._run_sync(self.alist_all_resources(timeout), timeout=self._fan_out_timeout(timeout))
+
+    @property
+    def structured_output(self) -> bool:
+        return self._adapter.adapter.structured_output
 
     @property
     def server_count(self) -> int:
         return len(self._sessions)
+
+    @property
+    def is_alive(self) -> bool:
+        """False once the adapter's session task has ended, e.g. after the transport dropped."""
+        task = self._adapter.task
+        return task is not None and not task.done() and self._adapter.thread.is_alive()
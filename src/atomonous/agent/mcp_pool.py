@@ -0,0 +1,551 @@
+"""
+Process-wide pool of MCP connections shared across agents.
+
+Every `ExtendedMCPClient` owns an event loop thread and a protocol session, and connecting
+costs a full handshake. Agents that talk to the same server therefore share one pooled
+connection, keyed by the server parameters. Each agent holds a refcounted `PooledMCPClient`
+handle; the connection closes when the last handle is released.
+
+A monitor thread pings idle connections and checks the adapter loop. When a connection
+drops, it is re-established with exponential backoff. The tools handed to agents are proxies
+that route each call to the current connection, so agents keep their tool objects across
+reconnects.
+
+With a `ToolSchemaCache`, a server seen before is handed out at once with the tools it listed
+last time, while the connection is made in the background. Calls wait for it. When the live
+listing differs from the cached one, the handles' tools are rebuilt and their listeners told.
+"""
+
+import copy
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import warnings
+import weakref
+from functools import partial
+from typing import Any, Callable, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from smolagents import Tool
+
+from atomonous.agent import deadlines
+from atomonous.agent.mcp_client import ExtendedMCPClient
+from atomonous.agent.mcp_schema_cache import CachedMCPTool, ToolSchemaCache, fingerprint, tool_spec
+from atomonous.config import settings
+
+CONNECTION_STATES = ("connecting", "healthy", "reconnecting", "closed")
+
+
+def _plain(server_parameters: Any) -> Any:
+    if hasattr(server_parameters, "model_dump"):
+        return server_parameters.model_dump(mode="json")
+    if isinstance(server_parameters, dict):
+        # MCPClient defaults a missing transport to streamable-http
+        return {"transport": "streamable-http", **server_parameters}
+    return server_parameters
+
+
+def server_key(server_parameters: Any, adapter_kwargs: Optional[dict] = None, structured_output: bool = False) -> str:
+    """
+    Canonical pool key: equal parameters in any key order share a connection. The key is a
+    hash, since the parameters may hold credentials (headers, env) and the key is stored
+    in the tool schema cache.
+    """
+    if isinstance(server_parameters, list):
+        params = [_plain(p) for p in server_parameters]
+    else:
+        params = _plain(server_parameters)
+    canonical = json.dumps(
+        {"server": params, "adapter_kwargs": adapter_kwargs or {}, "structured_output": structured_output},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+# Command-line options whose values are redacted from server labels
+_SECRET_OPTION = re.compile(r"(token|key|secret|passw|auth|credential)", re.IGNORECASE)
+
+
+def _redact_url(url: str) -> str:
+    """Drop user info, query and fragment, which may carry credentials."""
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    if parts.port:
+        host = f"{host}:{parts.port}"
+    return urlunsplit((parts.scheme, host, parts.path, "", "")) if parts.scheme else url.split("?")[0]
+
+
+def _redact_args(args: list[str]) -> list[str]:
+    redacted, hide_next = [], False
+    for arg in args:
+        if hide_next:
+            redacted.append("***")
+            hide_next = False
+        elif arg.startswith("-") and _SECRET_OPTION.search(arg):
+            if "=" in arg:
+                redacted.append(arg.split("=", 1)[0] + "=***")
+            else:
+                redacted.append(arg)
+                hide_next = True
+        else:
+            redacted.append(arg)
+    return redacted
+
+
+def server_label(server_parameters: Any) -> str:
+    """
+    Short name of a server for logs, health output and the schema cache. Headers and env are
+    left out, and credentials in URLs and command-line options are redacted.
+    """
+    if isinstance(server_parameters, list):
+        return ", ".join(server_label(p) for p in server_parameters)
+    if isinstance(server_parameters, dict):
+        url = server_parameters.get("url")
+        return _redact_url(str(url)) if url else "MCP server"
+    command = getattr(server_parameters, "command", None)
+    if command:
+        return " ".join([command, *_redact_args(list(getattr(server_parameters, "args", [])))])
+    url = getattr(server_parameters, "url", None)
+    return _redact_url(str(url)) if url else type(server_parameters).__name__
+
+
+def _close_quietly(client: Any) -> None:
+    """Disconnect in the background: closing joins the adapter thread, which may be stuck."""
+    def close():
+        try:
+            client.disconnect()
+        except Exception:
+            pass
+
+    threading.Thread(target=close, name="mcp-close", daemon=True).start()
+
+
+class PooledConnection:
+    """One shared connection and its health state. Guarded by the pool's lock."""
+
+    def __init__(self, key: str, server_parameters: Any, connect: Callable[..., Any]):
+        self.key = key
+        self.label = server_label(server_parameters)
+        self.server_parameters = server_parameters
+        self._connect = connect
+        self.client: Any = None
+        self.state = "connecting"
+        self.refcount = 0
+        self.reconnects = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.connected_at: Optional[float] = None
+        self.last_ok_at: Optional[float] = None
+        self.last_check_at = 0.0
+        self.next_attempt_at: Optional[float] = None
+        self.suspect = False
+        # Tools of the latest listing, cached or live: the templates of every handle's proxies
+        self.tools: list[Tool] = []
+        self.tools_version: Optional[str] = None
+        self.handles: weakref.WeakSet = weakref.WeakSet()
+        # Tools of the current client, by name
+        self.tools_by_name: dict[str, Tool] = {}
+        self._up = threading.Event()
+
+    def connect(self) -> Any:
+        # MCPClient fills in defaults on the parameters it is given
+        return self._connect(server_parameters=copy.deepcopy(self.server_parameters))
+
+    def current(self, timeout: float) -> Any:
+        """
+        The connected client, waiting up to `timeout` for a reconnect in progress.
+
+        Raises:
+            ConnectionError: If the server is not reachable in time or the connection is closed.
+        """
+        if not self._up.wait(timeout) or self.state != "healthy":
+            raise ConnectionError(f"MCP server {self.label} is {self.state}: {self.last_error}")
+        return self.client
+
+    def info(self) -> dict[str, Any]:
+        now = time.time()
+        return {
+            "server": self.label,
+            "state": self.state,
+            "refcount": self.refcount,
+            "reconnects": self.reconnects,
+            "consecutive_failures": self.failures,
+            "last_error": self.last_error,
+            "connected_at": self.connected_at,
+            "last_ok_at": self.last_ok_at,
+            "next_attempt_in_s": max(0.0, self.next_attempt_at - now) if self.next_attempt_at else None,
+            "tools": len(self.tools),
+            "tools_version": self.tools_version,
+        }
+
+
+class PooledMCPClient:
+    """
+    An agent's handle on a pooled connection. `disconnect()` releases the handle; the
+    connection itself closes when no handle is left. Other attributes, such as
+    `list_prompts` or `read_resource`, are those of the currently connected ExtendedMCPClient.
+    """
+
+    def __init__(self, pool: "MCPConnectionPool", connection: PooledConnection):
+        self._pool = pool
+        self._connection = connection
+        self._tools: Optional[list[Tool]] = None
+        self._listeners: list[Callable[[list[Tool]], None]] = []
+        self._released = False
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self._client(f"MCP '{name}'"), name)
+
+    def _client(self, what: str) -> Any:
+        # Waiting for a reconnect uses up the caller's budget like the call itself
+        return self._connection.current(deadlines.clamp(self._pool.reconnect_wait_s, what))
+
+    def get_tools(self) -> list[Tool]:
+        if self._tools is None:
+            self._tools = []
+            for template in self._connection.tools:
+                proxy = copy.copy(template)
+                proxy.forward = partial(self._call_tool, template.name)
+                self._tools.append(proxy)
+        return self._tools
+
+    def on_tools_changed(self, callback: Callable[[list[Tool]], None]) -> None:
+        """Call `callback(tools)` whenever the server's live listing replaces the tools handed out."""
+        self._listeners.append(callback)
+
+    def _tools_changed(self) -> None:
+        self._tools = None
+        tools = self.get_tools()
+        for callback in list(self._listeners):
+            try:
+                callback(tools)
+            except Exception as e:
+                warnings.warn(f"MCP tools listener failed: {e}")
+
+    def _call_tool(self, name: str, *args, **kwargs):
+        self._client(f"MCP tool '{name}'")
+        tool = self._connection.tools_by_name.get(name)
+        if tool is None:
+            raise KeyError(f"MCP server {self._connection.label} no longer has a tool named '{name}'.")
+        return self._reporting(tool.forward, *args, **kwargs)
+
+    def _reporting(self, call: Callable, *args, **kwargs):
+        try:
+            return call(*args, **kwargs)
+        except Exception as e:
+            # Possibly a dropped connection: have the monitor check it now
+            self._pool.report_failure(self._connection, e)
+            raise
+
+    def call_tool(self, name: str, arguments: Optional[dict[str, Any]] = None, **kwargs) -> Any:
+        """
+        Call a tool and return the raw CallToolResult, like ExtendedMCPClient.call_tool, with
+        the handle's tools' handling of reconnects and failures.
+        """
+        client = self._client(f"MCP tool '{name}'")
+        return self._reporting(client.call_tool, name, arguments, **kwargs)
+
+    def health(self) -> dict[str, Any]:
+        return self._connection.info()
+
+    def disconnect(self, *args) -> None:
+        if not self._released:
+            self._released = True
+            self._listeners.clear()
+            self._connection.handles.discard(self)
+            self._pool.release(self._connection)
+
+
+class MCPConnectionPool:
+    """
+    Shares MCP connections across agents and keeps them alive.
+
+    Args:
+        connect_fn: Creates a connected client; called with server_parameters, adapter_kwargs
+            and structured_output.
+        health_interval_s: Seconds between pings of an idle connection.
+        ping_timeout_s: Seconds a ping may take before the connection counts as dropped.
+        backoff_base_s: Delay before the second reconnect attempt; doubled after each failure.
+        backoff_max_s: Upper bound of the reconnect delay.
+        reconnect_wait_s: Seconds a tool call waits for a reconnect in progress before failing.
+        schema_cache: Cache of the servers' tool schemas. Servers found in it are connected in
+            the background.
+    """
+
+    def __init__(
+        self,
+        connect_fn: Callable[..., Any] = ExtendedMCPClient,
+        health_interval_s: float = 15.0,
+        ping_timeout_s: float = 5.0,
+        backoff_base_s: float = 1.0,
+        backoff_max_s: float = 60.0,
+        reconnect_wait_s: float = 10.0,
+        schema_cache: Optional[ToolSchemaCache] = None,
+    ):
+        self.connect_fn = connect_fn
+        self.schema_cache = schema_cache
+        self.health_interval_s = health_interval_s
+        self.ping_timeout_s = ping_timeout_s
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.reconnect_wait_s = reconnect_wait_s
+
+        self._connections: dict[str, PooledConnection] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._monitor: Optional[threading.Thread] = None
+
+    def acquire(
+        self,
+        server_parameters: Any,
+        adapter_kwargs: Optional[dict] = None,
+        structured_output: bool = False,
+        timeout: float = 30,
+    ) -> PooledMCPClient:
+        """
+        Return a handle on the pooled connection to a server, connecting if needed. A server
+        in the schema cache is returned at once with its cached tools and connected in the
+        background; until then, tool calls wait for the connection.
+
+        Raises:
+            ConnectionError: If the first connection to a server without cached tools fails.
+        """
+        key = server_key(server_parameters, adapter_kwargs, structured_output)
+        with self._lock:
+            connection = self._connections.get(key)
+            created = connection is None
+            if created:
+                # Calls take their timeouts from settings, not from the wait for the connection
+                connect = partial(self.connect_fn, adapter_kwargs=adapter_kwargs, structured_output=structured_output)
+                connection = self._connections[key] = PooledConnection(key, server_parameters, connect)
+            connection.refcount += 1
+
+        if created:
+            cached = self.schema_cache.load(key) if self.schema_cache else None
+            if cached:
+                connection.tools = [CachedMCPTool(spec) for spec in cached["tools"]]
+                connection.tools_version = cached["version"]
+                threading.Thread(
+                    target=self._open, args=(connection, True), name="mcp-pool-connect", daemon=True
+                ).start()
+            else:
+                self._open(connection)
+            self._ensure_monitor()
+        else:
+            if connection.tools_version is None:
+                connection._up.wait(timeout)
+            if connection.state == "closed" or connection.tools_version is None:
+                self.release(connection)
+                raise ConnectionError(f"MCP server {connection.label} is {connection.state}: {connection.last_error}")
+
+        handle = PooledMCPClient(self, connection)
+        connection.handles.add(handle)
+        return handle
+
+    def _open(self, connection: PooledConnection, background: bool = False) -> None:
+        try:
+            client = connection.connect()
+        except Exception as e:
+            if background:
+                # Agents already hold the cached tools: keep retrying like a dropped connection
+                with self._lock:
+                    if connection.state == "connecting":
+                        connection.state = "reconnecting"
+                    self._backoff(connection, e)
+                self._wake.set()
+                print(f"[MCPPool] Could not connect to {connection.label}, retrying: {e}")
+                return
+            with self._lock:
+                if self._connections.get(connection.key) is connection:
+                    del self._connections[connection.key]
+                connection.state, connection.last_error = "closed", repr(e)
+            connection._up.set()
+            raise ConnectionError(f"Could not connect to MCP server {connection.label}: {e}") from e
+
+        if self._install(connection, client, expected="connecting"):
+            print(f"[MCPPool] Connected to {connection.label} ({len(connection.tools)} tools)")
+
+    def _backoff(self, connection: PooledConnection, error: BaseException) -> None:
+        """Schedule the next connect attempt. Call with the lock held."""
+        connection.failures += 1
+        connection.last_error = repr(error)
+        delay = min(self.backoff_max_s, self.backoff_base_s * 2 ** (connection.failures - 1))
+        # Jitter so many processes do not hammer a restarting server in lockstep
+        connection.next_attempt_at = time.time() + delay * random.uniform(0.5, 1.0)
+
+    def _install(self, connection: PooledConnection, client: Any, expected: str) -> bool:
+        """
+        Make `client` the connection's current client and revalidate the tools handed out
+        against its listing.
+
+        Returns:
+            False if the connection left the `expected` state meanwhile, e.g. it was released.
+        """
+        live_tools = client.get_tools()
+        specs = [tool_spec(t) for t in live_tools]
+        version = fingerprint(specs)
+        with self._lock:
+            if connection.state != expected:
+                _close_quietly(client)
+                return False
+            changed = connection.tools_version is not None and version != connection.tools_version
+            if changed or connection.tools_version is None:
+                connection.tools = live_tools
+            connection.tools_version = version
+            connection.client = client
+            connection.tools_by_name = {t.name: t for t in live_tools}
+            if connection.state == "reconnecting":
+                connection.reconnects += 1
+            connection.state = "healthy"
+            connection.failures = 0
+            connection.next_attempt_at = None
+            connection.connected_at = connection.last_ok_at = connection.last_check_at = time.time()
+            handles = list(connection.handles) if changed else []
+        connection._up.set()
+
+        if self.schema_cache is not None:
+            try:
+                self.schema_cache.save(connection.key, connection.label, live_tools)
+            except OSError as e:
+                warnings.warn(f"Could not cache the tool schemas of {connection.label}: {e}")
+        if changed:
+            print(f"[MCPPool] Tools of {connection.label} changed (version {version}); updating agents")
+            for handle in handles:
+                handle._tools_changed()
+        return True
+
+    def release(self, connection: PooledConnection) -> None:
+        """Drop one reference; the last one closes the connection."""
+        with self._lock:
+            connection.refcount -= 1
+            if connection.refcount > 0:
+                return
+            if self._connections.get(connection.key) is connection:
+                del self._connections[connection.key]
+            client, connection.client = connection.client, None
+            connection.state = "closed"
+        connection._up.set()
+        if client is not None:
+            _close_quietly(client)
+            print(f"[MCPPool] Closed connection to {connection.label}")
+
+    def report_failure(self, connection: PooledConnection, error: BaseException) -> None:
+        """A call on the connection failed: check its health without waiting for the next interval."""
+        connection.suspect = True
+        self._wake.set()
+
+    # Monitoring
+
+    def _ensure_monitor(self) -> None:
+        with self._lock:
+            if self._monitor is None or not self._monitor.is_alive():
+                self._stopped = False
+                self._monitor = threading.Thread(target=self._run_monitor, name="mcp-pool-monitor", daemon=True)
+                self._monitor.start()
+
+    def _run_monitor(self) -> None:
+        while not self._stopped:
+            with self._lock:
+                connections = list(self._connections.values())
+            if not connections:
+                with self._lock:
+                    if not self._connections:
+                        self._monitor = None
+                        return
+                continue
+
+            now = time.time()
+            wait = self.health_interval_s
+            for connection in connections:
+                if connection.state == "healthy":
+                    if connection.suspect or now - connection.last_check_at >= self.health_interval_s:
+                        self._check(connection)
+                    wait = min(wait, max(0.0, connection.last_check_at + self.health_interval_s - now))
+                elif connection.state == "reconnecting":
+                    if now >= connection.next_attempt_at:
+                        self._reconnect(connection)
+                    if connection.state == "reconnecting":
+                        wait = min(wait, max(0.0, connection.next_attempt_at - time.time()))
+            self._wake.wait(max(wait, 0.05))
+            self._wake.clear()
+
+    def _check(self, connection: PooledConnection) -> None:
+        connection.suspect = False
+        connection.last_check_at = time.time()
+        client = connection.client
+        if client is None:
+            return
+        error = None
+        if not client.is_alive:
+            error = "session closed"
+        else:
+            try:
+                failed = [r for r in client.call_all("send_ping", timeout=self.ping_timeout_s) if not r.ok]
+                if failed:
+                    error = repr(failed[0].error)
+            except Exception as e:
+                error = repr(e)
+        if error is None:
+            connection.last_ok_at = time.time()
+            return
+        self._mark_down(connection, error)
+
+    def _mark_down(self, connection: PooledConnection, error: str) -> None:
+        with self._lock:
+            if connection.state != "healthy":
+                return
+            connection.state = "reconnecting"
+            connection.last_error = error
+            connection.failures = 0
+            connection.next_attempt_at = time.time()
+            client, connection.client = connection.client, None
+            connection._up.clear()
+        print(f"[MCPPool] Lost connection to {connection.label}: {error}")
+        if client is not None:
+            _close_quietly(client)
+
+    def _reconnect(self, connection: PooledConnection) -> None:
+        try:
+            client = connection.connect()
+        except Exception as e:
+            with self._lock:
+                self._backoff(connection, e)
+            return
+
+        if self._install(connection, client, expected="reconnecting"):
+            print(f"[MCPPool] Reconnected to {connection.label} (reconnect #{connection.reconnects})")
+
+    def health(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [c.info() for c in self._connections.values()]
+
+    def shutdown(self) -> None:
+        """Close every connection regardless of its references."""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._stopped = True
+        self._wake.set()
+        for connection in connections:
+            client, connection.client = connection.client, None
+            connection.state = "closed"
+            connection._up.set()
+            if client is not None:
+                _close_quietly(client)
+
+
+# Shared by every agent in the process
+mcp_pool = MCPConnectionPool(
+    health_interval_s=settings.mcp_health_interval_s,
+    ping_timeout_s=settings.mcp_ping_timeout_s,
+    backoff_base_s=settings.mcp_reconnect_base_s,
+    backoff_max_s=settings.mcp_reconnect_max_s,
+    schema_cache=ToolSchemaCache(settings.mcp_tool_cache_dir) if settings.mcp_tool_cache_enabled else None,
+)
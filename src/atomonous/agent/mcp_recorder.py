@@ -0,0 +1,236 @@
+"""
+Record and replay of MCP tool calls.
+
+Recording wraps the raw call under an agent's MCP tools and appends every call's arguments,
+raw CallToolResult and latency to a JSON Lines file, one compact record per line. The file
+also holds the MCP definitions of the recorded tools.
+
+Replaying rebuilds the same tools from those definitions and serves the recorded responses
+without connecting to a server. The responses pass through the same conversion as live
+ones, so everything downstream of the tools sees identical inputs: agent runs can be
+repeated offline and benchmarked against each other.
+
+Record lines:
+    {"type": "tools", "client": 0, "structured_output": false, "tools": [{"server": 0, "name": ..., ...}]}
+    {"type": "call", "seq": 1, "client": 0, "server": 0, "tool": ..., "arguments": {...},
+     "started_at": ..., "latency_s": ..., "response": {...}}   # or "error": {"type", "message"}
+"""
+
+import copy
+import json
+import threading
+import time
+import warnings
+from collections import defaultdict
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from mcp.types import CallToolResult, Tool as McpTool
+from smolagents import Tool
+
+from atomonous.agent import deadlines
+from atomonous.agent.deadlines import DeadlineExceeded
+
+RECORDING_NAME = "mcp_calls.jsonl"
+
+
+def _dumps(record: dict[str, Any]) -> str:
+    return json.dumps(record, separators=(",", ":"), default=str)
+
+
+def _arguments_key(arguments: Optional[dict[str, Any]]) -> str:
+    return json.dumps(arguments or {}, sort_keys=True, default=str)
+
+
+class MCPCallRecorder:
+    """
+    Appends the MCP tool calls of an agent to a JSON Lines file.
+
+    Args:
+        path: Recording file; created on the first write and appended to afterwards.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = None
+        self._seq = 0
+        self._clients = 0
+
+    def _write(self, record: dict[str, Any]) -> None:
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            if record["type"] == "call":
+                # Numbered in the order calls finish, which is the order they are written
+                self._seq += 1
+                record = {"type": "call", "seq": self._seq, **record}
+            self._file.write(_dumps(record) + "\n")
+            self._file.flush()
+
+    def tools_for(self, client: Any) -> list[Tool]:
+        """
+        Tools of an ExtendedMCPClient or pooled handle whose calls are recorded.
+
+        The tools stand in for `client.get_tools()`, so a pooled handle serving cached schemas
+        needs no connection yet. The tools' definitions are written before the first call, once
+        the client is connected, so the recording can be replayed on its own. Calls go through
+        `client.call_tool`, which a pooled handle routes to the client connected at that time.
+        """
+        with self._lock:
+            client_id = self._clients
+            self._clients += 1
+        adapted: dict[str, Tool] = {}
+        lock = threading.Lock()
+
+        def connected_tools() -> dict[str, Tool]:
+            with lock:
+                if not adapted:
+                    self._write({
+                        "type": "tools",
+                        "client": client_id,
+                        "structured_output": bool(getattr(client, "structured_output", False)),
+                        "tools": [
+                            {"server": index, **tool.model_dump(mode="json", by_alias=True, exclude_none=True)}
+                            for index, tool in client.tool_definitions()
+                        ],
+                    })
+                    call = lambda index, name, arguments: client.call_tool(name, arguments, server_index=index)
+                    adapted.update((tool.name, tool) for tool in client.adapt_tools(self.wrap(call, client_id)))
+                return adapted
+
+        def forward(name: str, *args, **kwargs):
+            tool = connected_tools().get(name)
+            if tool is None:
+                raise KeyError(f"MCP tool '{name}' is no longer listed by its server.")
+            return tool.forward(*args, **kwargs)
+
+        tools = []
+        for template in client.get_tools():
+            proxy = copy.copy(template)
+            proxy.forward = partial(forward, template.name)
+            tools.append(proxy)
+        return tools
+
+    def wrap(self, call: Callable[[int, str, Optional[dict]], CallToolResult], client_id: int = 0):
+        """Wrap `call(server_index, name, arguments)` so that every call is recorded."""
+
+        def recorded(server_index: int, name: str, arguments: Optional[dict[str, Any]] = None) -> CallToolResult:
+            record = {
+                "type": "call", "client": client_id, "server": server_index,
+                "tool": name, "arguments": arguments or {}, "started_at": time.time(),
+            }
+            start = time.perf_counter()
+            try:
+                result = call(server_index, name, arguments)
+            except Exception as e:
+                record.update(latency_s=time.perf_counter() - start, error={"type": type(e).__name__, "message": str(e)})
+                self._write(record)
+                raise
+            record.update(
+                latency_s=time.perf_counter() - start,
+                response=result.model_dump(mode="json", by_alias=True, exclude_none=True),
+            )
+            self._write(record)
+            return result
+
+        return recorded
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class MCPCallReplayer:
+    """
+    Serves the calls of a recording in place of an MCP server. Attach it to an agent like a
+    client: `get_tools()` returns the recorded tools.
+
+    A call is answered with the earliest unused record of the same tool and arguments. If the
+    arguments were not recorded, the earliest unused record of the tool is used with a
+    warning, so a re-run whose arguments drift still proceeds.
+
+    Args:
+        path: Recording written by MCPCallRecorder.
+        timing: Wait as long as each recorded call took, bounded by the caller's budget.
+    """
+
+    def __init__(self, path: str | Path, timing: bool = False):
+        self.path = Path(path)
+        self.timing = timing
+        self._lock = threading.Lock()
+        self._headers: list[dict[str, Any]] = []
+        self._records: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record["type"] == "tools":
+                    self._headers.append(record)
+                elif record["type"] == "call":
+                    self._records[record["tool"]].append(record)
+        self._tools: Optional[list[Tool]] = None
+
+    def remaining(self) -> int:
+        """Number of recorded calls not served yet."""
+        with self._lock:
+            return sum(len(records) for records in self._records.values())
+
+    def _take(self, name: str, arguments: Optional[dict[str, Any]]) -> dict[str, Any]:
+        with self._lock:
+            records = self._records.get(name)
+            if not records:
+                raise KeyError(f"No recorded call of MCP tool '{name}' is left to replay.")
+            key = _arguments_key(arguments)
+            for i, record in enumerate(records):
+                if _arguments_key(record["arguments"]) == key:
+                    return records.pop(i)
+            record = records.pop(0)
+        warnings.warn(f"Replaying '{name}' with recorded arguments {record['arguments']} instead of {arguments}.")
+        return record
+
+    def call(self, server_index: int, name: str, arguments: Optional[dict[str, Any]] = None) -> CallToolResult:
+        """
+        Return the recorded response of a call, or raise its recorded error.
+
+        Raises:
+            KeyError: If no unused record of the tool is left.
+            DeadlineExceeded: If the recorded call timed out, or its timing exceeds the budget.
+        """
+        record = self._take(name, arguments)
+        if self.timing:
+            delay = record.get("latency_s", 0.0)
+            left = deadlines.remaining()
+            if left is not None and delay > left:
+                time.sleep(max(0.0, left))
+                raise DeadlineExceeded(f"Replayed MCP tool '{name}' took {delay:.1f}s, more than the budget left.")
+            time.sleep(delay)
+        error = record.get("error")
+        if error is not None:
+            if error["type"] in ("DeadlineExceeded", "TimeoutError"):
+                raise DeadlineExceeded(error["message"])
+            raise RuntimeError(f"{error['type']}: {error['message']}")
+        return CallToolResult.model_validate(record["response"])
+
+    def get_tools(self) -> list[Tool]:
+        if self._tools is None:
+            from mcpadapt.smolagents_adapter import SmolAgentsAdapter
+
+            self._tools, seen = [], set()
+            for header in self._headers:
+                adapter = SmolAgentsAdapter(structured_output=header.get("structured_output", False))
+                for definition in header["tools"]:
+                    tool = McpTool.model_validate(definition)
+                    if tool.name in seen:
+                        continue
+                    seen.add(tool.name)
+                    self._tools.append(adapter.adapt(partial(self.call, definition["server"], tool.name), tool))
+        return self._tools
+
+    def disconnect(self, *args) -> None:
+        pass
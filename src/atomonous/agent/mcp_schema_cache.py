@@ -0,0 +1,119 @@
+"""
+On-disk cache of MCP tool schemas for fast agent startup.
+
+Connecting to an MCP server and listing its tools takes a handshake and a round trip per
+server before the agent can render its first prompt. The schemas of the tools a server
+listed last time are stored per server and per server version, so an agent can register
+them at once while the connection is made in the background. The fresh listing then
+revalidates the cached one; when it differs, the cache and the agent's tools are updated.
+
+mcpadapt does not expose the server's InitializeResult, so the version of a listing is a
+fingerprint of the tool schemas themselves.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from smolagents import Tool
+
+# Listings kept per server; older versions are dropped
+MAX_VERSIONS = 4
+
+
+def tool_spec(tool: Tool) -> dict[str, Any]:
+    """The parts of a tool the agent needs to describe it to the model."""
+    return {
+        "name": tool.name,
+        "description": tool.description,
+        "inputs": tool.inputs,
+        "output_type": tool.output_type,
+        "output_schema": getattr(tool, "output_schema", None),
+    }
+
+
+def fingerprint(specs: list[dict[str, Any]]) -> str:
+    canonical = json.dumps(sorted(specs, key=lambda s: s["name"]), sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+class CachedMCPTool(Tool):
+    """
+    A tool registered from a cached schema. Calls go to `call(name, *args, **kwargs)`, which
+    runs the live tool once the server is connected.
+    """
+
+    skip_forward_signature_validation = True
+
+    def __init__(self, spec: dict[str, Any], call: Optional[Callable[..., Any]] = None):
+        self.name = spec["name"]
+        self.description = spec["description"]
+        self.inputs = spec["inputs"]
+        self.output_type = spec["output_type"]
+        self.output_schema = spec.get("output_schema")
+        self._call = call
+        self.is_initialized = True
+
+    def forward(self, *args, **kwargs):
+        if self._call is None:
+            raise RuntimeError(f"Tool '{self.name}' is not connected to an MCP server.")
+        return self._call(self.name, *args, **kwargs)
+
+
+class ToolSchemaCache:
+    """
+    Tool schemas per server, one JSON file per server key holding its recent versions.
+
+    Args:
+        cache_dir: Directory of the cache files.
+    """
+
+    def __init__(self, cache_dir: str | Path):
+        self.cache_dir = Path(cache_dir).expanduser()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha1(key.encode()).hexdigest()[:20]}.json"
+
+    def _read(self, key: str) -> dict[str, Any]:
+        try:
+            with open(self._path(key)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Guard against hash collisions and foreign files
+        return data if data.get("key") == key else {}
+
+    def load(self, key: str, version: Optional[str] = None) -> Optional[dict[str, Any]]:
+        """
+        Return a cached listing: {"version", "saved_at", "tools": [spec, ...]}.
+        Without `version`, the most recently saved one.
+        """
+        data = self._read(key)
+        version = version or data.get("latest")
+        return data.get("versions", {}).get(version) if version else None
+
+    def save(self, key: str, label: str, tools: list[Tool]) -> dict[str, Any]:
+        """Store the listing of a server as its latest version and return the entry."""
+        specs = [tool_spec(t) for t in tools]
+        entry = {"version": fingerprint(specs), "saved_at": time.time(), "tools": specs}
+
+        data = self._read(key) or {"key": key, "server": label, "versions": {}}
+        data["versions"][entry["version"]] = entry
+        data["latest"] = entry["version"]
+        for old in sorted(data["versions"].values(), key=lambda e: e["saved_at"])[:-MAX_VERSIONS]:
+            del data["versions"][old["version"]]
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, default=str)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return entry
@@ -1,8 +1,14 @@
+import threading
 from typing import Any, List, Optional
-from smolagents.models import LiteLLMModel
-from smolagents.models import ChatMessage, ChatMessageStreamDelta
+from smolagents.models import LiteLLMModel, TransformersModel
+from smolagents.models import ChatMessage, ChatMessageStreamDelta, MessageRole, remove_content_after_stop_sequences
+from smolagents.monitoring import TokenUsage
 
-class SafeLiteLLMModel(LiteLLMModel):
+from atomonous.agent.batching import BatchScheduler, GenerationRequest
+from atomonous.agent.prefix_cache import PrefixKVCache
+from atomonous.agent.telemetry import CallAccountingMixin
+
+class SafeLiteLLMModel(CallAccountingMixin, LiteLLMModel):
     """
     A subclass of LiteLLMModel that intercepts stop_sequences.
     This prevents the underlying backend (like Transformers Server) 
@@ -82,3 +88,145 @@ class SafeLiteLLMModel(LiteLLMModel):
         # Flush any remaining non-stop text
         if buffer:
             yield ChatMessageStreamDelta(content=buffer)
+
+
+class LocalTransformersModel(CallAccountingMixin, TransformersModel):
+    """
+    A subclass of TransformersModel for locally hosted weights.
+    Reuses the KV cache of the prompt prefix shared with the previous call, so each agent
+    step only encodes the new suffix instead of the full system prompt and history.
+    With `enable_batching`, concurrent calls from several agents are decoded together.
+    """
+
+    _probe_first_token = True
+
+    def __init__(self, *args: Any, prefix_cache: Optional[PrefixKVCache] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # Image inputs are not part of the token ids, so the prefix match would be unsound for VLMs
+        self.prefix_cache = prefix_cache if not self._is_vlm else None
+        self._pending_prefix = threading.local()
+        self.batcher: Optional[BatchScheduler] = None
+
+    def enable_batching(self, max_batch_size: int = 4, max_wait_s: float = 0.01) -> None:
+        """
+        Route generation through a BatchScheduler. Call after the weights are final
+        (e.g. after quantization), since the scheduler holds the underlying model.
+        """
+        if self._is_vlm:
+            return
+        self.batcher = BatchScheduler(
+            self.model,
+            self.tokenizer,
+            max_batch_size=max_batch_size,
+            max_wait_s=max_wait_s,
+            prefix_cache=self.prefix_cache,
+        )
+
+    def _submit(self, messages: Any, stop_sequences: Optional[List[str]], kwargs: dict[str, Any]) -> tuple[GenerationRequest, int]:
+        if kwargs.pop("response_format", None) is not None:
+            raise ValueError("Transformers does not support structured outputs, use VLLMModel for this.")
+        # Bypass the per-call prefix handling; the scheduler owns the cache while batching
+        generation_kwargs = TransformersModel._prepare_completion_args(
+            self, messages=messages, stop_sequences=stop_sequences, **kwargs
+        )
+        input_ids = generation_kwargs.pop("inputs")
+        streamer = generation_kwargs.pop("streamer", None)
+        max_new_tokens = generation_kwargs.pop("max_new_tokens")
+        for key in ("use_cache", "stopping_criteria"):
+            generation_kwargs.pop(key, None)
+        request = self.batcher.submit(input_ids, max_new_tokens, stop_sequences, generation_kwargs, streamer=streamer)
+        return request, input_ids.shape[-1]
+
+    def _prepare_completion_args(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        generation_kwargs = super()._prepare_completion_args(*args, **kwargs)
+        self._pending_prefix.entry = None
+        if self.prefix_cache is not None and "past_key_values" not in generation_kwargs:
+            from transformers import DynamicCache
+
+            input_ids = generation_kwargs["inputs"]
+            cache, _ = self.prefix_cache.take(input_ids)
+            if cache is None:
+                cache = DynamicCache()
+            generation_kwargs["past_key_values"] = cache
+            self._pending_prefix.entry = (input_ids, cache)
+        return generation_kwargs
+
+    def _store_prefix(self) -> None:
+        entry = getattr(self._pending_prefix, "entry", None)
+        self._pending_prefix.entry = None
+        if entry is not None and self.prefix_cache is not None:
+            self.prefix_cache.put(*entry)
+
+    def generate(self, *args: Any, **kwargs: Any) -> ChatMessage:
+        if self.batcher is not None:
+            # Bypasses super(), so the call is recorded here
+            return self._accounted(self._generate_batched, *args, **kwargs)
+        try:
+            response = super().generate(*args, **kwargs)
+        except Exception:
+            self._pending_prefix.entry = None
+            raise
+        self._store_prefix()
+        # TransformersModel keeps the generation kwargs in the message, which the agent memory
+        # holds on to; the KV cache must only live in the bounded prefix cache
+        completion_kwargs = (response.raw or {}).get("completion_kwargs")
+        if isinstance(completion_kwargs, dict):
+            completion_kwargs.pop("past_key_values", None)
+        return response
+
+    def generate_stream(self, *args: Any, **kwargs: Any) -> Any:
+        if self.batcher is not None:
+            yield from self._accounted_stream(self._generate_stream_batched, *args, **kwargs)
+            return
+        completed = False
+        try:
+            yield from super().generate_stream(*args, **kwargs)
+            completed = True
+        finally:
+            if completed:
+                self._store_prefix()
+            else:
+                # The generation thread may still be writing into the cache; drop it
+                self._pending_prefix.entry = None
+
+    def _generate_batched(self, messages: Any, stop_sequences: Optional[List[str]] = None, **kwargs: Any) -> ChatMessage:
+        request, prompt_tokens = self._submit(messages, stop_sequences, kwargs)
+        tokens = request.result()
+        output_text = self.tokenizer.decode(tokens, skip_special_tokens=True)
+        if stop_sequences is not None:
+            output_text = remove_content_after_stop_sequences(output_text, stop_sequences)
+        return ChatMessage(
+            role=MessageRole.ASSISTANT,
+            content=output_text,
+            raw={"out": output_text, "batch_size": request.batch_size},
+            token_usage=TokenUsage(input_tokens=prompt_tokens, output_tokens=len(tokens)),
+        )
+
+    def _generate_stream_batched(self, messages: Any, stop_sequences: Optional[List[str]] = None, **kwargs: Any) -> Any:
+        request, prompt_tokens = self._submit(messages, stop_sequences, kwargs)
+        tokens: list[int] = []
+        emitted = ""
+        unreported = 0
+        try:
+            for token in request:
+                tokens.append(token)
+                unreported += 1
+                text = self.tokenizer.decode(tokens, skip_special_tokens=True)
+                # Hold back incomplete multi-byte characters until the next token completes them
+                if text.endswith("\ufffd") or len(text) <= len(emitted):
+                    continue
+                yield ChatMessageStreamDelta(
+                    content=text[len(emitted):],
+                    token_usage=TokenUsage(input_tokens=prompt_tokens, output_tokens=unreported),
+                )
+                emitted, prompt_tokens, unreported = text, 0, 0
+            if unreported:
+                text = self.tokenizer.decode(tokens, skip_special_tokens=True)
+                yield ChatMessageStreamDelta(
+                    content=text[len(emitted):],
+                    token_usage=TokenUsage(input_tokens=prompt_tokens, output_tokens=unreported),
+                )
+        finally:
+            # A consumer that stops early frees its batch row
+            request.cancel()
+        self._last_output_token_count = len(tokens)
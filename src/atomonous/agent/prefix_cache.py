@@ -0,0 +1,171 @@
+"""
+Prompt-prefix KV cache reuse for local transformers models.
+
+Consecutive CodeAgent steps send the same system prompt, tool descriptions and history,
+followed by a short new suffix. Keeping the KV cache of the previous prompt lets the next
+call encode only the tokens after the longest shared prefix.
+"""
+
+import threading
+from typing import Any, Optional
+
+import torch
+
+
+def _cache_nbytes(cache: Any) -> int:
+    """Total bytes held by the key/value tensors of a transformers Cache."""
+    total = 0
+    layers = getattr(cache, "layers", None)
+    if layers is not None:
+        for layer in layers:
+            for name in ("keys", "values"):
+                tensor = getattr(layer, name, None)
+                if isinstance(tensor, torch.Tensor):
+                    total += tensor.numel() * tensor.element_size()
+        return total
+    # Older transformers releases keep flat per-layer lists
+    for name in ("key_cache", "value_cache"):
+        for tensor in getattr(cache, name, []) or []:
+            if isinstance(tensor, torch.Tensor):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def _is_croppable(cache: Any) -> bool:
+    """Sliding-window layers drop old positions and cannot be cropped back to a prefix."""
+    sliding = getattr(cache, "is_sliding", None)
+    if sliding is None:
+        return hasattr(cache, "crop")
+    try:
+        return hasattr(cache, "crop") and not any(sliding)
+    except TypeError:
+        return hasattr(cache, "crop") and not sliding
+
+
+class PrefixKVCache:
+    """
+    Single-slot store for the KV cache of the most recent prompt.
+
+    `take()` hands out the cache cropped to the prefix it shares with the new prompt,
+    `put()` stores the cache of a finished call cropped back to its prompt. Ownership moves
+    with the cache object, so two concurrent calls never write into the same cache.
+    """
+
+    def __init__(self, max_tokens: int = 32768, max_bytes: Optional[int] = None, min_reuse_tokens: int = 16):
+        """
+        Args:
+            max_tokens: Maximum number of prompt tokens kept in the cache.
+            max_bytes: Maximum size of the cached key/value tensors. None disables the byte cap.
+            min_reuse_tokens: Shared prefixes shorter than this are not worth reusing.
+        """
+        self.max_tokens = max_tokens
+        self.max_bytes = max_bytes
+        self.min_reuse_tokens = min_reuse_tokens
+
+        self._lock = threading.Lock()
+        self._ids: Optional[torch.Tensor] = None
+        self._cache: Any = None
+
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+        self.encoded_tokens = 0
+
+    @staticmethod
+    def _flatten_ids(input_ids: torch.Tensor) -> Optional[torch.Tensor]:
+        """Single-sequence prompts only; batched inputs bypass the cache."""
+        if input_ids.dim() == 2:
+            if input_ids.shape[0] != 1:
+                return None
+            input_ids = input_ids[0]
+        return input_ids.detach().to("cpu")
+
+    @staticmethod
+    def _common_prefix_length(a: torch.Tensor, b: torch.Tensor) -> int:
+        n = min(a.shape[0], b.shape[0])
+        if n == 0:
+            return 0
+        mismatch = (a[:n] != b[:n]).nonzero()
+        return int(mismatch[0]) if mismatch.numel() else n
+
+    def take(self, input_ids: torch.Tensor) -> tuple[Any, int]:
+        """
+        Remove the stored cache and return it cropped to the prefix shared with `input_ids`.
+
+        Returns:
+            (cache, reused_tokens). cache is None when nothing can be reused.
+        """
+        ids = self._flatten_ids(input_ids)
+        with self._lock:
+            cached_ids, cache = self._ids, self._cache
+            self._ids, self._cache = None, None
+
+        if ids is None or cache is None or cached_ids is None:
+            self._record_miss(ids)
+            return None, 0
+
+        # At least one token has to be fed to the model to produce logits
+        reuse = min(self._common_prefix_length(cached_ids, ids), ids.shape[0] - 1)
+        if reuse < self.min_reuse_tokens:
+            self._record_miss(ids)
+            return None, 0
+
+        if cache.get_seq_length() > reuse:
+            cache.crop(reuse)
+
+        with self._lock:
+            self.hits += 1
+            self.reused_tokens += reuse
+            self.encoded_tokens += ids.shape[0] - reuse
+        return cache, reuse
+
+    def _record_miss(self, ids: Optional[torch.Tensor]) -> None:
+        with self._lock:
+            self.misses += 1
+            if ids is not None:
+                self.encoded_tokens += ids.shape[0]
+
+    def put(self, input_ids: torch.Tensor, cache: Any) -> None:
+        """
+        Store the cache of a finished call, keeping only the prompt positions and honouring the caps.
+        """
+        ids = self._flatten_ids(input_ids)
+        if ids is None or cache is None or not _is_croppable(cache):
+            return
+
+        keep = min(ids.shape[0], self.max_tokens)
+        seq_len = cache.get_seq_length()
+        if seq_len <= 0:
+            return
+        if self.max_bytes is not None:
+            bytes_per_token = _cache_nbytes(cache) / seq_len
+            if bytes_per_token > 0:
+                keep = min(keep, int(self.max_bytes // bytes_per_token))
+        keep = min(keep, seq_len)
+        if keep < self.min_reuse_tokens:
+            return
+
+        if seq_len > keep:
+            cache.crop(keep)
+        with self._lock:
+            self._ids, self._cache = ids[:keep].clone(), cache
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids, self._cache = None, None
+
+    @property
+    def cached_tokens(self) -> int:
+        with self._lock:
+            return 0 if self._ids is None else int(self._ids.shape[0])
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reused_tokens": self.reused_tokens,
+                "encoded_tokens": self.encoded_tokens,
+                "cached_tokens": 0 if self._ids is None else int(self._ids.shape[0]),
+                "cached_bytes": _cache_nbytes(self._cache) if self._cache is not None else 0,
+            }
@@ -0,0 +1,170 @@
+"""
+Progress of long-running tool calls, from MCP progress notifications to a run's consumers.
+
+A tool call made with a progress callback asks the server for `notifications/progress`
+while it runs, e.g. one per tilt of a tilt series. Each one becomes a ToolProgress event
+handed to the sink of the current context, which the executor sets around every tool call.
+Like deadlines, the sink is read on the caller's thread and passed to the adapter loop
+explicitly, since neither threads nor tasks scheduled from them inherit context variables.
+The sink is called on the adapter loop, so anything slow goes behind a ProgressQueue.
+
+A progress message may carry a partial result in the `{"payload", "metadata", "encoding"}`
+format, e.g. the latest frame, with any text in a "message" key. It is parsed into
+`partial`, for the sink to convert. Streams carry only a description of it (`describe_partial`).
+"""
+
+import json
+import queue
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional
+
+from mcp.shared.session import ProgressFnT
+
+ProgressSink = Callable[["ToolProgress"], None]
+
+_sink: ContextVar[Optional[ProgressSink]] = ContextVar("atomonous_progress_sink", default=None)
+
+
+@dataclass
+class ToolProgress:
+    """One progress notification of a running tool call."""
+
+    tool: str
+    progress: float
+    total: Optional[float] = None
+    message: Optional[str] = None
+    # Partial result sent with the notification; parsed JSON, or whatever the sink converted it to
+    partial: Any = None
+    elapsed_s: float = 0.0
+
+    @property
+    def fraction(self) -> Optional[float]:
+        """Progress as a fraction of the total, or None if the server did not send one."""
+        return self.progress / self.total if self.total else None
+
+
+@contextmanager
+def reporting(sink: Optional[ProgressSink]) -> Iterator[None]:
+    """Send the progress of tool calls made inside the block to `sink`. None stops reporting."""
+    token = _sink.set(sink)
+    try:
+        yield
+    finally:
+        _sink.reset(token)
+
+
+def current() -> Optional[ProgressSink]:
+    """The sink of the current context, or None if nobody is listening."""
+    return _sink.get()
+
+
+def split_message(message: Optional[str]) -> tuple[Optional[str], Any]:
+    """Separate a partial result from a progress message. Plain messages have no partial."""
+    if not message or not message.lstrip().startswith("{"):
+        return message, None
+    try:
+        parsed = json.loads(message)
+    except ValueError:
+        return message, None
+    if not (isinstance(parsed, dict) and "payload" in parsed and "metadata" in parsed):
+        return message, None
+    # A text message may come along as {"message": ..., "payload": ..., ...}
+    return parsed.get("message"), parsed
+
+
+def callback(tool: str, sink: Optional[ProgressSink] = None) -> Optional[ProgressFnT]:
+    """
+    Progress callback for `ClientSession.call_tool` that reports to `sink`, by default the
+    sink of the current context. Returns None without a sink, so no progress is requested.
+
+    The session awaits the callback before it reads its next message, and a pooled session
+    serves every agent on the server, so the sink is called inline and must return at once.
+    Sinks that convert frames or feed slow consumers go behind a ProgressQueue.
+    """
+    sink = sink or _sink.get()
+    if sink is None:
+        return None
+    start = time.monotonic()
+
+    async def on_progress(progress: float, total: Optional[float], message: Optional[str]) -> None:
+        text, partial = split_message(message)
+        try:
+            sink(ToolProgress(tool, progress, total, text, partial, time.monotonic() - start))
+        except Exception as e:
+            # Progress is informational; a failing consumer must not fail the call
+            warnings.warn(f"Progress of MCP tool '{tool}' could not be reported: {e}")
+
+    return on_progress
+
+
+def describe_partial(partial: Any) -> Optional[dict[str, Any]]:
+    """
+    Small, JSON-safe description of a partial result, e.g. {"type": "image", "width": ...}.
+    Descriptions are kept in streams instead of frames, which can be megabytes each.
+    """
+    if partial is None:
+        return None
+    if isinstance(partial, dict):
+        if "payload" in partial:
+            # Not converted: only the metadata of the payload
+            return {"type": "payload", "metadata": partial.get("metadata")}
+        return partial
+    size = getattr(partial, "size", None)
+    if isinstance(size, tuple) and hasattr(partial, "mode"):
+        return {"type": "image", "width": size[0], "height": size[1], "mode": partial.mode}
+    text = str(partial)
+    return {"type": "text", "text": text if len(text) <= 2000 else text[:2000] + f"... [{len(text) - 2000} chars omitted]"}
+
+
+class ProgressQueue:
+    """
+    Bounded queue in front of a sink, drained by its own thread, so reporting never waits.
+    When the queue is full the oldest event is dropped: a newer one supersedes it.
+
+    Args:
+        sink: Receives the events in order on the queue's thread.
+        maxsize: Events that may wait; further ones push out the oldest.
+    """
+
+    def __init__(self, sink: ProgressSink, maxsize: int = 64):
+        self.sink = sink
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def __call__(self, event: ToolProgress) -> None:
+        with self._lock:
+            while True:
+                try:
+                    self._queue.put_nowait(event)
+                    break
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self._queue.task_done()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._drain, name="tool-progress", daemon=True)
+                self._thread.start()
+
+    def _drain(self) -> None:
+        while True:
+            event = self._queue.get()
+            try:
+                self.sink(event)
+            except Exception as e:
+                warnings.warn(f"Progress of MCP tool '{event.tool}' could not be reported: {e}")
+            finally:
+                self._queue.task_done()
+
+    def join(self) -> None:
+        """Block until every queued event has been handed to the sink."""
+        self._queue.join()
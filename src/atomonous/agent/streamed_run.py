@@ -1,32 +1,312 @@
-from dataclasses import dataclass
-from typing import Callable, Iterator, Optional
+import asyncio
+import concurrent.futures
+import threading
+import weakref
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
 from smolagents import FinalAnswerStep
+from smolagents.models import ChatMessageStreamDelta
+from smolagents.monitoring import TokenUsage
+
+from atomonous.agent.progress import ToolProgress
+
+SLOW_CONSUMER_POLICIES = ("block", "drop", "coalesce")
+
+# Marks the end of an async subscription
+_END = object()
+
+# Seconds between checks for a closed consumer while the async bridge waits for queue space
+_BRIDGE_POLL_S = 0.1
+
+
+class RunCancelled(RuntimeError):
+    """The run was cancelled before it could start."""
+
+
+def _is_delta(item: Any) -> bool:
+    return isinstance(item, ChatMessageStreamDelta)
+
+
+def _is_transient(item: Any) -> bool:
+    """Events superseded by later ones, which are evicted first when the buffer is full."""
+    return _is_delta(item) or isinstance(item, ToolProgress)
+
+
+def _coalesce(items: list) -> list:
+    """Merge runs of consecutive text deltas into single deltas."""
+    merged = []
+    for item in items:
+        previous = merged[-1] if merged else None
+        if (
+            _is_delta(item) and _is_delta(previous)
+            and not item.tool_calls and not previous.tool_calls
+        ):
+            usage = None
+            if previous.token_usage or item.token_usage:
+                a = previous.token_usage or TokenUsage(0, 0)
+                b = item.token_usage or TokenUsage(0, 0)
+                usage = TokenUsage(a.input_tokens + b.input_tokens, a.output_tokens + b.output_tokens)
+            merged[-1] = ChatMessageStreamDelta(
+                content=(previous.content or "") + (item.content or ""),
+                token_usage=usage,
+            )
+        else:
+            merged.append(item)
+    return merged
+
+
+class Subscription:
+    """
+    A single consumer's view of a StreamedRun, with its own cursor into the replay buffer.
+    """
+
+    def __init__(self, run: "StreamedRun", policy: str, max_lag: int):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy '{policy}'. Expected one of {SLOW_CONSUMER_POLICIES}.")
+        self._run = run
+        self.policy = policy
+        self.max_lag = max_lag
+        self.cursor = 0
+        self.dropped = 0
+        self.closed = False
+        self._pending: list = []
+
+    def __iter__(self) -> "Subscription":
+        return self
+
+    def __next__(self) -> Any:
+        while not self._pending:
+            if self.closed:
+                raise StopIteration
+            batch = self._run._fetch(self)
+            if batch is None:
+                self.close()
+                self._run._raise_if_failed()
+                raise StopIteration
+            self._pending = self._apply_policy(batch)
+        return self._pending.pop(0)
+
+    def _apply_policy(self, batch: list) -> list:
+        if self.policy == "coalesce" and len(batch) > 1:
+            return _coalesce(batch)
+        if self.policy == "drop" and len(batch) > self.max_lag:
+            kept = [item for item in batch if not _is_delta(item)]
+            self.dropped += len(batch) - len(kept)
+            return kept
+        return batch
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._run._unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __del__(self):
+        # The run only holds subscriptions weakly, so a dropped iterator lets the run go on
+        try:
+            self.close()
+        except Exception:
+            pass
+
 
 @dataclass
 class StreamedRun:
     """
     Convenient wrapper around a smolagents run for streaming output.
+
+    The run executes exactly once on a background thread. Any number of consumers can
+    `subscribe()` (or call `stream()`), each with its own cursor; late subscribers replay
+    from the start of the bounded buffer. When the buffer is full, old stream deltas and tool
+    progress are evicted before steps, tool calls or the final answer. Subscriptions are held
+    weakly: one that is dropped without `close()` no longer holds back the run.
     """
     _it_factory: Callable[[], Iterator]
-    _it: Optional[Iterator] = None
+    replay_size: int = 4096
+    # If False, subscribers wait until `start()` is called explicitly (e.g. by a scheduler)
+    autostart: bool = True
     _final: Optional[FinalAnswerStep] = None
     _done: bool = False
+    _error: Optional[BaseException] = None
+    _seq: int = 0
+    _buffer: list = field(default_factory=list)
+    _subscribers: weakref.WeakSet = field(default_factory=weakref.WeakSet)
+    _thread: Optional[threading.Thread] = None
+    _cond: threading.Condition = field(default_factory=threading.Condition)
+    _cancelled: threading.Event = field(default_factory=threading.Event)
+
+    def start(self) -> "StreamedRun":
+        """Start the run on its worker thread if it is not already running."""
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._produce, name="streamed-run", daemon=True)
+                self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        """
+        Mark the run as cancelled. A run that has not started yet fails with RunCancelled when
+        started; a running one stops where its producer checks `cancelled`.
+        """
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _produce(self) -> None:
+        try:
+            if self.cancelled:
+                raise RunCancelled("The run was cancelled before it started.")
+            for item in self._it_factory():
+                if isinstance(item, FinalAnswerStep):
+                    self._final = item
+                self._publish(item)
+        except BaseException as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def _publish(self, item: Any) -> None:
+        with self._cond:
+            # Backpressure: wait for blocking subscribers that would otherwise lose events
+            while any(
+                s.policy == "block" and self._seq - s.cursor >= self.replay_size
+                for s in list(self._subscribers)
+            ):
+                self._cond.wait()
+
+            self._buffer.append((self._seq, item))
+            self._seq += 1
+            if len(self._buffer) > self.replay_size:
+                victim = next((i for i, (_, it) in enumerate(self._buffer) if _is_transient(it)), 0)
+                del self._buffer[victim]
+            self._cond.notify_all()
+
+    def publish(self, item: Any) -> None:
+        """
+        Add an event from outside the agent's iterator, e.g. the progress of a running tool.
+        Blocks like the run itself while a blocking subscriber is too far behind.
+        """
+        self._publish(item)
+
+    def _fetch(self, sub: Subscription) -> Optional[list]:
+        """Block until `sub` has unread events. Returns None once the run is finished and drained."""
+        with self._cond:
+            while True:
+                if sub.closed:
+                    return None
+                if sub.cursor < self._seq:
+                    start = bisect_left(self._buffer, sub.cursor, key=lambda entry: entry[0])
+                    batch = [item for _, item in self._buffer[start:]]
+                    sub.cursor = self._seq
+                    self._cond.notify_all()
+                    if batch:
+                        return batch
+                if self._done:
+                    return None
+                self._cond.wait()
+
+    def _unsubscribe(self, sub: Subscription) -> None:
+        with self._cond:
+            self._subscribers.discard(sub)
+            self._cond.notify_all()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def subscribe(self, policy: str = "block", max_lag: int = 256) -> Subscription:
+        """
+        Attach a new consumer that replays the run from the start of the buffer.
+
+        Args:
+            policy: How a slow consumer is handled. "block" applies backpressure to the run,
+                    "drop" skips stream deltas when more than `max_lag` events are pending,
+                    "coalesce" merges pending consecutive deltas into one.
+            max_lag: Pending-event threshold for the "drop" policy.
+        """
+        sub = Subscription(self, policy, max_lag)
+        with self._cond:
+            self._subscribers.add(sub)
+        if self.autostart:
+            self.start()
+        return sub
 
     def stream(self) -> Iterator:
-        if self._done:
-            return iter(())
-        if self._it is None:
-            self._it = self._it_factory()
+        return self.subscribe()
+
+    async def asubscribe(self, policy: str = "block", max_lag: int = 256, queue_size: int = 64) -> AsyncIterator:
+        """
+        Async counterpart of `subscribe()`. A bridge thread drains the subscription and hands
+        events to the event loop through a bounded asyncio.Queue, so the loop never blocks on
+        the run. The bridge waits while the queue is full, so a slow consumer still holds
+        back a "block" subscription.
+
+        Args:
+            queue_size: Events handed over but not yet consumed.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        sub = self.subscribe(policy=policy, max_lag=max_lag)
+        stopped = threading.Event()
+
+        def put(entry: tuple) -> bool:
+            if stopped.is_set():
+                return False
+            try:
+                future = asyncio.run_coroutine_threadsafe(queue.put(entry), loop)
+            except RuntimeError:
+                # Event loop already closed; the consumer is gone
+                sub.close()
+                return False
+            while True:
+                try:
+                    future.result(timeout=_BRIDGE_POLL_S)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    if stopped.is_set():
+                        future.cancel()
+                        return False
+
+        def bridge() -> None:
+            error = None
+            try:
+                for item in sub:
+                    if not put((item, None)):
+                        return
+            except BaseException as e:
+                error = e
+            put((_END, error))
 
-        for item in self._it:
-            if isinstance(item, FinalAnswerStep):
-                self._final = item
-            yield item
+        threading.Thread(target=bridge, name="streamed-run-bridge", daemon=True).start()
+        try:
+            while True:
+                item, error = await queue.get()
+                if item is _END:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            stopped.set()
+            sub.close()
 
-        self._done = True
+    @property
+    def done(self) -> bool:
+        return self._done
 
     def final(self) -> FinalAnswerStep:
-        if not self._done:
-            for _ in self.stream():
-                pass
-        return self._final
\ No newline at end of file
+        self.start()
+        with self._cond:
+            while not self._done:
+                self._cond.wait()
+        self._raise_if_failed()
+        return self._final
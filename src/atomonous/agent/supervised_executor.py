@@ -1,4 +1,5 @@
 import ast
+import time
 from functools import wraps
 
 from smolagents import LocalPythonExecutor
@@ -7,6 +8,10 @@ from PIL import Image
 from atomonous.config import settings
 from atomonous.data.factory import ConverterFactory
 from atomonous.agent.ast_utils import _KwargTransformer
+from atomonous.agent import deadlines, progress
+from atomonous.agent.progress import ToolProgress
+from atomonous.agent.approval import ApprovalBroker, ApprovalRequest, CLIApprovalBroker
+from atomonous.utils.metrics import TOOL_LATENCY
 
 class SupervisedExecutor(LocalPythonExecutor):
     """
@@ -15,13 +20,33 @@ class SupervisedExecutor(LocalPythonExecutor):
     ensure it is making reasonable decisions before allowing it to execute actions.
     """
 
-    def __init__(self, data_factory: ConverterFactory | None = None, *args, **kwargs):
+    def __init__(
+        self,
+        data_factory: ConverterFactory | None = None,
+        *args,
+        approval_broker: ApprovalBroker | None = None,
+        **kwargs,
+    ):
+        # smolagents stops waiting for code after 30 s by default; use the step's budget instead
+        kwargs.setdefault("timeout_seconds", settings.agent_step_timeout_s or None)
         super().__init__(*args, **kwargs)
         self.data_factory = data_factory
         self.intercepted_artifacts = []
+        # Absolute deadline of the step being executed, see `deadlines`
+        self.step_deadline: float | None = None
+        # Receives the progress of running tools, e.g. the current StreamedRun's `publish`
+        self.progress_sink = None
+        # Progress is converted and passed on off the MCP session's loop
+        self.progress_queue = progress.ProgressQueue(self._forward_progress, maxsize=settings.stream_tool_progress_max_pending)
+        # Latest converted partial result per tool, e.g. the last frame of a tilt series
+        self.latest_partials: dict = {}
+
+        # Decides dangerous tool calls; the terminal unless a server installs its own broker
+        self.approval_broker = approval_broker or CLIApprovalBroker(input_fn=self.request_user_input)
+        # Identifies this executor's requests to the broker, e.g. the API session ID
+        self.approval_owner: str | None = None
 
         self.user_prompt = "Please provide input: "
-        self.confirmation_prompt = "Do you want to proceed? (y/n): "
 
         # Tools that require explicit approval before execution.
         self.dangerous_tools = {
@@ -69,25 +94,26 @@ class SupervisedExecutor(LocalPythonExecutor):
         prompt = prompt or self.user_prompt
         return input(prompt)
 
-    def request_confirmation(self, prompt=None):
+    def _progress_sink(self):
+        if not (settings.stream_tool_progress and self.progress_sink):
+            return None
+        return self.progress_queue
+
+    def _forward_progress(self, event: ToolProgress) -> None:
         """
-        Request confirmation from the user with a custom or default prompt.
+        Convert the partial result of a progress event and keep it in `latest_partials`, then
+        pass the event on with a description of it in place of the frame.
         """
-        prompt = prompt or self.confirmation_prompt
-        while True:
+        if event.partial is not None and self.data_factory:
             try:
-                response = input(prompt).strip().lower()
-            except EOFError:
-                # Non-interactive environment: fail closed.
-                print("No interactive input available. Denying execution by default.")
-                return False
-
-            if response in ['y', 'yes']:
-                return True
-            elif response in ['n', 'no']:
-                return False
-            else:
-                print("Invalid input. Please enter 'y' or 'n'.")
+                self.latest_partials[event.tool] = self.data_factory.convert(event.partial)
+                event.partial = self.latest_partials[event.tool]
+            except Exception as e:
+                print(f"Warning: Failed to convert partial result of {event.tool}: {e}")
+        event.partial = progress.describe_partial(event.partial)
+        sink = self.progress_sink
+        if sink is not None:
+            sink(event)
 
     def _rewrite_positional_args(self, code_action: str) -> str:
         """
@@ -114,24 +140,37 @@ class SupervisedExecutor(LocalPythonExecutor):
 
         if self.data_factory:
             self.intercepted_artifacts = [] # Reset for new code action
+            self.latest_partials = {}
             static_tools = self.static_tools or {}
             for name, tool in static_tools.items():
                 if name == "final_answer" or hasattr(tool, "_is_atomonous_wrapped"):
                     continue
                 
-                def generate_wrapper(original_func):
+                def generate_wrapper(original_func, tool_name):
                     @wraps(original_func)
                     def wrapped(*args, **kwargs):
+                        start = time.perf_counter()
+                        outcome = "error"
                         try:
-                            raw_result = original_func(*args, **kwargs)
+                            # Code runs on smolagents' worker thread, which does not see the step's context
+                            with deadlines.until(self.step_deadline), progress.reporting(self._progress_sink()):
+                                raw_result = original_func(*args, **kwargs)
+                            outcome = "ok"
                             if raw_result is None:
                                 raw_result = "Tool execution finished"
+                        except TimeoutError:
+                            outcome = "timeout"
+                            raise
                         except Exception as e:
                             if "returned an empty content" in str(e):
                                 # Guarantee a return value for functions that return empty content
+                                outcome = "empty"
                                 raw_result = "Tool execution finished"
                                 return raw_result
                             raise
+                        finally:
+                            # Conversion below is timed separately per converter
+                            TOOL_LATENCY.observe(time.perf_counter() - start, tool=tool_name, outcome=outcome)
                             
                         try:
                             converted = self.data_factory.convert(raw_result)
@@ -143,9 +182,9 @@ class SupervisedExecutor(LocalPythonExecutor):
                     return wrapped
 
                 if hasattr(tool, "forward"):
-                    tool.forward = generate_wrapper(tool.forward)
+                    tool.forward = generate_wrapper(tool.forward, name)
                 elif callable(tool):
-                    tool = generate_wrapper(tool)
+                    tool = generate_wrapper(tool, name)
                     static_tools[name] = tool
                 
                 try:
@@ -155,13 +194,17 @@ class SupervisedExecutor(LocalPythonExecutor):
 
         if not self._is_autorun_enabled():
             called_tools = self._get_called_tool_names(code_action)
-            for func in called_tools:
-                print(f"The agent is trying to call this tool: {func}")
-                if not self.request_confirmation(f"Approve tool call '{func}'? (y/n): "):
-                    msg = f"Execution aborted by user. Tool call '{func}' was not approved."
+            if called_tools:
+                # One decision covers every dangerous tool in the action
+                request = ApprovalRequest(tools=called_tools, code=code_action, owner=self.approval_owner)
+                request = self.approval_broker.request(request)
+                if not request.approved:
+                    msg = request.message()
                     print(msg)
                     return msg
 
-        result = super().__call__(code_action)
+        # Time spent waiting for approval does not count against the step's budget
+        with deadlines.budget(settings.agent_step_timeout_s) as self.step_deadline:
+            result = super().__call__(code_action)
         self.last_output = result
         return result
\ No newline at end of file
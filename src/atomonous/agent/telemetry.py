@@ -0,0 +1,220 @@
+"""
+Per-call token and latency accounting for agent models.
+
+Every model call records prompt/completion tokens, time-to-first-token, total generation
+time and throughput. Records are kept per calling thread so an agent can collect exactly the
+calls made during its own step, even when several agents share one model instance.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Iterable, Optional
+
+
+@dataclass
+class ModelCallRecord:
+    """
+    Token usage and timing of a single model call.
+    """
+    model_id: str
+    streaming: bool
+    started_at: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    ttft_s: Optional[float] = None
+    total_s: float = 0.0
+    completed: bool = True
+
+    @property
+    def tokens_per_s(self) -> float:
+        """End-to-end completion throughput, including prompt processing."""
+        return self.completion_tokens / self.total_s if self.total_s > 0 else 0.0
+
+    @property
+    def decode_tokens_per_s(self) -> Optional[float]:
+        """Throughput after the first token, i.e. pure decode speed."""
+        if self.ttft_s is None or self.completion_tokens < 2:
+            return None
+        decode_s = self.total_s - self.ttft_s
+        return (self.completion_tokens - 1) / decode_s if decode_s > 0 else None
+
+    def dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data["tokens_per_s"] = round(self.tokens_per_s, 3)
+        decode = self.decode_tokens_per_s
+        data["decode_tokens_per_s"] = round(decode, 3) if decode is not None else None
+        return data
+
+
+@dataclass
+class UsageSummary:
+    """
+    Rollup over a set of model calls (one step or a whole session).
+    """
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    generation_s: float = 0.0
+    ttft_total_s: float = 0.0
+    ttft_count: int = 0
+    max_ttft_s: float = 0.0
+
+    def add(self, record: ModelCallRecord) -> None:
+        self.calls += 1
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.generation_s += record.total_s
+        if record.ttft_s is not None:
+            self.ttft_total_s += record.ttft_s
+            self.ttft_count += 1
+            self.max_ttft_s = max(self.max_ttft_s, record.ttft_s)
+
+    @classmethod
+    def from_records(cls, records: Iterable[ModelCallRecord]) -> "UsageSummary":
+        summary = cls()
+        for record in records:
+            summary.add(record)
+        return summary
+
+    def dict(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "generation_s": round(self.generation_s, 4),
+            "mean_ttft_s": round(self.ttft_total_s / self.ttft_count, 4) if self.ttft_count else None,
+            "max_ttft_s": round(self.max_ttft_s, 4) if self.ttft_count else None,
+            "tokens_per_s": round(self.completion_tokens / self.generation_s, 3) if self.generation_s > 0 else 0.0,
+        }
+
+
+class ModelCallRecorder:
+    """
+    Thread-local buffer of ModelCallRecords.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _records(self) -> list[ModelCallRecord]:
+        if not hasattr(self._local, "records"):
+            self._local.records = []
+        return self._local.records
+
+    def record(self, record: ModelCallRecord) -> None:
+        self._records().append(record)
+
+    def drain(self) -> list[ModelCallRecord]:
+        """Return and clear the records made on the calling thread."""
+        records = self._records()
+        self._local.records = []
+        return records
+
+
+class _FirstTokenTimer:
+    """
+    Minimal transformers streamer that timestamps the first generated token.
+    The first `put` carries the prompt, the second the first new token.
+    """
+
+    def __init__(self):
+        self._puts = 0
+        self.first_token_at: Optional[float] = None
+
+    def put(self, value: Any) -> None:
+        self._puts += 1
+        if self._puts == 2 and self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def end(self) -> None:
+        pass
+
+
+def _delta_has_output(delta: Any) -> bool:
+    return bool(getattr(delta, "content", None)) or bool(getattr(delta, "tool_calls", None))
+
+
+class CallAccountingMixin:
+    """
+    Model mixin that records a ModelCallRecord for every generate/generate_stream call.
+    Place it before the concrete smolagents Model class in the bases. Subclasses that
+    generate without calling `super()` (e.g. through a batch scheduler) wrap that path in
+    `_accounted` / `_accounted_stream` to have it recorded too.
+    """
+
+    # Transformers models accept a `streamer`, which gives a real TTFT on the non-streaming path
+    _probe_first_token: bool = False
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.call_recorder = ModelCallRecorder()
+
+    def _new_record(self, streaming: bool) -> ModelCallRecord:
+        return ModelCallRecord(
+            model_id=str(getattr(self, "model_id", "")),
+            streaming=streaming,
+            started_at=time.time(),
+        )
+
+    def generate(self, messages: Any, stop_sequences: Optional[list[str]] = None, *args: Any, **kwargs: Any) -> Any:
+        return self._accounted(super().generate, messages, stop_sequences, *args, **kwargs)
+
+    def generate_stream(self, messages: Any, stop_sequences: Optional[list[str]] = None, *args: Any, **kwargs: Any) -> Any:
+        yield from self._accounted_stream(super().generate_stream, messages, stop_sequences, *args, **kwargs)
+
+    def _accounted(self, generate: Callable[..., Any], messages: Any, stop_sequences: Optional[list[str]] = None, *args: Any, **kwargs: Any) -> Any:
+        """Call `generate` and record its usage and timing."""
+        record = self._new_record(streaming=False)
+        timer = None
+        if self._probe_first_token and "streamer" not in kwargs:
+            timer = _FirstTokenTimer()
+            kwargs["streamer"] = timer
+
+        start = time.perf_counter()
+        try:
+            response = generate(messages, stop_sequences, *args, **kwargs)
+        except Exception:
+            record.completed = False
+            record.total_s = time.perf_counter() - start
+            self.call_recorder.record(record)
+            raise
+        record.total_s = time.perf_counter() - start
+
+        if timer is not None and timer.first_token_at is not None:
+            record.ttft_s = timer.first_token_at - start
+        else:
+            # Without streaming the first token reaches the caller with the full response
+            record.ttft_s = record.total_s
+        usage = getattr(response, "token_usage", None)
+        if usage is not None:
+            record.prompt_tokens = usage.input_tokens
+            record.completion_tokens = usage.output_tokens
+        self.call_recorder.record(record)
+        return response
+
+    def _accounted_stream(self, generate_stream: Callable[..., Any], messages: Any, stop_sequences: Optional[list[str]] = None, *args: Any, **kwargs: Any) -> Any:
+        """Stream from `generate_stream` and record its usage and timing."""
+        record = self._new_record(streaming=True)
+        record.completed = False
+        start = time.perf_counter()
+        streamed_tokens = 0
+        try:
+            for delta in generate_stream(messages, stop_sequences, *args, **kwargs):
+                if record.ttft_s is None and _delta_has_output(delta):
+                    record.ttft_s = time.perf_counter() - start
+                usage = getattr(delta, "token_usage", None)
+                if usage is not None:
+                    record.prompt_tokens += usage.input_tokens
+                    record.completion_tokens += usage.output_tokens
+                elif _delta_has_output(delta):
+                    streamed_tokens += 1
+                yield delta
+            record.completed = True
+        finally:
+            record.total_s = time.perf_counter() - start
+            if record.completion_tokens == 0:
+                # Some backends only report usage on non-streaming calls; count content deltas instead
+                record.completion_tokens = streamed_tokens
+            self.call_recorder.record(record)
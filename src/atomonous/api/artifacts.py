@@ -0,0 +1,283 @@
+"""
+Artifact browsing and download for the API server.
+
+Session folders under `settings.artifacts_dir` are listed with their files, and files are
+streamed in chunks, so multi-gigabyte .npy/.h5 frames never sit in memory. Downloads carry a
+strong ETag derived from size and modification time: clients revalidate with If-None-Match
+and resume or slice large files with Range (and If-Range). Paths are confined to the
+artifacts directory with the same rules as the `read_experiment_artifact` tool.
+
+Thumbnails for images and image-like .npy arrays are rendered on first request and cached
+on disk, keyed by the source file's ETag, so a rewritten artifact gets a fresh thumbnail.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from email.utils import formatdate
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import numpy as np
+from fastapi.responses import Response, StreamingResponse
+from PIL import Image
+
+from atomonous.data.default_converters.image_converters import NumpyImageConverter
+from atomonous.utils.memory import resolve_artifact_path
+
+THUMBNAIL_SUFFIXES = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".npy"}
+
+_CONTENT_TYPES = {
+    ".npy": "application/octet-stream",
+    ".h5": "application/x-hdf5",
+    ".hdf5": "application/x-hdf5",
+    ".yaml": "application/yaml",
+    ".yml": "application/yaml",
+}
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def artifact_kind(path: Path) -> str:
+    """Group a file the way `SessionMemory.list_artifacts` does."""
+    suffix = path.suffix.lower()
+    if suffix in (".yaml", ".yml"):
+        return "yaml"
+    if suffix == ".png":
+        return "png"
+    if suffix == ".npy":
+        return "images"
+    if suffix == ".json":
+        return "json"
+    return "other"
+
+
+def file_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison: weak, over a list of tags or '*'."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return etag.removeprefix("W/") in tags
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single-range `Range` header into an inclusive (start, end) pair.
+
+    Returns:
+        None if the header is absent or not a single byte range; the full file is served then.
+
+    Raises:
+        RangeNotSatisfiable: If the range lies outside the file.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        # Multiple ranges and other units are not supported; a full response is valid
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(header)
+    return start, end
+
+
+def _iter_file(path: Path, start: int, length: int, chunk_size: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_response(path: Path, headers: Any, chunk_size: int = 256 * 1024, cache_control: str = "no-cache") -> Response:
+    """
+    Stream a file with ETag revalidation and single-range support.
+
+    Args:
+        path: File to serve; must exist.
+        headers: The request headers.
+        chunk_size: Bytes read per chunk.
+        cache_control: Cache-Control of the response. 'no-cache' makes clients revalidate.
+    """
+    stat = path.stat()
+    etag = file_etag(stat)
+    base_headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": cache_control,
+    }
+    if etag_matches(headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=base_headers)
+
+    media_type = _CONTENT_TYPES.get(path.suffix.lower()) or mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    size = stat.st_size
+
+    byte_range = None
+    if_range = headers.get("if-range")
+    # A stale If-Range validator means the client's partial copy is outdated: send everything
+    if not if_range or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**base_headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, length, status = 0, size, 200
+    else:
+        start, end = byte_range
+        length, status = end - start + 1, 206
+        base_headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    base_headers["Content-Length"] = str(length)
+
+    return StreamingResponse(
+        _iter_file(path, start, length, chunk_size),
+        status_code=status,
+        media_type=media_type,
+        headers=base_headers,
+    )
+
+
+def list_sessions(base_dir: Path) -> list[dict[str, Any]]:
+    """Session folders in the artifacts directory, newest first."""
+    base_dir = Path(base_dir).expanduser().resolve()
+    if not base_dir.exists():
+        return []
+    sessions = []
+    for session_dir in base_dir.iterdir():
+        if not session_dir.is_dir() or session_dir.name.startswith("."):
+            continue
+        files = [p for p in session_dir.rglob("*") if p.is_file()]
+        sessions.append({
+            "name": session_dir.name,
+            "modified": session_dir.stat().st_mtime,
+            "files": len(files),
+            "bytes": sum(p.stat().st_size for p in files),
+        })
+    sessions.sort(key=lambda s: s["name"], reverse=True)
+    return sessions
+
+
+def list_artifacts(base_dir: Path, session_name: str) -> list[dict[str, Any]]:
+    """
+    Files of one session folder. Each `path` is relative to the session folder, as used by the
+    download and thumbnail endpoints.
+
+    Raises:
+        ValueError: If the session name escapes the artifacts directory.
+        FileNotFoundError: If the session folder does not exist.
+    """
+    base_dir = Path(base_dir).expanduser().resolve()
+    session_dir = resolve_artifact_path(base_dir, session_name)
+    if not session_dir.is_dir():
+        raise FileNotFoundError(f"Session folder not found: {session_name}")
+    artifacts = []
+    for path in sorted(session_dir.rglob("*")):
+        if not path.is_file():
+            continue
+        stat = path.stat()
+        artifacts.append({
+            "path": path.relative_to(session_dir).as_posix(),
+            "name": path.name,
+            "kind": artifact_kind(path),
+            "size": stat.st_size,
+            "modified": stat.st_mtime,
+            "etag": file_etag(stat),
+            "thumbnail": path.suffix.lower() in THUMBNAIL_SUFFIXES,
+        })
+    return artifacts
+
+
+def resolve_file(base_dir: Path, session_name: str, file_path: str) -> Path:
+    """
+    Resolve a file of a session folder, confined to that session folder.
+
+    Raises:
+        ValueError: If the session name escapes the artifacts directory or the path escapes
+            the session folder.
+        FileNotFoundError: If it is not an existing file.
+    """
+    base_dir = Path(base_dir).expanduser().resolve()
+    session_dir = resolve_artifact_path(base_dir, session_name)
+    if session_dir == base_dir:
+        raise ValueError("session_name must name a session folder.")
+    path = resolve_artifact_path(session_dir, file_path)
+    if not path.is_file():
+        raise FileNotFoundError(f"Artifact file not found: {session_name}/{file_path}")
+    return path
+
+
+def _load_image(path: Path, max_size: int) -> Image.Image:
+    if path.suffix.lower() != ".npy":
+        image = Image.open(path)
+        image.load()
+        return image
+    # Memory-map and subsample before normalizing, so large frames are never fully loaded
+    arr = np.load(path, mmap_mode="r")
+    if arr.ndim == 3 and arr.shape[-1] not in (1, 3, 4):
+        arr = arr[0]
+    if arr.ndim == 3 and arr.shape[-1] == 1:
+        arr = arr[..., 0]
+    if arr.ndim >= 2:
+        step = max(1, max(arr.shape[0], arr.shape[1]) // (2 * max_size))
+        arr = arr[::step, ::step]
+    return NumpyImageConverter().convert(np.asarray(arr))
+
+
+def thumbnail(path: Path, cache_dir: Path, max_size: int = 256) -> Path:
+    """
+    Return a cached PNG thumbnail of an image or image-like .npy file, rendering it if needed.
+
+    Raises:
+        ValueError: If the file type has no thumbnail or the array is not image-like.
+    """
+    if path.suffix.lower() not in THUMBNAIL_SUFFIXES:
+        raise ValueError(f"No thumbnail for '{path.suffix}' files.")
+    key = hashlib.sha1(f"{path}|{file_etag(path.stat())}|{max_size}".encode()).hexdigest()
+    cache_dir = Path(cache_dir).expanduser()
+    target = cache_dir / f"{key}.png"
+    if target.exists():
+        return target
+
+    try:
+        image = _load_image(path, max_size)
+    except Exception as e:
+        raise ValueError(f"Cannot render a thumbnail for {path.name}: {e}")
+    if image.mode not in ("L", "RGB", "RGBA"):
+        image = image.convert("RGB")
+    image.thumbnail((max_size, max_size))
+
+    # Write then rename, so concurrent requests never read a partial file
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".png.tmp")
+    with os.fdopen(fd, "wb") as f:
+        image.save(f, format="PNG")
+    os.replace(tmp, target)
+    return target
@@ -0,0 +1,316 @@
+"""
+Long-running jobs for the API server.
+
+A job is a workflow YAML execution or a chat task that runs detached from the HTTP request:
+the client gets a job ID at once, then polls the status or follows the progress events, and
+can disconnect without affecting the run. Jobs run on their own bounded scheduler, so hours of
+microscope time never occupy the workers that serve chat requests. They share the sessions of
+the chat scheduler, so a job and a chat request never use one agent at the same time.
+
+Every job is persisted under `<session_dir>/jobs/<job_id>/`: `job.json` holds the current
+status, `events.jsonl` the progress events, `result.json` the outcome, and `workflow.yaml`
+the submitted workflow. Only the latest finished jobs are also kept in memory; older ones are
+found in their job directory.
+"""
+
+import asyncio
+import json
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+import yaml
+
+from atomonous.agent.core import Agent
+from atomonous.agent.streamed_run import StreamedRun
+from atomonous.api.scheduler import RunScheduler
+from atomonous.api.streaming import to_event
+from atomonous.tools.workflow_framework import WorkflowExecutor, WorkflowTemplate
+from atomonous.tools.workflows import get_default_registry
+from atomonous.utils.memory import resolve_artifact_path
+
+JOB_KINDS = ("workflow", "chat")
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+@dataclass
+class Job:
+    job_id: str
+    session_id: str
+    kind: str
+    job_dir: Path
+    request: dict[str, Any]
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    events: list[dict[str, Any]] = field(default_factory=list)
+    stop: threading.Event = field(default_factory=threading.Event)
+    future: Optional[asyncio.Future] = None
+    # The agent run of a chat job, once it has started
+    run: Optional[StreamedRun] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    _subscribers: list = field(default_factory=list)
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def info(self) -> dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "session_id": self.session_id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "events": len(self.events),
+            "result": self.result,
+            "error": self.error,
+            "job_dir": str(self.job_dir),
+        }
+
+    def _persist(self) -> None:
+        with open(self.job_dir / "job.json", "w") as f:
+            json.dump({**self.info(), "request": self.request}, f, indent=2, default=str)
+
+    def _record(self, event_type: str, data: dict[str, Any]) -> dict[str, Any]:
+        # Caller holds self._lock
+        event = {"seq": len(self.events), "time": time.time(), "type": event_type, **data}
+        self.events.append(event)
+        with open(self.job_dir / "events.jsonl", "a") as f:
+            f.write(json.dumps(event, default=str) + "\n")
+        return event
+
+    @staticmethod
+    def _publish(subscribers: list, *items: Any) -> None:
+        for loop, queue in subscribers:
+            for item in items:
+                try:
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+                except RuntimeError:
+                    break
+
+    def emit(self, event_type: str, **data: Any) -> None:
+        """Record a progress event, persist it and push it to live subscribers. Thread-safe."""
+        with self._lock:
+            event = self._record(event_type, data)
+            subscribers = list(self._subscribers)
+        self._publish(subscribers, event)
+
+    def set_status(self, status: str, **fields: Any) -> None:
+        # The status change and its event are atomic, so a new subscriber sees both or neither
+        with self._lock:
+            self.status = status
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self._persist()
+            event = self._record("status", {"status": status})
+            subscribers = list(self._subscribers)
+            if self.done:
+                self._subscribers = []
+        self._publish(subscribers, event, *([None] if self.done else []))
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Queue of past and future events for the calling event loop, terminated by None
+        once the job has finished.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            for event in self.events:
+                queue.put_nowait(event)
+            if self.done:
+                queue.put_nowait(None)
+            else:
+                self._subscribers.append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers = [(l, q) for l, q in self._subscribers if q is not queue]
+
+
+class JobManager:
+    """
+    Creates, runs and tracks jobs on a bounded RunScheduler.
+
+    Args:
+        scheduler: Runs the jobs.
+        max_finished: Number of finished jobs kept; the ones that finished first are dropped.
+    """
+
+    def __init__(self, scheduler: RunScheduler, max_finished: int = 256):
+        self.scheduler = scheduler
+        self.max_finished = max_finished
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        agent: Agent,
+        session_id: str,
+        kind: str,
+        query: Optional[str] = None,
+        workflow_yaml: Optional[str] = None,
+        workflow_path: Optional[str] = None,
+    ) -> Job:
+        """
+        Validate and queue a job. Must be called from the event loop.
+
+        Raises:
+            ValueError: If the request is incomplete, the workflow file is not in the session
+                directory, or the workflow YAML is invalid.
+            QueueFullError: If the job queue is full.
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}'. Expected one of {JOB_KINDS}.")
+
+        template = None
+        if kind == "chat":
+            if not query:
+                raise ValueError("A chat job needs a 'query'.")
+        else:
+            if workflow_yaml is None and workflow_path:
+                workflow_yaml = self._read_workflow(agent, workflow_path)
+            if not workflow_yaml:
+                raise ValueError("A workflow job needs 'workflow_yaml' or 'workflow_path'.")
+            try:
+                template = WorkflowTemplate(**yaml.safe_load(workflow_yaml))
+            except (yaml.YAMLError, TypeError) as e:
+                raise ValueError(f"Invalid workflow YAML: {e}")
+
+        job_id = uuid.uuid4().hex[:16]
+        job_dir = Path(agent.memory.session_dir) / "jobs" / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        if workflow_yaml is not None:
+            (job_dir / "workflow.yaml").write_text(workflow_yaml)
+
+        request = {"query": query, "workflow_path": workflow_path}
+        job = Job(job_id=job_id, session_id=session_id, kind=kind, job_dir=job_dir, request=request)
+
+        if kind == "chat":
+            run = lambda: self._run_chat(job, agent, query)
+        else:
+            run = lambda: self._run_workflow(job, agent, template)
+
+        def cancel_running():
+            # Workflows stop before their next node; chat runs before their next step
+            job.stop.set()
+            if job.run is not None:
+                agent.cancel(job.run)
+
+        # Persist before queueing: the job may start on a worker thread right away
+        job.set_status("queued")
+        try:
+            job.future = self.scheduler.submit(session_id, run, on_cancel=cancel_running)
+        except Exception:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        job.future.add_done_callback(lambda f: self._on_done(job, f))
+
+        with self._lock:
+            self._jobs[job_id] = job
+        return job
+
+    @staticmethod
+    def _read_workflow(agent: Agent, workflow_path: str) -> str:
+        """Read a workflow file from the agent's session directory, where designed workflows are saved."""
+        path = resolve_artifact_path(Path(agent.memory.session_dir), workflow_path)
+        if path.suffix.lower() not in (".yaml", ".yml") or not path.is_file():
+            raise ValueError(f"No workflow YAML file '{workflow_path}' in the session directory.")
+        return path.read_text()
+
+    def _on_done(self, job: Job, future: asyncio.Future) -> None:
+        if future.cancelled() and not job.started_at:
+            job.set_status("cancelled", finished_at=time.time())
+            self._prune()
+        elif not future.cancelled():
+            # Outcomes are recorded by the job itself; this only consumes the future
+            future.exception()
+
+    def _finish(self, job: Job, result: Any = None, error: Optional[str] = None) -> None:
+        if job.stop.is_set():
+            status = "cancelled"
+        else:
+            status = "failed" if error else "succeeded"
+        with open(job.job_dir / "result.json", "w") as f:
+            json.dump({"status": status, "result": result, "error": error}, f, indent=2, default=str)
+        # The run's replay buffer holds every step with its images; the outcome is on disk
+        job.run = None
+        job.set_status(status, result=result, error=error, finished_at=time.time())
+        self._prune()
+
+    def _prune(self) -> None:
+        """Drop the finished jobs beyond `max_finished`, first finished first."""
+        with self._lock:
+            finished = sorted((j for j in self._jobs.values() if j.done), key=lambda j: j.finished_at or 0.0)
+            for job in finished[: max(0, len(finished) - self.max_finished)]:
+                del self._jobs[job.job_id]
+
+    def _run_chat(self, job: Job, agent: Agent, query: str) -> None:
+        job.set_status("running", started_at=time.time())
+        try:
+            job.run = agent.current_run = run = agent.run(query, autostart=False)
+            # A cancel may have arrived before the run existed
+            if job.stop.is_set():
+                agent.cancel(run)
+            # Token deltas are too fine-grained for a persisted log; steps and tool calls are kept
+            for item in run.start().subscribe(policy="drop", max_lag=0):
+                event = to_event(item)
+                if event is not None and event[0] != "delta":
+                    job.emit(event[0], **event[1])
+            self._finish(job, result=str(run.final().output))
+        except Exception as e:
+            self._finish(job, error=str(e))
+
+    def _run_workflow(self, job: Job, agent: Agent, template: WorkflowTemplate) -> None:
+        job.set_status("running", started_at=time.time())
+        try:
+            executor = WorkflowExecutor(template, get_default_registry())
+            # Workflow nodes use the agent, so no agent run may overlap with them
+            with agent._run_lock:
+                state = executor.run(
+                    context={"agent": agent},
+                    progress=lambda event: job.emit(event.pop("type"), **event),
+                    stop=job.stop,
+                )
+            result = {"history": state.history, "errors": state.errors, "metrics": state.metrics}
+            self._finish(job, result=result, error="; ".join(state.errors) or None)
+        except Exception as e:
+            self._finish(job, error=str(e))
+
+    def get(self, job_id: str) -> Job:
+        """
+        Raises:
+            KeyError: If the job is unknown or was dropped after finishing.
+        """
+        with self._lock:
+            return self._jobs[job_id]
+
+    def list_jobs(self, session_id: Optional[str] = None) -> list[Job]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [j for j in jobs if session_id is None or j.session_id == session_id]
+
+    def cancel(self, job_id: str) -> Job:
+        job = self.get(job_id)
+        if not job.done:
+            if job.started_at:
+                # Stop the workflow right away; the future callback runs on the next loop tick
+                job.stop.set()
+            job.future.cancel()
+        return job
+
+    def stats(self) -> dict[str, Any]:
+        counts: dict[str, int] = {}
+        for job in self.list_jobs():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
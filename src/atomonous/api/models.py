@@ -1,15 +1,73 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Literal
 
 class InitializeRequest(BaseModel):
     model_id: str = Field(default="Auto", description="The ID of the model to use for the agent.")
 
 class ChatRequest(BaseModel):
     query: str = Field(..., description="The query string to send to the agent.")
+    session_id: str = Field(default="default", description="Session whose queue the run joins. Runs of one session execute one at a time, in order.")
 
 class ChatResponse(BaseModel):
     response: str = Field(..., description="The agent's response to the query.")
+    session_id: str = Field(default="default", description="Session that served the request.")
+
+class SessionCreateRequest(BaseModel):
+    model_id: Optional[str] = Field(default=None, description="Loaded model the session uses. Defaults to the most recently initialized model.")
+    session_name: str = Field(default="", description="Optional slug used in the session's artifact folder name.")
+
+class SessionInfo(BaseModel):
+    session_id: str
+    model_id: str
+    session_dir: str
+    created_at: float
+    idle_s: float
+
+class JobRequest(BaseModel):
+    kind: Literal["workflow", "chat"] = Field(..., description="'workflow' executes a workflow YAML, 'chat' runs a query detached from the request.")
+    session_id: str = Field(default="default", description="Session whose agent runs the job and whose directory stores its results.")
+    query: Optional[str] = Field(default=None, description="Query for a chat job.")
+    workflow_yaml: Optional[str] = Field(default=None, description="Workflow YAML content for a workflow job.")
+    workflow_path: Optional[str] = Field(default=None, description="Path of a workflow YAML file in the session directory, e.g. one designed by the agent, used if workflow_yaml is not given.")
+
+class JobInfo(BaseModel):
+    job_id: str
+    session_id: str
+    kind: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    events: int = 0
+    result: Any = None
+    error: Optional[str] = None
+    job_dir: str
+
+class ApprovalInfo(BaseModel):
+    approval_id: str
+    owner: Optional[str] = Field(default=None, description="Session whose run requested the tool call.")
+    tools: List[str]
+    code: str
+    status: Literal["pending", "approved", "denied", "expired", "cancelled"]
+    reason: Optional[str] = None
+    created_at: float
+    expires_at: Optional[float] = None
+    decided_at: Optional[float] = None
+
+class ApprovalDecision(BaseModel):
+    approved: bool = Field(..., description="True runs the tool call, False denies it.")
+    reason: Optional[str] = Field(default=None, description="Optional note passed back to the agent on denial.")
+
+class ApprovalBatchDecision(ApprovalDecision):
+    approval_ids: Optional[List[str]] = Field(default=None, description="Only decide these requests.")
+    tool: Optional[str] = Field(default=None, description="Only decide requests calling this tool.")
+    session_id: Optional[str] = Field(default=None, description="Only decide requests of this session.")
 
 class HealthResponse(BaseModel):
     status: str = "ok"
     model_id: Optional[str] = None
+    scheduler: Optional[dict[str, Any]] = None
+    sessions: Optional[dict[str, Any]] = None
+    jobs: Optional[dict[str, Any]] = None
+    model_loads: Optional[List[dict[str, Any]]] = None
+    mcp_connections: Optional[List[dict[str, Any]]] = None
@@ -0,0 +1,213 @@
+"""
+Bounded execution of agent runs for the API server.
+
+Runs execute on a fixed-size thread pool so the event loop stays free for other requests.
+Every session has its own FIFO queue: a session's runs execute one at a time and in
+submission order, because one Agent must never run twice concurrently. When all workers are
+busy, the oldest waiting run of any idle session starts next.
+
+Schedulers with separate worker pools can share their sessions (`share_sessions_with`): a
+session's run then waits while the same session runs on any of them.
+"""
+
+import asyncio
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a run cannot be queued because a queue limit is reached.
+    """
+
+    def __init__(self, session_id: str, queue_depth: int, max_queue_depth: int, scope: str):
+        self.session_id = session_id
+        self.queue_depth = queue_depth
+        self.max_queue_depth = max_queue_depth
+        self.scope = scope
+        super().__init__(
+            f"{scope.capitalize()} queue is full ({queue_depth}/{max_queue_depth} runs waiting)."
+        )
+
+    def detail(self) -> dict[str, Any]:
+        return {
+            "message": str(self),
+            "session_id": self.session_id,
+            "scope": self.scope,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+@dataclass(eq=False)
+class _Job:
+    fn: Callable[[], Any]
+    future: asyncio.Future
+    loop: asyncio.AbstractEventLoop
+    on_cancel: Optional[Callable[[], None]] = None
+    seq: int = 0
+    started: bool = False
+
+
+def _resolve(future: asyncio.Future, result: Any, error: Optional[BaseException]) -> None:
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class RunScheduler:
+    """
+    Thread pool with per-session FIFO queues.
+
+    Args:
+        max_workers: Number of runs that may execute at the same time across all sessions.
+        max_queue_per_session: Number of runs a session may have waiting to start.
+        max_queued_total: Number of waiting runs across all sessions.
+        share_sessions_with: Scheduler whose sessions' runs must not overlap with this one's,
+            e.g. chat requests and jobs on the same agents.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queue_per_session: int = 8,
+        max_queued_total: int = 64,
+        share_sessions_with: Optional["RunScheduler"] = None,
+    ):
+        self.max_workers = max_workers
+        self.max_queue_per_session = max_queue_per_session
+        self.max_queued_total = max_queued_total
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-run")
+        self._queues: dict[str, deque[_Job]] = {}
+        # Sessions running on this scheduler
+        self._active: set[str] = set()
+        if share_sessions_with is None:
+            self._lock = threading.Lock()
+            self._seq = itertools.count()
+            # Sessions running on any scheduler of the group, and the group itself
+            self._busy: set[str] = set()
+            self._group: list[RunScheduler] = [self]
+        else:
+            other = share_sessions_with
+            self._lock, self._seq, self._busy, self._group = other._lock, other._seq, other._busy, other._group
+            with self._lock:
+                self._group.append(self)
+
+    def submit(
+        self,
+        session_id: str,
+        fn: Callable[[], Any],
+        on_cancel: Optional[Callable[[], None]] = None,
+    ) -> asyncio.Future:
+        """
+        Queue `fn` behind the session's earlier runs. Must be called from the event loop.
+
+        Args:
+            session_id: Queue to join; runs of one session never overlap.
+            fn: Blocking callable executed on a worker thread.
+            on_cancel: Called if the returned future is cancelled after `fn` has started,
+                       e.g. to interrupt the agent. Cancelled runs that have not started are skipped.
+
+        Returns:
+            A future resolved with the return value of `fn`.
+
+        Raises:
+            QueueFullError: If the session or global queue limit is reached.
+        """
+        loop = asyncio.get_running_loop()
+        job = _Job(fn=fn, future=loop.create_future(), loop=loop, on_cancel=on_cancel)
+        job.future.add_done_callback(lambda f: self._cancelled(job) if f.cancelled() else None)
+
+        with self._lock:
+            queue = self._queues.setdefault(session_id, deque())
+            if len(queue) >= self.max_queue_per_session:
+                raise QueueFullError(session_id, len(queue), self.max_queue_per_session, "session")
+            total = self._queued_total()
+            if total >= self.max_queued_total:
+                raise QueueFullError(session_id, total, self.max_queued_total, "server")
+            job.seq = next(self._seq)
+            queue.append(job)
+            self._dispatch()
+        return job.future
+
+    def _cancelled(self, job: _Job) -> None:
+        with self._lock:
+            if not job.started:
+                # Free the queue slot right away instead of waiting for the job to be skipped
+                for queue in self._queues.values():
+                    if job in queue:
+                        queue.remove(job)
+                        return
+        if job.on_cancel is not None:
+            job.on_cancel()
+
+    def _queued_total(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _dispatch(self) -> None:
+        """Start waiting runs while workers are free, oldest first. Caller holds the lock."""
+        while len(self._active) < self.max_workers:
+            ready = [
+                (queue[0].seq, session_id)
+                for session_id, queue in self._queues.items()
+                if queue and session_id not in self._busy
+            ]
+            if not ready:
+                break
+            _, session_id = min(ready)
+            job = self._queues[session_id].popleft()
+            if job.future.cancelled():
+                continue
+            job.started = True
+            self._active.add(session_id)
+            self._busy.add(session_id)
+            self._executor.submit(self._execute, session_id, job)
+
+        for session_id in [sid for sid, queue in self._queues.items() if not queue and sid not in self._active]:
+            del self._queues[session_id]
+
+    def _execute(self, session_id: str, job: _Job) -> None:
+        result, error = None, None
+        try:
+            result = job.fn()
+        except BaseException as e:
+            error = e
+        try:
+            job.loop.call_soon_threadsafe(_resolve, job.future, result, error)
+        except RuntimeError:
+            # The event loop is gone; nobody is waiting for this result
+            pass
+        with self._lock:
+            self._active.discard(session_id)
+            self._busy.discard(session_id)
+            # The session may have runs waiting on another scheduler of the group
+            for scheduler in self._group:
+                scheduler._dispatch()
+
+    def queue_depth(self, session_id: str) -> int:
+        """Number of the session's runs that have not started yet."""
+        with self._lock:
+            return len(self._queues.get(session_id, ()))
+
+    def is_busy(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._active
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "active_runs": len(self._active),
+                "queued_runs": self._queued_total(),
+                "sessions_waiting": sum(1 for q in self._queues.values() if q),
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -1,82 +1,582 @@
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.responses import StreamingResponse
-from typing import Optional
+import asyncio
 import json
-from atomonous.api.models import InitializeRequest, ChatRequest, ChatResponse, HealthResponse
+import time
+from pathlib import Path
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import Optional
+from atomonous.api.models import (
+    InitializeRequest, ChatRequest, ChatResponse, HealthResponse, SessionCreateRequest, SessionInfo,
+    JobRequest, JobInfo, ApprovalInfo, ApprovalDecision, ApprovalBatchDecision,
+)
 from atomonous.config import settings
-from atomonous.agent.core import Agent
+from atomonous.api.scheduler import RunScheduler, QueueFullError
+from atomonous.api.sessions import Session, SessionPool
+from atomonous.api.streaming import KEEP_ALIVE, format_sse, sse_events
+from atomonous.api.jobs import Job, JobManager
+from atomonous.api import artifacts
+from atomonous.agent.approval import QueueApprovalBroker
+from atomonous.agent.mcp_pool import mcp_pool
+from atomonous.utils import metrics
+
+# Sessions that used the API before session IDs existed all share this one
+DEFAULT_SESSION_ID = "default"
+
+# How often idle and surplus sessions are swept
+_EVICTION_INTERVAL_S = 30.0
+
+# Suggested client back-off while a model is loading
+_RETRY_AFTER_S = 5
+
+# Runs execute on a bounded worker pool, one at a time per session
+scheduler = RunScheduler(
+    max_workers=settings.api_max_workers,
+    max_queue_per_session=settings.api_max_queue_per_session,
+    max_queued_total=settings.api_max_queued_total,
+)
+
+# Long-running jobs get their own workers so they never block chat requests, but wait for
+# the session's chat runs (and vice versa), since both use the session's agent
+jobs = JobManager(RunScheduler(
+    max_workers=settings.api_max_concurrent_jobs,
+    max_queue_per_session=settings.api_max_queued_jobs,
+    max_queued_total=settings.api_max_queued_jobs,
+    share_sessions_with=scheduler,
+), max_finished=settings.api_max_finished_jobs)
+
+
+def _session_busy(session_id: str) -> bool:
+    return any(
+        s.is_busy(session_id) or s.queue_depth(session_id) > 0
+        for s in (scheduler, jobs.scheduler)
+    )
+
+
+# Dangerous tool calls of API sessions wait here until a client approves or denies them
+approvals = QueueApprovalBroker(timeout_s=settings.approval_timeout_s)
+
+# Per-session agents sharing model weights and MCP connections
+sessions = SessionPool(
+    max_sessions=settings.api_max_sessions,
+    idle_timeout_s=settings.api_session_idle_timeout_s,
+    min_available_ram_gb=settings.api_min_available_ram_gb,
+    is_busy=_session_busy,
+    approval_broker=approvals,
+)
+
+
+def _batch_queue_depth() -> int:
+    batchers = [getattr(m, "batcher", None) for m in sessions.models]
+    return sum(b.stats()["pending"] for b in batchers if b is not None)
+
+
+# Queue depths are read when /metrics is scraped
+metrics.QUEUE_DEPTH.set_function(lambda: scheduler.stats()["queued_runs"], queue="chat_runs")
+metrics.QUEUE_DEPTH.set_function(lambda: jobs.scheduler.stats()["queued_runs"], queue="jobs")
+metrics.QUEUE_DEPTH.set_function(_batch_queue_depth, queue="model_batch")
+metrics.QUEUE_DEPTH.set_function(lambda: len(approvals.pending()), queue="approvals")
+ACTIVE_RUNS = metrics.registry.gauge("active_runs", "Runs currently executing on a worker.", ("pool",))
+ACTIVE_RUNS.set_function(lambda: scheduler.stats()["active_runs"], pool="chat_runs")
+ACTIVE_RUNS.set_function(lambda: jobs.scheduler.stats()["active_runs"], pool="jobs")
+metrics.registry.gauge("sessions", "Live agent sessions.").set_function(lambda: len(sessions.list_sessions()))
+
+
+# Background model loads; kept referenced until they finish
+_load_tasks: set[asyncio.Task] = set()
 
-app = FastAPI(title="Microscopy AI Agent API")
 
-# Global agent instance
-_agent: Optional[Agent] = None
+async def _load_model(model_id: str) -> None:
+    warmup_session_id = DEFAULT_SESSION_ID if settings.api_warmup_enabled else None
+    try:
+        await asyncio.to_thread(
+            sessions.load_model,
+            model_id,
+            warmup_session_id=warmup_session_id,
+            warmup_tokens=settings.api_warmup_tokens,
+        )
+    except Exception as e:
+        # The failure is reported through /health
+        print(f"[API] Loading model {model_id} failed: {e}")
+        return
+    # The default session follows the default model
+    if warmup_session_id is None and not _session_busy(DEFAULT_SESSION_ID):
+        sessions.close(DEFAULT_SESSION_ID)
+
+
+async def _evict_periodically():
+    while True:
+        await asyncio.sleep(_EVICTION_INTERVAL_S)
+        await asyncio.to_thread(sessions.evict)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sweeper = asyncio.create_task(_evict_periodically())
+    yield
+    sweeper.cancel()
+    for task in _load_tasks:
+        task.cancel()
+    sessions.shutdown()
+    mcp_pool.shutdown()
+    scheduler.shutdown()
+    jobs.scheduler.shutdown()
+
+
+app = FastAPI(title="Microscopy AI Agent API", lifespan=lifespan)
+
+
+class RequestLatencyMiddleware:
+    """
+    Records request latency until the response starts, so streamed responses count their
+    time to first byte. Plain ASGI, to leave streaming and disconnect detection untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        recorded = False
+
+        def record(status: int):
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            # Label by route template, not raw path, to keep label cardinality bounded
+            route = scope.get("route")
+            metrics.REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record(500)
 
-def get_agent() -> Agent:
-    global _agent
-    if _agent is None:
+
+app.add_middleware(RequestLatencyMiddleware)
+
+
+def _not_ready(detail: str) -> HTTPException:
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(_RETRY_AFTER_S)})
+
+
+def get_session(session_id: str) -> Session:
+    """
+    Look up a live session. The default session is created on first use.
+    """
+    if sessions.default_model_id is None:
+        if any(load.in_progress for load in sessions.model_loads()):
+            raise _not_ready("Model is still loading. Poll /ready or /health.")
         raise HTTPException(status_code=400, detail="Agent not initialized. Call /initialize first.")
-    return _agent
+    try:
+        if session_id == DEFAULT_SESSION_ID:
+            session = sessions.get_or_create(session_id)
+        else:
+            session = sessions.get(session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found or evicted.")
+    load = sessions.model_load(session.model_id)
+    if load is not None and load.in_progress:
+        raise _not_ready(f"Model '{session.model_id}' is {load.state}.")
+    return session
+
 
-@app.post("/initialize", response_model=HealthResponse)
-async def initialize(req: InitializeRequest):
+@app.post("/initialize", response_model=HealthResponse, status_code=202)
+async def initialize(req: InitializeRequest, response: Response):
     """
-    Initialize or re-initialize the agent with a specific model.
+    Start loading a model in the background; it becomes the default for new sessions once ready.
+    Returns at once with the load state. Poll /ready or /health for progress.
+    Models are loaded once and shared, so re-initializing with a loaded model is instant.
+    """
+    load = sessions.model_load(req.model_id)
+    if load is not None and load.state == "ready":
+        response.status_code = 200
+        sessions.load_model(req.model_id)
+        # The default session follows the default model
+        if not _session_busy(DEFAULT_SESSION_ID):
+            sessions.close(DEFAULT_SESSION_ID)
+    elif load is None or not load.in_progress:
+        load = sessions.begin_load(req.model_id)
+        task = asyncio.create_task(_load_model(req.model_id))
+        _load_tasks.add(task)
+        task.add_done_callback(_load_tasks.discard)
+    return HealthResponse(status=load.state, model_id=req.model_id, model_loads=[load.info()])
+
+
+@app.post("/sessions", response_model=SessionInfo)
+async def create_session(req: SessionCreateRequest):
+    """
+    Create a session with its own agent, memory and executor state on an already loaded model.
     """
-    global _agent
     try:
-        _agent = Agent.from_model_id(model_id=req.model_id)
-        return HealthResponse(status="initialized", model_id=req.model_id)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        session = await asyncio.to_thread(sessions.create, model_id=req.model_id, session_name=req.session_name)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+    return SessionInfo(**session.info())
+
+
+@app.get("/sessions", response_model=list[SessionInfo])
+async def list_sessions():
+    return [SessionInfo(**info) for info in sessions.list_sessions()]
+
+
+@app.delete("/sessions/{session_id}")
+async def close_session(session_id: str):
+    if _session_busy(session_id):
+        raise HTTPException(status_code=409, detail=f"Session '{session_id}' has runs in progress.")
+    if not sessions.close(session_id):
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found or evicted.")
+    return {"session_id": session_id, "status": "closed"}
+
+
+async def _cancel_on_disconnect(request: Request, task: asyncio.Future, poll_s: float = 0.5):
+    while not task.done():
+        if await request.is_disconnected():
+            task.cancel()
+            return
+        await asyncio.sleep(poll_s)
+
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest, agent: Agent = Depends(get_agent)):
+async def chat(req: ChatRequest, request: Request):
     """
-    Send a query to the agent and get a response.
+    Send a query to the session's agent and get a response.
+    The run waits in the session's queue, executes on the worker pool, and is cancelled
+    if the client disconnects.
     """
+    agent = get_session(req.session_id).agent
+    run = agent.run(req.query, autostart=False)
     try:
-        response = agent.chat(req.query)
-        return ChatResponse(response=response)
+        future = scheduler.submit(
+            req.session_id, lambda: str(run.start().final().output), on_cancel=lambda: agent.cancel(run)
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=e.detail())
+    agent.current_run = run
+
+    watcher = asyncio.create_task(_cancel_on_disconnect(request, future))
+    try:
+        response = await future
+        return ChatResponse(response=response, session_id=req.session_id)
+    except asyncio.CancelledError:
+        raise HTTPException(status_code=499, detail="Client disconnected.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        watcher.cancel()
 
 
-def _format_sse(event: str, data: str) -> str:
-    lines = data.splitlines() or [""]
-    payload = ""
-    if event:
-        payload += f"event: {event}\n"
-    for line in lines:
-        payload += f"data: {line}\n"
-    return payload + "\n"
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest, request: Request):
+    """
+    Stream the agent response as server-sent events: token deltas as they are generated,
+    then tool-call, tool-progress, step and final-answer events. The run waits in the session's queue like
+    /chat and is cancelled if the client disconnects.
+    """
+    agent = get_session(req.session_id).agent
+    run = agent.run(req.query, autostart=False)
 
+    def execute():
+        try:
+            run.start().final()
+        except Exception:
+            # Errors reach the client through the stream
+            pass
 
-@app.post("/chat/stream")
-async def chat_stream(req: ChatRequest, agent: Agent = Depends(get_agent)):
+    try:
+        future = scheduler.submit(req.session_id, execute, on_cancel=lambda: agent.cancel(run))
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=e.detail())
+    agent.current_run = run
+
+    async def event_stream():
+        try:
+            async for message in sse_events(
+                run.asubscribe(),
+                heartbeat_s=settings.stream_heartbeat_s,
+                batch_window_s=settings.stream_batch_window_s,
+                batch_max_chars=settings.stream_batch_max_chars,
+            ):
+                yield message
+        finally:
+            # Client gone or stream finished: drop the run if it is still queued or running
+            if not run.done:
+                future.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/jobs", response_model=JobInfo, status_code=202)
+async def submit_job(req: JobRequest):
     """
-    Stream the agent response as server-sent events.
+    Queue a workflow execution or chat task and return its job ID at once.
+    The job keeps running if the client disconnects.
     """
+    agent = get_session(req.session_id).agent
+    try:
+        job = jobs.submit(
+            agent,
+            session_id=req.session_id,
+            kind=req.kind,
+            query=req.query,
+            workflow_yaml=req.workflow_yaml,
+            workflow_path=req.workflow_path,
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=e.detail())
+    except (ValueError, OSError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JobInfo(**job.info())
 
-    def event_generator():
+
+def _get_job(job_id: str) -> Job:
+    try:
+        return jobs.get(job_id)
+    except KeyError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Job '{job_id}' not found. Older finished jobs are only kept in their session's jobs folder.",
+        )
+
+
+@app.get("/jobs", response_model=list[JobInfo])
+async def list_jobs(session_id: Optional[str] = None):
+    return [JobInfo(**job.info()) for job in jobs.list_jobs(session_id)]
+
+
+@app.get("/jobs/{job_id}", response_model=JobInfo)
+async def job_status(job_id: str):
+    return JobInfo(**_get_job(job_id).info())
+
+
+@app.delete("/jobs/{job_id}", response_model=JobInfo)
+async def cancel_job(job_id: str):
+    """
+    Cancel a job. A queued job is dropped; a running workflow stops before its next node
+    and a running chat task before its next step.
+    """
+    return JobInfo(**jobs.cancel(_get_job(job_id).job_id).info())
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Stream a job's progress as server-sent events: all past events first, then live ones,
+    ending with a `done` event carrying the final job status.
+    """
+    job = _get_job(job_id)
+    queue = job.subscribe()
+
+    async def event_stream():
         try:
-            for event in agent.stream_chat(req.query):
-                event_type = event.get("type", "delta")
-                content = event.get("content", "")
-                payload = json.dumps({"content": content})
-                yield _format_sse(event_type, payload)
-            yield _format_sse("done", "[DONE]")
-        except Exception as e:
-            yield _format_sse("error", json.dumps({"detail": str(e)}))
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.stream_heartbeat_s)
+                except asyncio.TimeoutError:
+                    yield KEEP_ALIVE
+                    continue
+                if event is None:
+                    yield format_sse("done", json.dumps(job.info(), default=str))
+                    return
+                yield format_sse(event["type"], json.dumps(event, default=str))
+        finally:
+            job.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/approvals", response_model=list[ApprovalInfo])
+async def list_approvals(session_id: Optional[str] = None):
+    """
+    Tool calls awaiting approval, optionally of one session.
+    """
+    return [ApprovalInfo(**r.info()) for r in approvals.pending(owner=session_id)]
+
+
+@app.post("/approvals/resolve", response_model=list[ApprovalInfo])
+async def resolve_approvals(req: ApprovalBatchDecision):
+    """
+    Approve or deny all pending tool calls matching the filters at once,
+    e.g. every pending `set_beam_current` call of a session.
+    """
+    decided = approvals.resolve_many(
+        req.approved,
+        approval_ids=req.approval_ids,
+        tool=req.tool,
+        owner=req.session_id,
+        reason=req.reason,
+    )
+    return [ApprovalInfo(**r.info()) for r in decided]
+
+
+@app.get("/approvals/events")
+async def approval_events():
+    """
+    Stream approval requests and decisions as server-sent events, starting with the
+    requests pending at connection time.
+    """
+    queue = approvals.subscribe()
+
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.stream_heartbeat_s)
+                except asyncio.TimeoutError:
+                    yield KEEP_ALIVE
+                    continue
+                yield format_sse(event["type"], json.dumps(event, default=str))
+        finally:
+            approvals.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/approvals/{approval_id}", response_model=ApprovalInfo)
+async def approval_status(approval_id: str):
+    try:
+        return ApprovalInfo(**approvals.get(approval_id).info())
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Approval '{approval_id}' not found.")
+
+
+@app.post("/approvals/{approval_id}", response_model=ApprovalInfo)
+async def resolve_approval(approval_id: str, req: ApprovalDecision):
+    """
+    Approve or deny one pending tool call. The waiting agent run continues at once.
+    """
+    try:
+        request = approvals.resolve(approval_id, req.approved, req.reason)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Approval '{approval_id}' not found.")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return ApprovalInfo(**request.info())
+
+
+def _artifacts_dir() -> Path:
+    return Path(settings.artifacts_dir).expanduser().resolve()
+
+
+def _artifact_file(session_name: str, file_path: str) -> Path:
+    try:
+        return artifacts.resolve_file(_artifacts_dir(), session_name, file_path)
+    except ValueError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/artifacts")
+async def list_artifact_sessions():
+    """
+    Session folders in the artifacts directory, newest first. Live sessions carry their session_id.
+    """
+    live = {Path(s["session_dir"]).name: s["session_id"] for s in sessions.list_sessions()}
+    folders = await asyncio.to_thread(artifacts.list_sessions, _artifacts_dir())
+    return [{**folder, "session_id": live.get(folder["name"])} for folder in folders]
+
+
+@app.get("/artifacts/{session_name}")
+async def list_session_artifacts(session_name: str):
+    """
+    Files of one session folder, with size, ETag and whether a thumbnail is available.
+    """
+    try:
+        return await asyncio.to_thread(artifacts.list_artifacts, _artifacts_dir(), session_name)
+    except ValueError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/artifacts/{session_name}/files/{file_path:path}")
+async def download_artifact(session_name: str, file_path: str, request: Request):
+    """
+    Stream an artifact. Supports If-None-Match revalidation and single byte ranges.
+    """
+    path = _artifact_file(session_name, file_path)
+    return artifacts.file_response(path, request.headers, chunk_size=settings.api_artifact_chunk_kb * 1024)
+
+
+@app.get("/artifacts/{session_name}/thumbnails/{file_path:path}")
+async def artifact_thumbnail(session_name: str, file_path: str, request: Request, size: Optional[int] = None):
+    """
+    PNG thumbnail of an image or image-like .npy artifact, rendered once and cached.
+    """
+    path = _artifact_file(session_name, file_path)
+    max_size = max(16, min(size or settings.api_thumbnail_size, 2048))
+    try:
+        thumb = await asyncio.to_thread(artifacts.thumbnail, path, Path(settings.api_thumbnail_cache_dir), max_size)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    return artifacts.file_response(thumb, request.headers)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Metrics in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once the default model is loaded and warmed up, 503 before.
+    """
+    if sessions.default_model_id is None:
+        loads = sessions.model_loads()
+        state = max(loads, key=lambda load: load.started_at).state if loads else "agent_not_initialized"
+        return JSONResponse({"status": state}, status_code=503, headers={"Retry-After": str(_RETRY_AFTER_S)})
+    return {"status": "ready", "model_id": sessions.default_model_id}
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 @app.get("/health", response_model=HealthResponse)
 async def health():
     """
-    Check the health of the API and agent status.
+    Check the health of the API and agent status. While no model is ready, the status is the
+    state of the latest load: loading, warming or failed.
     """
-    model_id = _agent.model.model_id if _agent else None
+    model_id = sessions.default_model_id
+    loads = sessions.model_loads()
+    if model_id:
+        status = "ok"
+    elif loads:
+        status = max(loads, key=lambda load: load.started_at).state
+    else:
+        status = "agent_not_initialized"
     return HealthResponse(
-        status="ok" if _agent else "agent_not_initialized",
-        model_id=model_id
-    )
\ No newline at end of file
+        status=status,
+        model_id=model_id,
+        scheduler=scheduler.stats(),
+        sessions=sessions.stats(),
+        jobs=jobs.stats(),
+        model_loads=[load.info() for load in loads],
+        mcp_connections=mcp_pool.health(),
+    )
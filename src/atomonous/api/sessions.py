@@ -0,0 +1,361 @@
+"""
+Session-scoped agents for the API server.
+
+Each session owns its own Agent, and with it its SessionMemory, executor state and
+conversation. Model weights and MCP connections are expensive, so they live in the pool and
+are shared by all sessions: creating a session only builds the lightweight Agent around them.
+Idle sessions are evicted after a timeout, and the least recently used ones when the session
+limit is reached or available memory runs low.
+
+Model loads are tracked as ModelLoad records moving through loading -> warming -> ready,
+or failed, so the server can report readiness while weights load in the background.
+"""
+
+import gc
+import threading
+import time
+import uuid
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import psutil
+from smolagents import Model
+
+from atomonous.agent.approval import ApprovalBroker
+from atomonous.agent.core import Agent
+from atomonous.agent.mcp_client import ExtendedMCPClient
+
+
+@dataclass
+class Session:
+    session_id: str
+    model_id: str
+    agent: Agent
+    created_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.monotonic)
+
+    def info(self) -> dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "model_id": self.model_id,
+            "session_dir": str(self.agent.memory.session_dir),
+            "created_at": self.created_at,
+            "idle_s": round(time.monotonic() - self.last_used, 3),
+        }
+
+
+MODEL_LOAD_STATES = ("loading", "warming", "ready", "failed")
+
+
+@dataclass
+class ModelLoad:
+    model_id: str
+    state: str = "loading"
+    phase: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def in_progress(self) -> bool:
+        return self.state in ("loading", "warming")
+
+    def info(self) -> dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "model_id": self.model_id,
+            "state": self.state,
+            "phase": self.phase,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_s": round(end - self.started_at, 3),
+            "error": self.error,
+        }
+
+
+def _available_ram_gb() -> float:
+    return psutil.virtual_memory().available / (1024**3)
+
+
+class SessionPool:
+    """
+    Registry of shared models and MCP clients plus the live sessions built on them.
+
+    Args:
+        max_sessions: Number of live sessions; creating one more evicts the least recently used.
+        idle_timeout_s: Sessions unused for longer than this are evicted.
+        min_available_ram_gb: While available RAM is below this, each eviction pass drops the least recently used idle session.
+        is_busy: Callback telling whether a session has a run in progress; busy sessions are never evicted.
+        approval_broker: Broker that decides dangerous tool calls of all sessions; requests are tagged with the session ID.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 16,
+        idle_timeout_s: float = 1800.0,
+        min_available_ram_gb: float = 1.0,
+        is_busy: Optional[Callable[[str], bool]] = None,
+        available_ram_gb: Callable[[], float] = _available_ram_gb,
+        approval_broker: Optional[ApprovalBroker] = None,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_timeout_s = idle_timeout_s
+        self.min_available_ram_gb = min_available_ram_gb
+        self.is_busy = is_busy or (lambda session_id: False)
+        self._available_ram_gb = available_ram_gb
+        self.approval_broker = approval_broker
+
+        self._lock = threading.RLock()
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._models: dict[str, Model] = {}
+        self._model_locks: dict[str, threading.Lock] = {}
+        self.default_model_id: Optional[str] = None
+        self._loads: dict[str, ModelLoad] = {}
+        self.mcp_clients: list[ExtendedMCPClient] = []
+        self.evicted = 0
+
+    # Shared resources
+
+    def register_model(self, model_id: str, model: Model, default: bool = True) -> None:
+        """Make an already loaded model available to new sessions."""
+        with self._lock:
+            self._models[model_id] = model
+            if default or self.default_model_id is None:
+                self.default_model_id = model_id
+            load = self._loads.setdefault(model_id, ModelLoad(model_id))
+            if load.state != "ready":
+                load.state, load.phase, load.finished_at = "ready", None, time.time()
+
+    def load_model(
+        self,
+        model_id: str,
+        default: bool = True,
+        warmup_session_id: Optional[str] = None,
+        warmup_tokens: int = 8,
+    ) -> Model:
+        """
+        Return the shared model for `model_id`, loading it on first use. Blocking; progress is
+        reported through `model_load(model_id)`.
+
+        Args:
+            model_id: Model to load.
+            default: Make the model the default for new sessions once it is ready.
+            warmup_session_id: If given and the model is newly loaded, (re)create this session on
+                the model and run a short generation on its system prompt. The first real request
+                then finds the prompt prefix cached and the kernels compiled.
+            warmup_tokens: New tokens generated by the warmup.
+        """
+        with self._lock:
+            lock = self._model_locks.setdefault(model_id, threading.Lock())
+        # Concurrent requests for the same model wait for a single load
+        with lock:
+            model = self._models.get(model_id)
+            if model is not None:
+                self.register_model(model_id, model, default=default)
+                return model
+
+            load = self.begin_load(model_id)
+            try:
+                model = Agent.load_model(model_id, progress=lambda phase: setattr(load, "phase", phase))
+                if warmup_session_id is not None:
+                    load.state, load.phase = "warming", "warmup"
+                    with self._lock:
+                        self._models[model_id] = model
+                    self._warm_up(model_id, model, warmup_session_id, warmup_tokens)
+            except Exception as e:
+                with self._lock:
+                    self._models.pop(model_id, None)
+                load.state, load.error, load.finished_at = "failed", str(e), time.time()
+                raise
+            self.register_model(model_id, model, default=default)
+        return model
+
+    def begin_load(self, model_id: str) -> ModelLoad:
+        """
+        Record a load as started, so its state is visible before the loading thread runs.
+        Returns the load already in progress, if any.
+        """
+        with self._lock:
+            load = self._loads.get(model_id)
+            if load is None or not load.in_progress:
+                load = self._loads[model_id] = ModelLoad(model_id, phase="queued")
+            return load
+
+    def _warm_up(self, model_id: str, model: Model, session_id: str, max_new_tokens: int) -> None:
+        # A session still on the previous model is replaced, unless it is serving a run
+        if not self.is_busy(session_id):
+            self.close(session_id)
+        try:
+            session = self.create(model_id=model_id, session_id=session_id)
+        except KeyError:
+            return
+        messages = session.agent.agent.write_memory_to_messages()
+        start = time.perf_counter()
+        model.generate(messages, max_new_tokens=max_new_tokens)
+        recorder = getattr(model, "call_recorder", None)
+        if recorder is not None:
+            # The warmup is not part of any agent step
+            recorder.drain()
+        print(f"[SessionPool] Warmed up {model_id} in {time.perf_counter() - start:.2f}s")
+
+    def model_load(self, model_id: Optional[str] = None) -> Optional[ModelLoad]:
+        """Load record for `model_id` (default: the default model), or None if never loaded."""
+        with self._lock:
+            return self._loads.get(model_id or self.default_model_id)
+
+    def model_loads(self) -> list[ModelLoad]:
+        with self._lock:
+            return list(self._loads.values())
+
+    @property
+    def model_ids(self) -> list[str]:
+        with self._lock:
+            return list(self._models)
+
+    @property
+    def models(self) -> list[Model]:
+        with self._lock:
+            return list(self._models.values())
+
+    def add_mcp_client(self, client: ExtendedMCPClient) -> None:
+        """Share a connected MCP client with sessions created from now on."""
+        with self._lock:
+            self.mcp_clients.append(client)
+
+    # Sessions
+
+    def create(self, model_id: Optional[str] = None, session_id: Optional[str] = None, session_name: str = "") -> Session:
+        """
+        Create a session around an already loaded model.
+
+        Raises:
+            KeyError: If the model is not loaded or the session ID is taken.
+        """
+        model_id = model_id or self.default_model_id
+        with self._lock:
+            if model_id not in self._models:
+                raise KeyError(f"Model '{model_id}' is not loaded.")
+            session_id = session_id or uuid.uuid4().hex[:16]
+            if session_id in self._sessions:
+                raise KeyError(f"Session '{session_id}' already exists.")
+            model = self._models[model_id]
+            clients = list(self.mcp_clients)
+
+        agent = Agent(model=model, session_name=session_name or session_id)
+        if self.approval_broker is not None:
+            agent.use_approval_broker(self.approval_broker, owner=session_id)
+        for client in clients:
+            agent.attach_mcp_client(client, owned=False)
+        session = Session(session_id=session_id, model_id=model_id, agent=agent)
+
+        with self._lock:
+            self._sessions[session_id] = session
+        self.evict(keep=session_id)
+        return session
+
+    def get(self, session_id: str) -> Session:
+        """
+        Return a live session and mark it as recently used.
+
+        Raises:
+            KeyError: If the session does not exist or was evicted.
+        """
+        with self._lock:
+            session = self._sessions[session_id]
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def get_or_create(self, session_id: str) -> Session:
+        with self._lock:
+            if session_id in self._sessions:
+                return self.get(session_id)
+            return self.create(session_id=session_id)
+
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self._release(session)
+        return True
+
+    def list_sessions(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [s.info() for s in self._sessions.values()]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _release(self, session: Session) -> None:
+        if self.approval_broker is not None:
+            self.approval_broker.cancel(owner=session.session_id)
+        session.agent.disconnect_mcp_clients()
+        print(f"[SessionPool] Closed session {session.session_id}")
+
+    def evict(self, keep: Optional[str] = None) -> list[str]:
+        """
+        Evict idle, surplus and memory-pressure sessions. Busy sessions and `keep` are spared.
+
+        Returns:
+            The IDs of evicted sessions.
+        """
+        now = time.monotonic()
+        victims: list[Session] = []
+        with self._lock:
+            def candidates():
+                return [
+                    s for s in self._sessions.values()
+                    if s.session_id != keep and not self.is_busy(s.session_id)
+                ]
+
+            for s in candidates():
+                if now - s.last_used > self.idle_timeout_s:
+                    victims.append(self._sessions.pop(s.session_id))
+
+            # OrderedDict keeps least recently used first
+            while len(self._sessions) > self.max_sessions and candidates():
+                victim = candidates()[0]
+                victims.append(self._sessions.pop(victim.session_id))
+
+            # Freed memory shows up with a delay, so give up one session per pass under pressure
+            if candidates() and self._available_ram_gb() < self.min_available_ram_gb:
+                victim = candidates()[0]
+                victims.append(self._sessions.pop(victim.session_id))
+
+            self.evicted += len(victims)
+
+        if len(self._sessions) > self.max_sessions:
+            warnings.warn(f"Session limit of {self.max_sessions} exceeded; all other sessions are busy.")
+        for session in victims:
+            self._release(session)
+        if victims:
+            gc.collect()
+        return [s.session_id for s in victims]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "evicted": self.evicted,
+                "models": list(self._models),
+                "model_loads": {model_id: load.state for model_id, load in self._loads.items()},
+                "mcp_clients": len(self.mcp_clients),
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            clients = list(self.mcp_clients)
+            self.mcp_clients.clear()
+        for session in sessions:
+            self._release(session)
+        for client in clients:
+            try:
+                client.disconnect()
+            except Exception:
+                pass
@@ -0,0 +1,164 @@
+"""
+Server-sent events for agent runs.
+
+Turns the items of a StreamedRun into SSE events: `delta` for generated text, `tool_call` and
+`tool_output` around code execution, `tool_progress` while a long-running tool reports
+progress, `step` when a step completes, and `final_answer`.
+Consecutive token deltas are batched to cut per-event overhead, except the first one, which
+is sent immediately so time-to-first-byte follows the model's time-to-first-token. A comment
+line is sent as keep-alive whenever the run is silent for a while (e.g. during a long tool call).
+"""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, Optional
+
+from smolagents import ActionStep, FinalAnswerStep, PlanningStep
+from smolagents.agents import ToolOutput
+from smolagents.memory import ToolCall
+from smolagents.models import ChatMessageStreamDelta
+
+from atomonous.agent.progress import ToolProgress, describe_partial
+
+# Observations in step events are cut to keep events small; the full text is in the step JSON
+STEP_OBSERVATION_MAX_CHARS = 2000
+
+KEEP_ALIVE = ": keep-alive\n\n"
+
+
+def format_sse(event: str, data: str) -> str:
+    lines = data.splitlines() or [""]
+    payload = ""
+    if event:
+        payload += f"event: {event}\n"
+    for line in lines:
+        payload += f"data: {line}\n"
+    return payload + "\n"
+
+
+def _clip(text: Any, limit: int = STEP_OBSERVATION_MAX_CHARS) -> Optional[str]:
+    if text is None:
+        return None
+    text = str(text)
+    return text if len(text) <= limit else text[:limit] + f"... [{len(text) - limit} chars omitted]"
+
+
+def to_event(item: Any) -> Optional[tuple[str, dict[str, Any]]]:
+    """
+    Map a StreamedRun item to an (event, payload) pair, or None for items that are not streamed.
+    """
+    if isinstance(item, ChatMessageStreamDelta):
+        return ("delta", {"content": item.content}) if item.content else None
+    if isinstance(item, ToolCall):
+        return "tool_call", {"id": item.id, "name": item.name, "arguments": item.arguments}
+    if isinstance(item, ToolOutput):
+        return "tool_output", {"id": item.id, "observation": _clip(item.observation), "is_final_answer": item.is_final_answer}
+    if isinstance(item, ToolProgress):
+        return "tool_progress", {
+            "tool": item.tool,
+            "progress": item.progress,
+            "total": item.total,
+            "message": item.message,
+            "elapsed_s": item.elapsed_s,
+            "partial": describe_partial(item.partial),
+        }
+    if isinstance(item, ActionStep):
+        usage = item.token_usage.dict() if item.token_usage else None
+        return "step", {
+            "type": "action",
+            "step_number": item.step_number,
+            "duration": item.timing.duration,
+            "observations": _clip(item.observations),
+            "error": str(item.error) if item.error else None,
+            "token_usage": usage,
+        }
+    if isinstance(item, PlanningStep):
+        return "step", {"type": "planning", "plan": item.plan, "duration": item.timing.duration}
+    if isinstance(item, FinalAnswerStep):
+        return "final_answer", {"output": str(item.output)}
+    return None
+
+
+async def sse_events(
+    items: AsyncIterator,
+    heartbeat_s: float = 15.0,
+    batch_window_s: float = 0.05,
+    batch_max_chars: int = 256,
+) -> AsyncIterator[str]:
+    """
+    Encode a run's items as SSE messages, ending with a `done` event, or an `error` event if the run fails.
+
+    Args:
+        items: Async iterator of StreamedRun items, e.g. from `StreamedRun.asubscribe()`.
+        heartbeat_s: Silence after which a keep-alive comment is sent.
+        batch_window_s: Deltas arriving within this window of the first buffered one are merged.
+        batch_max_chars: A delta batch is flushed once it reaches this size.
+    """
+    iterator = items.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    buffer: list[str] = []
+    buffered_chars = 0
+    batch_deadline = 0.0
+    first_delta_sent = False
+    loop = asyncio.get_running_loop()
+
+    def flush() -> str:
+        nonlocal buffered_chars
+        message = format_sse("delta", json.dumps({"content": "".join(buffer)}))
+        buffer.clear()
+        buffered_chars = 0
+        return message
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = max(0.0, batch_deadline - loop.time()) if buffer else heartbeat_s
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield flush() if buffer else KEEP_ALIVE
+                continue
+
+            future, pending = pending, None
+            try:
+                item = future.result()
+            except StopAsyncIteration:
+                break
+
+            event = to_event(item)
+            if event is None:
+                continue
+            name, payload = event
+
+            if name == "delta":
+                if not first_delta_sent:
+                    first_delta_sent = True
+                    yield format_sse(name, json.dumps(payload))
+                    continue
+                if not buffer:
+                    batch_deadline = loop.time() + batch_window_s
+                buffer.append(payload["content"])
+                buffered_chars += len(payload["content"])
+                if buffered_chars >= batch_max_chars:
+                    yield flush()
+                continue
+
+            if buffer:
+                yield flush()
+            yield format_sse(name, json.dumps(payload, default=str))
+
+        if buffer:
+            yield flush()
+        yield format_sse("done", "[DONE]")
+    except Exception as e:
+        if buffer:
+            yield flush()
+        yield format_sse("error", json.dumps({"detail": str(e)}))
+    finally:
+        if pending is not None:
+            pending.cancel()
+            # The generator cannot be closed while its __anext__ is still unwinding
+            await asyncio.wait({pending})
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
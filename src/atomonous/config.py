@@ -26,19 +26,88 @@ class MicroscopeSettings(BaseSettings):
     
     # Paths and Networks
     mcp_url: str = Field("http://localhost:8000/mcp", description="URL for the MCP server")
-    
+
+    # MCP Client
+    mcp_list_cache_ttl_s: float = Field(300.0, description="Seconds MCP prompt, resource and template listings are cached. 0 disables the cache.")
+    mcp_resource_cache_ttl_s: float = Field(3600.0, description="Seconds MCP resource contents are cached. 0 disables the cache.")
+    mcp_cache_max_entries: int = Field(256, description="Maximum number of cached MCP responses per server.")
+    mcp_cache_max_resource_mb: float = Field(64.0, description="Maximum size of cached MCP resource contents per server, in MB. Larger resources are never cached.")
+    mcp_health_interval_s: float = Field(15.0, description="Seconds between health pings of a pooled MCP connection.")
+    mcp_ping_timeout_s: float = Field(5.0, description="Seconds a health ping may take before the MCP connection counts as dropped.")
+    mcp_reconnect_base_s: float = Field(1.0, description="Delay before retrying a failed MCP reconnect; doubled after every failure.")
+    mcp_reconnect_max_s: float = Field(60.0, description="Upper bound of the MCP reconnect delay.")
+    mcp_call_timeout_s: float = Field(30.0, description="Default seconds an MCP call may take before it is cancelled on the adapter loop and on the server.")
+    mcp_tool_timeouts: Dict[str, float] = Field(default_factory=dict, description="Seconds per MCP tool, by tool name or glob pattern, e.g. {\"get_scanned_image\": 120, \"set_*\": 10}. Tools not listed use mcp_call_timeout_s.")
+    mcp_record_mode: str = Field("off", description="'record' appends every MCP tool call (arguments, raw response, latency) to mcp_calls.jsonl in the session directory. 'replay' serves the calls recorded in mcp_replay_path instead of connecting to a server. 'off' does neither.")
+    mcp_replay_path: str = Field("", description="Recording served in 'replay' mode.")
+    mcp_replay_timing: bool = Field(False, description="In 'replay' mode, wait as long as each recorded call took.")
+    mcp_tool_cache_enabled: bool = Field(True, description="Register MCP tools from their cached schemas at once and connect to the server in the background.")
+    mcp_tool_cache_dir: str = Field("~/.cache/atomonous/mcp_tools", description="Where the tool schemas of MCP servers are cached.")
+
     # Simulation Mode
-    sim_mode: bool = Field(False, description="Enable dry-run/simulator mode by default")
+    sim_mode: bool = Field(False, description="Enable dry-run/simulator mode by default. Agents connecting without server parameters start the local microscope simulator instead of using mcp_url.")
+    sim_image_size: int = Field(512, description="Default edge length in pixels of simulated images.")
+    sim_image_dtype: str = Field("uint16", description="NumPy dtype of simulated images, e.g. 'uint16' or 'float32'.")
+    sim_latency: str = Field("lognormal", description="Distribution of simulated tool latency: 'fixed', 'uniform', 'exponential' or 'lognormal'.")
+    sim_latency_mean_s: float = Field(0.05, description="Mean simulated latency of a tool call in seconds.")
+    sim_latency_spread: float = Field(0.5, description="Spread of the simulated latency: the sigma of 'lognormal', or the relative half-width of 'uniform'.")
+    sim_failure_rate: float = Field(0.0, description="Probability that a simulated tool call fails with an instrument error.")
+    sim_hang_rate: float = Field(0.0, description="Probability that a simulated tool call hangs for sim_hang_s, like a stuck instrument.")
+    sim_hang_s: float = Field(300.0, description="Seconds a hanging simulated tool call takes.")
+    sim_seed: int | None = Field(None, description="Seed of the simulator's random numbers, for reproducible runs.")
 
     # Agent Approval Control
     agent_autorun: bool = Field(False, description="If True, allow agent to execute tools without requiring manual approval. If False, each tool call requires user confirmation.")
+    approval_timeout_s: float = Field(300.0, description="Seconds an API approval request waits for a decision before the tool call is denied.")
 
     # Agent Execution Control
     agent_max_steps: int = Field(10, description="Maximum number of tool calls the agent can make in a single run to prevent infinite loops.")
+    agent_step_timeout_s: float = Field(600.0, description="Time budget in seconds for executing one agent step's code. MCP calls get at most the time left in it. 0 disables the budget.")
+
+    # Streaming
+    stream_replay_size: int = Field(4096, description="Number of events a StreamedRun keeps for late subscribers; old token deltas are evicted first.")
+    stream_heartbeat_s: float = Field(15.0, description="Seconds of silence after which an SSE stream sends a keep-alive comment.")
+    stream_batch_window_s: float = Field(0.05, description="Token deltas arriving within this many seconds are sent as one SSE event. The first delta is always sent immediately.")
+    stream_batch_max_chars: int = Field(256, description="A batch of token deltas is sent as soon as it reaches this many characters.")
+    stream_tool_progress: bool = Field(True, description="Ask MCP tools for progress notifications and stream them as the tools run. Partial frames are converted and described in the stream; the latest one per tool is kept on the executor.")
+    stream_tool_progress_max_pending: int = Field(64, description="Progress events waiting to be converted and streamed; when full, the oldest is dropped.")
+
+    # Context Management
+    context_policy: str = Field("summarize", description="Context compaction policy for agent memory: 'off', 'truncate' (cut large observations to head and tail) or 'summarize' (also collapse old steps into summaries).")
+    context_token_budget: int = Field(12000, description="Maximum estimated prompt tokens for the system prompt plus agent memory before old steps are collapsed.")
+    context_observation_max_chars: int = Field(6000, description="Observation logs longer than this are truncated to head and tail with a pointer to the saved step JSON.")
+    context_keep_recent_steps: int = Field(3, description="Number of most recent agent steps that are always kept verbatim.")
+
+    # API Server
+    api_max_workers: int = Field(2, description="Number of agent runs the API server executes at the same time across all sessions.")
+    api_max_queue_per_session: int = Field(4, description="Number of runs a session may have waiting behind its active run before requests are rejected with 429.")
+    api_max_queued_total: int = Field(32, description="Number of runs that may wait across all sessions before requests are rejected with 429.")
+    api_max_concurrent_jobs: int = Field(1, description="Number of jobs (workflow executions or detached chat tasks) that run at the same time. Jobs use their own workers, separate from chat requests.")
+    api_max_queued_jobs: int = Field(16, description="Number of jobs that may wait to start, per session and in total, before submissions are rejected with 429.")
+    api_max_finished_jobs: int = Field(256, description="Number of finished jobs the API server keeps in memory; older ones are dropped from the job list but stay on disk in their job directory.")
+    api_max_sessions: int = Field(16, description="Number of live API sessions; creating one more evicts the least recently used idle session.")
+    api_session_idle_timeout_s: float = Field(1800.0, description="API sessions unused for longer than this many seconds are evicted.")
+    api_min_available_ram_gb: float = Field(1.0, description="While available RAM is below this many GB, idle API sessions are evicted least recently used first.")
+    api_warmup_enabled: bool = Field(True, description="After loading a model, run a short generation on the default session's system prompt before reporting ready.")
+    api_warmup_tokens: int = Field(8, description="New tokens generated by the warmup.")
+    api_artifact_chunk_kb: int = Field(256, description="Chunk size in kilobytes for streamed artifact downloads.")
+    api_thumbnail_size: int = Field(256, description="Default edge length in pixels of artifact thumbnails.")
+    api_thumbnail_cache_dir: str = Field("~/.cache/atomonous/thumbnails", description="Where rendered artifact thumbnails are cached.")
 
     # Artifact & Memory Storage
     artifacts_dir: str = Field("./artifacts", description="Base directory for saving session artifacts (workflows, images, chat history, execution steps).")
 
+    # Local Inference
+    inference_quantization: str = Field("auto", description="Quantization for local models: 'auto' (4-bit on CUDA with bitsandbytes, none elsewhere), 'int8' (dynamic int8 on CPU) or 'none'.")
+    generation_time_budget_s: float = Field(90.0, description="Target wall-clock seconds per model call; max_new_tokens is scaled from measured tokens/s to fit it.")
+    measure_generation_speed: bool = Field(True, description="If True, run a short probe generation after loading a local model to measure tokens/s.")
+    prefix_cache_enabled: bool = Field(True, description="Reuse the KV cache of the prompt prefix shared between consecutive local model calls.")
+    prefix_cache_max_tokens: int = Field(32768, description="Maximum number of prompt tokens kept in the prefix KV cache.")
+    prefix_cache_max_mb: float = Field(2048.0, description="Memory cap in megabytes for the prefix KV cache tensors.")
+    local_batching_enabled: bool = Field(True, description="Decode concurrent calls to a shared local model together in one batch.")
+    local_batch_max_size: int = Field(4, description="Maximum number of concurrent model calls decoded in one batch.")
+    local_batch_max_wait_ms: float = Field(10.0, description="How long a model call waits for others to join its batch, in milliseconds.")
+
     # Other stuff
     hf_cache_dir: str = Field("~/.cache/huggingface", description="To configure where Huggingface will locally store data, models, etc.")
 
@@ -1,4 +1,6 @@
+import time
 from typing import List, Dict, Type, Optional, Any
+from atomonous.utils.metrics import CONVERTER_LATENCY
 from .converters import DataConverter, HeuristicMismatchError, AIFormat
 from .default_converters.image_converters import TiffConverter, NumpyImageConverter
 from .default_converters.text_converters import CsvConverter, Hdf5SummaryConverter, DictConverter
@@ -62,13 +64,20 @@ class ConverterFactory:
         # Try each candidate until one succeeds
         last_error = None
         for converter in candidates:
+            start = time.perf_counter()
+            outcome = "error"
             try:
-                return converter.convert(data)
+                result = converter.convert(data)
+                outcome = "ok"
+                return result
             except HeuristicMismatchError as e:
+                outcome = "mismatch"
                 last_error = e
                 continue
             except Exception as e:
                 last_error = e
                 continue
+            finally:
+                CONVERTER_LATENCY.observe(time.perf_counter() - start, converter=type(converter).__name__, outcome=outcome)
 
         raise ValueError(f"All matching converters for input failed. Last error: {last_error}")
@@ -0,0 +1,3 @@
+from atomonous.sim.mcp_server import SimConfig, SimulatedMicroscope, create_sim_server, sim_server_parameters
+
+__all__ = ["SimConfig", "SimulatedMicroscope", "create_sim_server", "sim_server_parameters"]
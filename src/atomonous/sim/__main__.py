@@ -0,0 +1,3 @@
+from atomonous.sim.mcp_server import main
+
+main()
@@ -0,0 +1,369 @@
+"""
+Local stand-in for the asyncroscopy microscope MCP server.
+
+Exposes the instrument tools the agent expects (`set_beam_current`, `place_beam`,
+`get_scanned_image`, ...) over MCP, backed by a simulated microscope instead of hardware.
+Images and spectra are returned in the `{"payload", "metadata", "encoding"}` format that
+`MCPJsonConverter` consumes. Every call takes a latency drawn from a configurable
+distribution and may fail or hang on purpose, so clients can be load tested and their error
+handling exercised on a laptop. `acquire_tilt_series` reports MCP progress after every
+frame, with the frame attached, like a long acquisition on the real instrument.
+
+Run it as its own process:
+
+    python -m atomonous.sim --transport streamable-http --port 8000
+    python -m atomonous.sim --latency fixed --latency-mean 0 --failure-rate 0.1
+
+With `settings.sim_mode`, `Agent.connect_mcp_client()` starts it over stdio by itself.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+from mcp.client.stdio import StdioServerParameters
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.server.fastmcp.exceptions import ToolError
+
+from atomonous.config import settings
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+@dataclass
+class SimConfig:
+    """
+    Behaviour of the simulated instrument.
+
+    Args:
+        image_size: Default edge length of images in pixels.
+        image_dtype: NumPy dtype of images.
+        latency: Latency distribution of tool calls, one of LATENCY_DISTRIBUTIONS.
+        latency_mean_s: Mean latency of a call.
+        latency_spread: Sigma of 'lognormal'; relative half-width of 'uniform'.
+        failure_rate: Probability that a call fails with an instrument error.
+        hang_rate: Probability that a call hangs for `hang_s`.
+        hang_s: Duration of a hanging call.
+        seed: Seed for reproducible latencies, faults and images.
+    """
+
+    image_size: int = 512
+    image_dtype: str = "uint16"
+    latency: str = "lognormal"
+    latency_mean_s: float = 0.05
+    latency_spread: float = 0.5
+    failure_rate: float = 0.0
+    hang_rate: float = 0.0
+    hang_s: float = 300.0
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        if self.latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{self.latency}'; expected one of {LATENCY_DISTRIBUTIONS}.")
+        np.dtype(self.image_dtype)
+
+    @classmethod
+    def from_settings(cls) -> "SimConfig":
+        return cls(
+            image_size=settings.sim_image_size,
+            image_dtype=settings.sim_image_dtype,
+            latency=settings.sim_latency,
+            latency_mean_s=settings.sim_latency_mean_s,
+            latency_spread=settings.sim_latency_spread,
+            failure_rate=settings.sim_failure_rate,
+            hang_rate=settings.sim_hang_rate,
+            hang_s=settings.sim_hang_s,
+            seed=settings.sim_seed,
+        )
+
+
+def encode_array(array: np.ndarray, **metadata: Any) -> dict[str, Any]:
+    """Wrap an array in the asyncroscopy payload format."""
+    array = np.ascontiguousarray(array)
+    return {
+        "payload": base64.b64encode(array.tobytes()).decode("ascii"),
+        "metadata": {"shape": list(array.shape), "dtype": str(array.dtype), **metadata},
+        "encoding": "base64",
+    }
+
+
+class SimulatedMicroscope:
+    """
+    State of a simulated STEM and the synthetic data it produces.
+
+    Images show a square atomic lattice whose brightness follows the beam current, with
+    Poisson shot noise; they are blank while the beam is blanked. Stage moves are checked
+    against the stage bounds in settings.
+    """
+
+    def __init__(self, config: Optional[SimConfig] = None):
+        self.config = config or SimConfig()
+        self._random = random.Random(self.config.seed)
+        self._rng = np.random.default_rng(self.config.seed)
+        self.beam_current_pa = 50.0
+        self.beam_position = (0.5, 0.5)
+        self.beam_blanked = False
+        self.fov_nm = 20.0
+        self.stage = {"x": settings.stage_x_min, "y": settings.stage_y_min, "z": 0.0}
+        self.calls: Counter = Counter()
+        self.failures: Counter = Counter()
+        self.started_at = time.time()
+
+    def sample_latency(self) -> float:
+        config = self.config
+        mean = max(0.0, config.latency_mean_s)
+        if mean == 0 or config.latency == "fixed":
+            return mean
+        if config.latency == "uniform":
+            return self._random.uniform(mean * (1 - config.latency_spread), mean * (1 + config.latency_spread))
+        if config.latency == "exponential":
+            return self._random.expovariate(1 / mean)
+        # Lognormal with the configured mean: mu is shifted by -sigma^2 / 2
+        sigma = config.latency_spread
+        return self._random.lognormvariate(np.log(mean) - sigma ** 2 / 2, sigma)
+
+    async def simulate_call(self, tool: str) -> None:
+        """
+        Wait like the instrument would and inject the configured faults.
+
+        Raises:
+            ToolError: If the call was chosen to fail.
+        """
+        self.calls[tool] += 1
+        delay = self.sample_latency()
+        if self.config.hang_rate and self._random.random() < self.config.hang_rate:
+            delay = self.config.hang_s
+        await asyncio.sleep(max(0.0, delay))
+        if self.config.failure_rate and self._random.random() < self.config.failure_rate:
+            self.failures[tool] += 1
+            raise ToolError(f"Simulated instrument error in {tool}.")
+
+    def image(self, size: Optional[int] = None, dwell_time_us: float = 1.0) -> np.ndarray:
+        """
+        Raises:
+            ToolError: If the size is outside 1..settings.max_image_size.
+        """
+        size = size or self.config.image_size
+        if not 0 < size <= settings.max_image_size:
+            raise ToolError(f"Image size must be between 1 and {settings.max_image_size}, got {size}.")
+        dtype = np.dtype(self.config.image_dtype)
+
+        # Atomic columns every 0.4 nm, shifted with the stage position
+        spacing = 0.4 / self.fov_nm * size
+        coords = np.arange(size, dtype=np.float32)
+        shift_x = (self.stage["x"] * 1e3 / self.fov_nm * size) % spacing
+        shift_y = (self.stage["y"] * 1e3 / self.fov_nm * size) % spacing
+        x = (coords + shift_x) * (2 * np.pi / spacing)
+        y = (coords + shift_y) * (2 * np.pi / spacing)
+        lattice = (np.cos(x)[None, :] + np.cos(y)[:, None] + 2) ** 2 / 16
+
+        counts = 0.0 if self.beam_blanked else self.beam_current_pa * dwell_time_us * 2.0
+        frame = self._rng.poisson(lattice * counts + 1.0).astype(np.float32)
+        if np.issubdtype(dtype, np.integer):
+            frame = np.clip(frame, 0, np.iinfo(dtype).max)
+        return frame.astype(dtype)
+
+    def spectrum(self, channels: int = 2048) -> np.ndarray:
+        energy = np.linspace(0, 20, channels, dtype=np.float32)
+        background = 1e3 * np.exp(-energy / 3)
+        peaks = sum(h * np.exp(-((energy - e) ** 2) / 0.005) for e, h in ((0.28, 800), (1.74, 1500), (8.05, 600)))
+        scale = 0.0 if self.beam_blanked else self.beam_current_pa / 50.0
+        return self._rng.poisson((background + peaks) * scale).astype(np.float32)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "uptime_s": time.time() - self.started_at,
+            "calls": dict(self.calls),
+            "failures": dict(self.failures),
+        }
+
+
+def create_sim_server(
+    config: Optional[SimConfig] = None, microscope: Optional[SimulatedMicroscope] = None, **server_kwargs
+) -> FastMCP:
+    """
+    Build the simulator's MCP server.
+
+    Args:
+        config: Behaviour of the instrument; defaults to the sim_* settings.
+        microscope: Simulated state to serve, e.g. to inspect it in tests.
+        server_kwargs: Passed to FastMCP, e.g. host and port.
+    """
+    scope = microscope or SimulatedMicroscope(config or SimConfig.from_settings())
+    mcp = FastMCP("asyncroscopy-sim", instructions="Simulated STEM microscope for testing.", **server_kwargs)
+
+    @mcp.tool()
+    async def set_beam_current(current_pa: float) -> str:
+        """Set the probe current in picoamperes."""
+        await scope.simulate_call("set_beam_current")
+        if not 0 < current_pa <= 1000:
+            raise ToolError(f"Beam current must be between 0 and 1000 pA, got {current_pa}.")
+        scope.beam_current_pa = current_pa
+        return f"Beam current set to {current_pa} pA."
+
+    @mcp.tool()
+    async def place_beam(x: float, y: float) -> str:
+        """Park the beam at a position given as fractions (0..1) of the field of view."""
+        await scope.simulate_call("place_beam")
+        if not (0 <= x <= 1 and 0 <= y <= 1):
+            raise ToolError(f"Beam position must be within 0..1, got ({x}, {y}).")
+        scope.beam_position = (x, y)
+        return f"Beam placed at ({x}, {y})."
+
+    @mcp.tool()
+    async def blank_beam() -> str:
+        """Blank the beam."""
+        await scope.simulate_call("blank_beam")
+        scope.beam_blanked = True
+        return "Beam blanked."
+
+    @mcp.tool()
+    async def unblank_beam() -> str:
+        """Unblank the beam."""
+        await scope.simulate_call("unblank_beam")
+        scope.beam_blanked = False
+        return "Beam unblanked."
+
+    @mcp.tool()
+    async def set_fov(fov_nm: float) -> str:
+        """Set the field of view in nanometers."""
+        await scope.simulate_call("set_fov")
+        if fov_nm <= 0:
+            raise ToolError(f"Field of view must be positive, got {fov_nm}.")
+        scope.fov_nm = fov_nm
+        return f"Field of view set to {fov_nm} nm."
+
+    @mcp.tool()
+    async def get_stage() -> dict[str, float]:
+        """Return the stage position in microns."""
+        await scope.simulate_call("get_stage")
+        return dict(scope.stage)
+
+    @mcp.tool()
+    async def move_stage(x: float, y: float, z: Optional[float] = None) -> str:
+        """Move the stage to an absolute position in microns."""
+        await scope.simulate_call("move_stage")
+        if not (settings.stage_x_min <= x <= settings.stage_x_max and settings.stage_y_min <= y <= settings.stage_y_max):
+            raise ToolError(f"Stage position ({x}, {y}) is outside the stage bounds.")
+        scope.stage.update(x=x, y=y, z=scope.stage["z"] if z is None else z)
+        return f"Stage moved to ({x}, {y}, {scope.stage['z']})."
+
+    @mcp.tool()
+    async def get_scanned_image(size: Optional[int] = None, dwell_time_us: float = 1.0) -> dict[str, Any]:
+        """
+        Acquire a HAADF image. Returns {"payload", "metadata", "encoding"} with the pixels
+        base64 encoded and their shape and dtype in the metadata.
+        """
+        await scope.simulate_call("get_scanned_image")
+        # Large frames take a while to synthesize; keep the server responsive meanwhile
+        frame = await asyncio.to_thread(scope.image, size, dwell_time_us)
+        return encode_array(
+            frame, type="image", detector="HAADF", fov_nm=scope.fov_nm,
+            beam_current_pa=scope.beam_current_pa, dwell_time_us=dwell_time_us,
+        )
+
+    @mcp.tool()
+    async def acquire_tilt_series(
+        ctx: Context,
+        start_deg: float = -60.0,
+        stop_deg: float = 60.0,
+        step_deg: float = 10.0,
+        size: Optional[int] = None,
+        dwell_time_us: float = 1.0,
+        send_frames: bool = True,
+    ) -> dict[str, Any]:
+        """
+        Acquire one HAADF image per tilt angle from `start_deg` to `stop_deg`. Progress is
+        reported after every tilt, with the frame attached as {"payload", "metadata", "encoding"}
+        unless `send_frames` is false. Returns a summary of the series.
+        """
+        if step_deg <= 0 or stop_deg < start_deg:
+            raise ToolError("The tilt range must be increasing with a positive step.")
+        angles = [float(a) for a in np.arange(start_deg, stop_deg + step_deg / 2, step_deg)]
+        means = []
+        for i, angle in enumerate(angles):
+            await scope.simulate_call("acquire_tilt_series")
+            frame = await asyncio.to_thread(scope.image, size, dwell_time_us)
+            means.append(float(frame.mean()))
+            message = f"Tilt {i + 1}/{len(angles)} at {angle:g} deg"
+            if send_frames:
+                message = json.dumps({"message": message, **encode_array(frame, type="image", tilt_deg=angle)})
+            await ctx.report_progress(i + 1, len(angles), message)
+        return {
+            "type": "tilt_series",
+            "angles_deg": angles,
+            "frame_shape": list(frame.shape),
+            "dtype": str(frame.dtype),
+            "mean_counts": means,
+        }
+
+    @mcp.tool()
+    async def get_spectrum(channels: int = 2048) -> dict[str, Any]:
+        """Acquire an EDS spectrum at the beam position, as {"payload", "metadata", "encoding"}."""
+        await scope.simulate_call("get_spectrum")
+        spectrum = await asyncio.to_thread(scope.spectrum, channels)
+        return encode_array(spectrum, type="spectrum", energy_range_kev=[0, 20], beam_position=list(scope.beam_position))
+
+    @mcp.tool()
+    async def get_status() -> dict[str, Any]:
+        """Return the instrument state and the simulator's call counters."""
+        return {
+            "beam_current_pa": scope.beam_current_pa,
+            "beam_position": list(scope.beam_position),
+            "beam_blanked": scope.beam_blanked,
+            "fov_nm": scope.fov_nm,
+            "stage": dict(scope.stage),
+            **scope.stats(),
+        }
+
+    mcp.microscope = scope
+    return mcp
+
+
+def sim_server_parameters() -> StdioServerParameters:
+    """Parameters that start the simulator as a stdio subprocess of this interpreter."""
+    src = str(Path(__file__).resolve().parents[2])
+    env = {k: v for k, v in os.environ.items() if k.startswith("MICROSCOPE_")}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src, os.environ.get("PYTHONPATH")]))
+    return StdioServerParameters(command=sys.executable, args=["-m", "atomonous.sim"], env=env)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    defaults = SimConfig.from_settings()
+    parser = argparse.ArgumentParser(description="Run the simulated microscope MCP server.")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--image-size", type=int, default=defaults.image_size)
+    parser.add_argument("--image-dtype", default=defaults.image_dtype)
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default=defaults.latency)
+    parser.add_argument("--latency-mean", type=float, default=defaults.latency_mean_s)
+    parser.add_argument("--latency-spread", type=float, default=defaults.latency_spread)
+    parser.add_argument("--failure-rate", type=float, default=defaults.failure_rate)
+    parser.add_argument("--hang-rate", type=float, default=defaults.hang_rate)
+    parser.add_argument("--hang-s", type=float, default=defaults.hang_s)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args(argv)
+
+    config = SimConfig(
+        image_size=args.image_size,
+        image_dtype=args.image_dtype,
+        latency=args.latency,
+        latency_mean_s=args.latency_mean,
+        latency_spread=args.latency_spread,
+        failure_rate=args.failure_rate,
+        hang_rate=args.hang_rate,
+        hang_s=args.hang_s,
+        seed=args.seed,
+    )
+    create_sim_server(config, host=args.host, port=args.port).run(transport=args.transport)
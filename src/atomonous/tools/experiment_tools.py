@@ -4,6 +4,7 @@ from typing import Optional
 from smolagents import Tool
 
 from atomonous.config import settings
+from atomonous.utils.memory import resolve_artifact_path
 
 
 class ExperimentSearchTool(Tool):
@@ -142,13 +143,10 @@ class ExperimentArtifactReadTool(Tool):
         if limit <= 0:
             return "max_chars must be greater than zero."
 
-        raw_path = Path(str(artifact_path)).expanduser()
-        resolved_path = raw_path.resolve() if raw_path.is_absolute() else (base_dir / raw_path).resolve()
-
         try:
-            resolved_path.relative_to(base_dir)
-        except ValueError:
-            return "artifact_path must be within the artifacts directory."
+            resolved_path = resolve_artifact_path(base_dir, artifact_path)
+        except ValueError as e:
+            return str(e)
 
         if not resolved_path.exists() or not resolved_path.is_file():
             return f"Artifact file not found: {resolved_path}"
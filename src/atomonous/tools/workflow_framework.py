@@ -1,5 +1,6 @@
 import abc
-from typing import Dict, Any, List, Optional
+import threading
+from typing import Callable, Dict, Any, List, Optional
 from pydantic import BaseModel, Field
 
 class WorkflowState(BaseModel):
@@ -76,11 +77,27 @@ class WorkflowExecutor:
 
         return sorted_nodes
 
-    def run(self, initial_state: Optional[WorkflowState] = None, context: Optional[dict] = None) -> WorkflowState:
+    def run(
+        self,
+        initial_state: Optional[WorkflowState] = None,
+        context: Optional[dict] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        stop: Optional[threading.Event] = None,
+    ) -> WorkflowState:
+        """
+        Run all nodes in topological order.
+
+        Args:
+            initial_state: State to start from. A fresh WorkflowState by default.
+            context: Passed to every node, e.g. {"agent": agent}.
+            progress: Called with a dict before and after each node ("node_started"/"node_finished").
+            stop: If set, the workflow stops before the next node.
+        """
         state = initial_state or WorkflowState()
         state.history.append(f"Starting workflow: {self.template.name}")
         
         context = context or {}
+        report = progress or (lambda event: None)
 
         try:
             sorted_node_configs = self._topological_sort()
@@ -88,11 +105,16 @@ class WorkflowExecutor:
             state.errors.append(f"Failed to compile workflow: {str(e)}")
             return state
 
-        for config in sorted_node_configs:
+        total = len(sorted_node_configs)
+        for index, config in enumerate(sorted_node_configs):
             node_id = config.get("id")
             node_type = config.get("type")
             node_params = config.get("params", {})
 
+            if stop is not None and stop.is_set():
+                state.errors.append(f"Workflow cancelled before node '{node_id}'.")
+                break
+
             if node_type not in self.node_registry:
                 state.errors.append(f"Node execution failed: Unknown node type '{node_type}' for node '{node_id}'.")
                 break
@@ -104,9 +126,11 @@ class WorkflowExecutor:
                 
                 print(f"\\n--- Executing Node: {node_id} ({node_type}) ---")
                 state.history.append(f"Executing node '{node_id}' of type '{node_type}'...")
+                report({"type": "node_started", "node": node_id, "node_type": node_type, "index": index, "total": total})
                 
                 # Execute the node
                 state = node_instance.execute(state, context=context)
+                report({"type": "node_finished", "node": node_id, "index": index, "total": total, "errors": len(state.errors)})
                 
                 # Check if node deliberately raised error in state
                 if state.errors and state.errors[-1].startswith("FATAL"):
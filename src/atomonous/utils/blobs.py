@@ -0,0 +1,243 @@
+"""
+Streaming decode of MCP resource contents to files.
+
+A resource arrives as one protocol message holding base64 text, either as a binary blob or
+as the `{"payload", "metadata", "encoding"}` JSON the asyncroscopy server sends. Decoding it
+with `base64.b64decode` would hold the encoded and decoded copies at once. Here the text is
+decoded in slices straight into a file, hashing as it goes, so the decoded data never sits
+in memory. Arrays with a known dtype and shape are written as .npy files that can be
+memory-mapped and passed to the ConverterFactory file converters.
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import re
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import numpy as np
+
+# Encoded characters decoded per slice; a multiple of 4 keeps slices aligned to base64 quanta
+DEFAULT_CHUNK_CHARS = 4 * 1024 * 1024
+
+_EXTENSIONS = {
+    "application/x-npy": ".npy",
+    "application/x-hdf5": ".h5",
+    "application/json": ".json",
+    "image/tiff": ".tif",
+    "text/csv": ".csv",
+    "text/plain": ".txt",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def iter_b64decode(text: str, chunk_chars: int = DEFAULT_CHUNK_CHARS) -> Iterator[bytes]:
+    """
+    Decode base64 text slice by slice.
+
+    Raises:
+        ValueError: If the text is not valid base64.
+    """
+    chunk_chars = max(4, chunk_chars - chunk_chars % 4)
+    carry = ""
+    for start in range(0, len(text), chunk_chars):
+        piece = carry + _WHITESPACE.sub("", text[start:start + chunk_chars])
+        cut = len(piece) - len(piece) % 4
+        carry = piece[cut:]
+        if cut:
+            try:
+                yield base64.b64decode(piece[:cut], validate=True)
+            except binascii.Error as e:
+                raise ValueError(f"Invalid base64 data: {e}")
+    if carry:
+        raise ValueError("Invalid base64 data: length is not a multiple of 4.")
+
+
+def _iter_text(text: str, chunk_chars: int) -> Iterator[bytes]:
+    for start in range(0, len(text), chunk_chars):
+        yield text[start:start + chunk_chars].encode("utf-8")
+
+
+@dataclass
+class ResourceFile:
+    """A resource content written to disk."""
+
+    uri: str
+    path: Path
+    size: int
+    sha256: str
+    mime_type: Optional[str] = None
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+    def as_array(self, dtype: Optional[str] = None, shape: Optional[tuple[int, ...]] = None) -> np.ndarray:
+        """
+        Memory-map the file as an array. .npy files carry their own dtype and shape; for raw
+        files they come from the arguments or the resource metadata.
+
+        Raises:
+            ValueError: If a raw file has no dtype.
+        """
+        if self.path.suffix == ".npy":
+            return np.load(self.path, mmap_mode="r")
+        dtype = dtype or self.metadata.get("dtype")
+        if dtype is None:
+            raise ValueError(f"No dtype known for {self.path.name}.")
+        shape = shape or self.metadata.get("shape")
+        return np.memmap(self.path, dtype=dtype, mode="r", shape=tuple(shape) if shape else None)
+
+    def info(self) -> dict[str, Any]:
+        return {
+            "uri": self.uri,
+            "path": str(self.path),
+            "size": self.size,
+            "sha256": self.sha256,
+            "mime_type": self.mime_type,
+            "metadata": self.metadata,
+        }
+
+
+def _extension(mime_type: Optional[str], uri: str, fallback: str) -> str:
+    if mime_type in _EXTENSIONS:
+        return _EXTENSIONS[mime_type]
+    guessed = mimetypes.guess_extension(mime_type) if mime_type else None
+    if guessed:
+        return guessed
+    suffix = Path(uri.split("?")[0]).suffix
+    return suffix if 1 < len(suffix) <= 6 else fallback
+
+
+def _safe_name(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in name)[:60]
+
+
+def _stem(uri: str) -> str:
+    return _safe_name(Path(uri.split("?")[0].rstrip("/")).stem or "resource")
+
+
+def _safe_suffix(suffix: str, fallback: str) -> str:
+    """File suffixes come from the server; keep only alphanumerics, e.g. '.tiff'."""
+    cleaned = "".join(c for c in suffix.lower() if c.isalnum())[:10]
+    return "." + cleaned if cleaned else fallback
+
+
+def _parse_payload_json(text: str) -> Optional[dict]:
+    """The asyncroscopy `{"payload", "metadata", "encoding"}` JSON, or None for other text."""
+    if not text.lstrip().startswith("{") or '"payload"' not in text:
+        return None
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or "payload" not in data:
+        return None
+    metadata = data.get("metadata") or {}
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            metadata = {"raw": metadata}
+    data["metadata"] = metadata
+    return data
+
+
+def write_chunks(chunks: Iterator[bytes], path: Path, header: bytes = b"") -> tuple[int, str]:
+    """
+    Write chunks to `path` through a temporary file, so readers never see a partial file.
+
+    Returns:
+        Number of bytes written after the header, and their SHA-256.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return size, digest.hexdigest()
+
+
+def _npy_header(dtype: np.dtype, shape: tuple[int, ...]) -> bytes:
+    buffer = io.BytesIO()
+    header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": shape}
+    np.lib.format.write_array_header_1_0(buffer, header)
+    return buffer.getvalue()
+
+
+def save_content(content: Any, dest_dir: Path, name: Optional[str] = None, chunk_chars: int = DEFAULT_CHUNK_CHARS) -> ResourceFile:
+    """
+    Write one TextResourceContents or BlobResourceContents to `dest_dir`. The file name is
+    sanitized, so neither `name` nor the server's metadata can place it elsewhere.
+
+    Raises:
+        ValueError: If base64 data is invalid or an array payload does not match its shape.
+    """
+    uri = str(content.uri)
+    mime_type = getattr(content, "mimeType", None)
+    stem = _safe_name(name) if name else _stem(uri)
+    metadata: dict[str, Any] = {}
+    header = b""
+    expected = None
+
+    blob = getattr(content, "blob", None)
+    if blob is not None:
+        chunks = iter_b64decode(blob, chunk_chars)
+        suffix = _extension(mime_type, uri, ".bin")
+    else:
+        text = content.text
+        payload = _parse_payload_json(text)
+        if payload is None:
+            chunks = _iter_text(text, chunk_chars)
+            suffix = _extension(mime_type, uri, ".txt")
+        else:
+            metadata = payload["metadata"]
+            data = payload["payload"] or ""
+            encoded = payload.get("encoding", "base64") == "base64"
+            chunks = iter_b64decode(data, chunk_chars) if encoded else _iter_text(data, chunk_chars)
+            if encoded and metadata.get("shape") and metadata.get("dtype"):
+                dtype, shape = np.dtype(metadata["dtype"]), tuple(int(n) for n in metadata["shape"])
+                header = _npy_header(dtype, shape)
+                expected = int(np.prod(shape)) * dtype.itemsize
+                suffix = ".npy"
+            elif metadata.get("format"):
+                suffix = _safe_suffix(str(metadata["format"]), ".bin" if encoded else ".txt")
+            else:
+                suffix = ".bin" if encoded else ".txt"
+
+    dest_dir = Path(dest_dir).resolve()
+    path = (dest_dir / f"{stem or 'resource'}{_safe_suffix(suffix, '.bin')}").resolve()
+    if path.parent != dest_dir:
+        raise ValueError(f"Resource {uri} would be written outside {dest_dir}.")
+    size, sha256 = write_chunks(chunks, path, header=header)
+    if expected is not None and size != expected:
+        path.unlink()
+        raise ValueError(f"Resource {uri} has {size} bytes, but dtype and shape need {expected}.")
+    return ResourceFile(uri=uri, path=path, size=size, sha256=sha256, mime_type=mime_type, metadata=metadata)
+
+
+def save_resource(result: Any, dest_dir: Path, name: Optional[str] = None, chunk_chars: int = DEFAULT_CHUNK_CHARS) -> list[ResourceFile]:
+    """Write every content of a ReadResourceResult to `dest_dir`; multiple contents get numbered names."""
+    contents = list(result.contents)
+    files = []
+    for index, content in enumerate(contents):
+        stem = name or _stem(str(content.uri))
+        if len(contents) > 1:
+            stem = f"{stem}_{index}"
+        files.append(save_content(content, dest_dir, stem, chunk_chars))
+    return files
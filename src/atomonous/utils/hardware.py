@@ -0,0 +1,213 @@
+"""
+Hardware detection for local model inference.
+Picks a device, dtype, quantization path and torch thread counts suited to the current machine,
+and sizes the generation budget from measured throughput rather than from the model name.
+"""
+
+import os
+import time
+import importlib.util
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import psutil
+import torch
+
+from atomonous.utils.helpers import get_total_ram_gb
+
+
+@dataclass(frozen=True)
+class HardwareProfile:
+    """
+    Inference settings derived from the host hardware.
+    """
+    device: str
+    device_map: str
+    torch_dtype: torch.dtype
+    quantization: Optional[str]
+    physical_cores: int
+    intra_op_threads: int
+    inter_op_threads: int
+    total_ram_gb: float
+    cpu_capability: str = ""
+    notes: list[str] = field(default_factory=list)
+
+    @property
+    def is_cpu(self) -> bool:
+        return self.device == "cpu"
+
+    def model_kwargs(self) -> dict[str, Any]:
+        """
+        Keyword arguments for `AutoModel.from_pretrained` matching this profile.
+        """
+        kwargs: dict[str, Any] = {
+            "low_cpu_mem_usage": True,
+            "use_cache": True,
+        }
+        if self.quantization == "bnb-4bit":
+            kwargs["load_in_4bit"] = True
+        return kwargs
+
+
+def _usable_cpu_count() -> int:
+    """Logical CPUs this process may run on (respects affinity masks and cgroup pinning)."""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except (AttributeError, OSError):
+        return max(1, os.cpu_count() or 1)
+
+
+def _physical_core_count() -> int:
+    usable = _usable_cpu_count()
+    try:
+        physical = psutil.cpu_count(logical=False) or usable
+    except Exception:
+        physical = usable
+    # Never schedule more compute threads than the process is allowed to use
+    return max(1, min(physical, usable))
+
+
+def _cpu_supports_fast_bf16() -> bool:
+    """True when the CPU has native bfloat16 matmul support (AVX512-BF16 or AMX)."""
+    for probe in ("_is_amx_tile_supported", "_is_avx512_bf16_supported"):
+        check = getattr(torch.cpu, probe, None)
+        try:
+            if check is not None and check():
+                return True
+        except Exception:
+            continue
+    return False
+
+
+def _bitsandbytes_available() -> bool:
+    return importlib.util.find_spec("bitsandbytes") is not None
+
+
+def detect_hardware_profile(quantization: str = "auto") -> HardwareProfile:
+    """
+    Inspect the host and choose device, dtype, quantization and thread counts.
+
+    Args:
+        quantization: "auto" picks bitsandbytes 4-bit on CUDA and no quantization elsewhere,
+                      "int8" requests dynamic int8 quantization of linear layers on CPU,
+                      "none" disables quantization.
+
+    Returns:
+        HardwareProfile describing how the model should be loaded.
+    """
+    notes = []
+    physical_cores = _physical_core_count()
+    cpu_capability = ""
+    try:
+        cpu_capability = torch.backends.cpu.get_cpu_capability()
+    except Exception:
+        pass
+
+    if torch.cuda.is_available():
+        device, device_map = "cuda", "auto"
+        torch_dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+    elif torch.backends.mps.is_available():
+        device, device_map = "mps", "mps"
+        torch_dtype = torch.bfloat16
+    else:
+        device, device_map = "cpu", "cpu"
+        if _cpu_supports_fast_bf16():
+            torch_dtype = torch.bfloat16
+        else:
+            # Without native bf16 support, bf16 matmuls are emulated and slower than fp32
+            torch_dtype = torch.float32
+            notes.append(f"CPU capability '{cpu_capability or 'unknown'}' lacks native bf16; using float32.")
+
+    quant: Optional[str] = None
+    if quantization == "auto":
+        if device == "cuda" and _bitsandbytes_available():
+            quant = "bnb-4bit"
+        elif device == "cuda":
+            notes.append("bitsandbytes is not installed; loading without 4-bit quantization.")
+    elif quantization == "int8":
+        if device == "cpu":
+            quant = "int8-dynamic"
+            # Dynamic int8 kernels take fp32 activations
+            torch_dtype = torch.float32
+        else:
+            notes.append(f"int8 dynamic quantization is CPU-only; ignored on '{device}'.")
+    elif quantization not in ("none", None):
+        raise ValueError(f"Unknown quantization mode '{quantization}'. Expected 'auto', 'int8' or 'none'.")
+
+    if device == "cpu":
+        intra_op_threads = physical_cores
+        # A single decode stream has little inter-op parallelism; keep the pool small
+        inter_op_threads = max(1, min(2, physical_cores // 8))
+    else:
+        intra_op_threads = torch.get_num_threads()
+        inter_op_threads = torch.get_num_interop_threads()
+
+    return HardwareProfile(
+        device=device,
+        device_map=device_map,
+        torch_dtype=torch_dtype,
+        quantization=quant,
+        physical_cores=physical_cores,
+        intra_op_threads=intra_op_threads,
+        inter_op_threads=inter_op_threads,
+        total_ram_gb=get_total_ram_gb(),
+        cpu_capability=cpu_capability,
+        notes=notes,
+    )
+
+
+def apply_thread_settings(profile: HardwareProfile) -> None:
+    """
+    Configure torch intra-op and inter-op thread pools from the profile.
+    Inter-op threads can only be set before the first parallel op runs, so failures there are ignored.
+    """
+    if not profile.is_cpu:
+        return
+    torch.set_num_threads(profile.intra_op_threads)
+    try:
+        torch.set_num_interop_threads(profile.inter_op_threads)
+    except RuntimeError:
+        pass
+
+
+def apply_quantization(hf_model: Any, profile: HardwareProfile) -> Any:
+    """
+    Apply post-load quantization that cannot be requested through `from_pretrained`.
+    Returns the (possibly replaced) model.
+    """
+    if profile.quantization != "int8-dynamic":
+        return hf_model
+    return torch.ao.quantization.quantize_dynamic(hf_model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def measure_tokens_per_second(model: Any, n_tokens: int = 32, prompt: str = "Count from one to one hundred.") -> float:
+    """
+    Time a short greedy generation and return decode throughput in tokens/s.
+
+    Args:
+        model: A smolagents Model (e.g. TransformersModel).
+        n_tokens: Number of new tokens to request.
+        prompt: User message used for the probe.
+
+    Returns:
+        Generated tokens per second, or 0.0 if nothing was generated.
+    """
+    messages = [{"role": "user", "content": [{"type": "text", "text": prompt}]}]
+    start = time.perf_counter()
+    response = model.generate(messages, max_new_tokens=n_tokens, do_sample=False)
+    elapsed = time.perf_counter() - start
+
+    generated = response.token_usage.output_tokens if response.token_usage else 0
+    if generated <= 0 or elapsed <= 0:
+        return 0.0
+    return generated / elapsed
+
+
+def scale_max_new_tokens(tokens_per_second: float, time_budget_s: float, floor: int = 256, ceiling: int = 2048) -> int:
+    """
+    Largest `max_new_tokens` that fits the per-step time budget at the measured throughput.
+    """
+    if tokens_per_second <= 0:
+        return floor
+    budget = int(tokens_per_second * time_budget_s)
+    return max(floor, min(ceiling, budget))
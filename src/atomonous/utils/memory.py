@@ -11,6 +11,32 @@ from datetime import datetime
 from typing import Optional, Dict, List, Any
 from PIL import Image
 
+
+def resolve_artifact_path(base_dir: Path, artifact_path: str) -> Path:
+    """
+    Resolve a path inside the artifacts directory. Relative paths are taken from `base_dir`;
+    symlinks and '..' are resolved before the containment check.
+
+    Args:
+        base_dir: The artifacts directory.
+        artifact_path: Relative or absolute path of the artifact.
+
+    Returns:
+        The resolved absolute path (it may not exist).
+
+    Raises:
+        ValueError: If the path is outside the artifacts directory.
+    """
+    base_dir = Path(base_dir).expanduser().resolve()
+    raw_path = Path(str(artifact_path)).expanduser()
+    resolved_path = raw_path.resolve() if raw_path.is_absolute() else (base_dir / raw_path).resolve()
+    try:
+        resolved_path.relative_to(base_dir)
+    except ValueError:
+        raise ValueError("artifact_path must be within the artifacts directory.")
+    return resolved_path
+
+
 class SessionMemory:
     """
     Manages a dated session folder for storing artifacts: workflow YAML/PNG, captured NPY images, and execution steps.
@@ -106,6 +132,21 @@ class SessionMemory:
         
         print(f"[SessionMemory] Saved execution steps: {self.execution_steps_path}")
 
+    def save_usage_summary(self, usage: Dict[str, Any]) -> Path:
+        """
+        Save the session-level token and latency rollup to usage_summary.json.
+        
+        Args:
+            usage: Dictionary of aggregated model call statistics.
+        
+        Returns:
+            Path to the written JSON file.
+        """
+        usage_path = self.session_dir / "usage_summary.json"
+        with open(usage_path, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(), **usage}, f, indent=2)
+        return usage_path
+
     def save_image(self, npy_path: str, description: str = "") -> str:
         """
         Save a NumPy array (.npy) image to the session folder.
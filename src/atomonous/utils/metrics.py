@@ -0,0 +1,257 @@
+"""
+Process-wide metrics in the Prometheus text exposition format.
+
+A small dependency-free registry of counters, gauges and histograms. Recording a value is a
+dict lookup and a few additions under a lock, so collection can stay on in production; the
+text is only built when `/metrics` is scraped. Gauges for queue depths can be backed by a
+callback that is read at scrape time instead of being updated on every change.
+"""
+
+import abc
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+# Seconds; spans sub-millisecond tool calls up to multi-minute model generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+STEP_BUCKETS = (1, 2, 3, 5, 8, 13, 20, 30, 50)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric '{self.name}' expects labels {self.labelnames}, got {tuple(labels)}.")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    @abc.abstractmethod
+    def _samples(self) -> list[str]:
+        """Sample lines of the metric, without the HELP and TYPE lines."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += self._samples()
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._functions: dict[tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, fn: Callable[[], float], **labels: str) -> None:
+        """Read the gauge from `fn` at scrape time, e.g. a queue's current depth."""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = fn
+
+    def value(self, **labels: str) -> float:
+        key = self._key(labels)
+        fn = self._functions.get(key)
+        return float(fn()) if fn is not None else self._values.get(key, 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                values[key] = float(fn())
+            except Exception:
+                # A failing source must not break the whole scrape
+                values.pop(key, None)
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in values.items()]
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * n_buckets
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple[str, ...], _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets))
+            if index < len(self.buckets):
+                series.counts[index] += 1
+            series.sum += value
+            series.count += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[dict[str, str]]:
+        """
+        Observe the duration of the block. Labels can still be changed through the yielded
+        dict, e.g. to record the outcome.
+        """
+        labels = dict(labels)
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels: str) -> tuple[int, float]:
+        """Return (count, sum) for one label set."""
+        series = self._series.get(self._key(labels))
+        return (series.count, series.sum) if series else (0, 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(s.counts), s.sum, s.count) for k, s in self._series.items()]
+        lines = []
+        inf = 'le="+Inf"'
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, inf)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds metrics by name. Asking for an existing name returns the registered metric,
+    so modules can declare the metrics they record without import-order concerns.
+    """
+
+    def __init__(self, prefix: str = "atomonous_"):
+        self.prefix = prefix
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls: type, name: str, documentation: str, labelnames: tuple[str, ...], **kwargs) -> _Metric:
+        full_name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric '{full_name}' is already registered with a different type or labels.")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(self.prefix + name)
+
+    def render(self) -> str:
+        """Text exposition of all metrics (Prometheus format 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+# Global registry served by the API's /metrics endpoint
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response starts.", ("method", "route", "status")
+)
+AGENT_STEPS_PER_RUN = registry.histogram(
+    "agent_steps_per_run", "Action steps taken per agent run.", buckets=STEP_BUCKETS
+)
+AGENT_STEP_DURATION = registry.histogram("agent_step_duration_seconds", "Duration of agent action steps.")
+MODEL_CALL_LATENCY = registry.histogram(
+    "model_call_duration_seconds", "Model call latency.", ("model", "streaming")
+)
+MODEL_TTFT = registry.histogram("model_time_to_first_token_seconds", "Model time to first token.", ("model",))
+MODEL_TOKENS = registry.counter("model_tokens_total", "Tokens processed by model calls.", ("model", "kind"))
+TOOL_LATENCY = registry.histogram("tool_call_duration_seconds", "Tool call latency.", ("tool", "outcome"))
+CONVERTER_LATENCY = registry.histogram(
+    "converter_duration_seconds", "Time spent in data converters.", ("converter", "outcome")
+)
+ARTIFACT_WRITE_LATENCY = registry.histogram(
+    "artifact_write_duration_seconds", "Latency of writing session artifacts.", ("kind",)
+)
+MCP_REQUESTS_CANCELLED = registry.counter(
+    "mcp_requests_cancelled_total", "MCP requests cancelled on the server after their deadline expired or the caller gave up."
+)
+QUEUE_DEPTH = registry.gauge("queue_depth", "Items waiting in a queue.", ("queue",))
@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import pytest
+from smolagents import FinalAnswerStep
+from smolagents.models import ChatMessageStreamDelta, Model
+
+from atomonous.agent.core import Agent
+from atomonous.agent.streamed_run import RunCancelled
+from atomonous.config import settings
+
+
+class FakeModel(Model):
+    def generate_stream(self, messages, stop_sequences=None, **kwargs):
+        yield ChatMessageStreamDelta(content="")
+
+
+def _agent(tmp_path, monkeypatch, n_steps: int, step_s: float = 0.0) -> tuple[Agent, list]:
+    monkeypatch.setattr(settings, "artifacts_dir", str(tmp_path))
+    agent = Agent(model=FakeModel(model_id="fake"))
+    completed = []
+
+    def fake_run(query, stream=False):
+        # Mirrors CodeAgent.run: the interrupt switch is reset per run and checked between steps
+        agent.agent.interrupt_switch = False
+        for n in range(n_steps):
+            if agent.agent.interrupt_switch:
+                raise RuntimeError("Agent interrupted.")
+            time.sleep(step_s)
+            completed.append(n)
+            yield ChatMessageStreamDelta(content=f"step {n} ")
+        yield FinalAnswerStep(output=f"answer to {query}")
+
+    monkeypatch.setattr(agent.agent, "run", fake_run)
+    return agent, completed
+
+
+def test_achat_does_not_block_event_loop(tmp_path, monkeypatch):
+    agent, _ = _agent(tmp_path, monkeypatch, n_steps=5, step_s=0.02)
+
+    async def main():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        beat = asyncio.create_task(heartbeat())
+        answer = await agent.achat("ping")
+        beat.cancel()
+        return answer, ticks
+
+    answer, ticks = asyncio.run(main())
+    assert answer == "answer to ping"
+    assert ticks > 5
+
+
+def test_cancelling_achat_interrupts_run_between_steps(tmp_path, monkeypatch):
+    agent, completed = _agent(tmp_path, monkeypatch, n_steps=100, step_s=0.01)
+
+    async def main():
+        task = asyncio.create_task(agent.achat("long"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(main())
+    agent.current_run._thread.join(timeout=2)
+    assert agent.agent.interrupt_switch
+    assert 0 < len(completed) < 100
+
+
+def test_cancel_targets_one_run_and_is_kept_until_it_starts(tmp_path, monkeypatch):
+    agent, completed = _agent(tmp_path, monkeypatch, n_steps=3)
+
+    queued = agent.run("queued", autostart=False)
+    agent.cancel(queued)
+    with pytest.raises(RunCancelled):
+        queued.final()
+    assert completed == []
+
+    first = agent.run("first", autostart=False)
+    second = agent.run("second")
+    # Cancelling a run that is not executing leaves the running one alone
+    agent.cancel(first)
+    assert second.final().output == "answer to second"
+    assert completed == [0, 1, 2]
+
+
+def test_queued_run_does_not_replace_current_run(tmp_path, monkeypatch):
+    agent, _ = _agent(tmp_path, monkeypatch, n_steps=1)
+    running = agent.run("first")
+    # Not yet admitted, e.g. rejected by a full queue: cancelling still targets the running one
+    agent.run("second", autostart=False)
+    assert agent.current_run is running
+    assert running.final().output == "answer to first"
+
+
+def test_each_run_starts_with_fresh_step_summaries(tmp_path, monkeypatch):
+    agent, _ = _agent(tmp_path, monkeypatch, n_steps=1)
+    agent.context_manager._summaries[1] = "Step 1: ran `run_one()`"
+    agent.run("second").final()
+    assert agent.context_manager.stats()["cached_summaries"] == 0
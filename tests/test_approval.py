@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from atomonous.agent.approval import ApprovalRequest, CLIApprovalBroker, QueueApprovalBroker
+from atomonous.agent.supervised_executor import SupervisedExecutor
+from atomonous.config import settings
+
+
+def _request_in_thread(broker, request):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(broker.request(request)))
+    thread.start()
+    deadline = time.monotonic() + 5
+    while request.approval_id not in {r.approval_id for r in broker.pending()}:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return thread, results
+
+
+def test_queue_broker_resolve_and_expire():
+    broker = QueueApprovalBroker(timeout_s=5)
+    request = ApprovalRequest(tools=["blank_beam"], code="blank_beam()", owner="s1")
+    thread, results = _request_in_thread(broker, request)
+
+    broker.resolve(request.approval_id, approved=True)
+    thread.join(timeout=5)
+    assert results[0].approved
+    with pytest.raises(ValueError):
+        broker.resolve(request.approval_id, approved=False)
+    with pytest.raises(KeyError):
+        broker.resolve("unknown", approved=True)
+
+    expired = QueueApprovalBroker(timeout_s=0.05).request(ApprovalRequest(tools=["blank_beam"], code=""))
+    assert expired.status == "expired" and "not approved within" in expired.message()
+
+
+def test_resolve_many_filters_by_tool_and_cancel_by_owner():
+    broker = QueueApprovalBroker(timeout_s=5)
+    beam = ApprovalRequest(tools=["set_beam_current"], code="", owner="s1")
+    blank = ApprovalRequest(tools=["blank_beam"], code="", owner="s1")
+    other = ApprovalRequest(tools=["set_beam_current"], code="", owner="s2")
+    threads = [_request_in_thread(broker, r)[0] for r in (beam, blank, other)]
+
+    decided = broker.resolve_many(False, tool="set_beam_current", owner="s1", reason="too high")
+    assert [r.approval_id for r in decided] == [beam.approval_id]
+    assert beam.status == "denied" and "too high" in beam.message()
+
+    assert broker.cancel(owner="s1") == 1
+    assert blank.status == "cancelled"
+    assert [r.approval_id for r in broker.pending()] == [other.approval_id]
+
+    broker.resolve(other.approval_id, approved=True)
+    for thread in threads:
+        thread.join(timeout=5)
+
+
+def test_executor_asks_once_per_action(monkeypatch):
+    monkeypatch.setattr(settings, "agent_autorun", False)
+    answers = iter(["n"])
+    calls = []
+    executor = SupervisedExecutor(
+        additional_authorized_imports=[],
+        approval_broker=CLIApprovalBroker(input_fn=lambda prompt: calls.append(prompt) or next(answers)),
+    )
+    executor.send_tools({"blank_beam": lambda: "blanked", "unblank_beam": lambda: "unblanked"})
+
+    output = executor("blank_beam()\nunblank_beam()")
+
+    assert len(calls) == 1
+    assert output == "Execution aborted by user. Tool call 'blank_beam', 'unblank_beam' was not approved."
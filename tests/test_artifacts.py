@@ -0,0 +1,98 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+from atomonous.api.artifacts import parse_range, RangeNotSatisfiable
+from atomonous.config import settings
+
+
+@pytest.fixture
+def artifacts_dir(tmp_path, monkeypatch):
+    base = tmp_path / "artifacts"
+    session = base / "2026-01-01_00-00-00_scan"
+    session.mkdir(parents=True)
+    (session / "step_1.json").write_text('{"step_number": 1}')
+    np.save(session / "frame.npy", np.arange(64 * 48, dtype=np.float32).reshape(64, 48))
+    (tmp_path / "secret.txt").write_text("outside")
+    monkeypatch.setattr(settings, "artifacts_dir", str(base))
+    monkeypatch.setattr(settings, "api_thumbnail_cache_dir", str(tmp_path / "thumbs"))
+    return base
+
+
+def _requests(*calls):
+    from atomonous.api.server import app
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get(url, headers=headers or {}) for url, headers in calls]
+
+    return asyncio.run(main())
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=100-", 100)
+
+
+def test_list_download_revalidate_and_range(artifacts_dir):
+    session = "2026-01-01_00-00-00_scan"
+    frame = (artifacts_dir / session / "frame.npy").read_bytes()
+
+    sessions, files, full = _requests(
+        ("/artifacts", None),
+        (f"/artifacts/{session}", None),
+        (f"/artifacts/{session}/files/frame.npy", None),
+    )
+    assert sessions.json()[0]["name"] == session and sessions.json()[0]["files"] == 2
+    assert {f["path"] for f in files.json()} == {"frame.npy", "step_1.json"}
+    assert full.status_code == 200 and full.content == frame
+    assert full.headers["accept-ranges"] == "bytes"
+
+    etag = full.headers["etag"]
+    url = f"/artifacts/{session}/files/frame.npy"
+    cached, partial, tail, stale_if_range, beyond = _requests(
+        (url, {"If-None-Match": etag}),
+        (url, {"Range": "bytes=10-19"}),
+        (url, {"Range": "bytes=-8"}),
+        (url, {"Range": "bytes=10-19", "If-Range": '"stale"'}),
+        (url, {"Range": f"bytes={len(frame)}-"}),
+    )
+    assert cached.status_code == 304 and not cached.content
+    assert partial.status_code == 206 and partial.content == frame[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{len(frame)}"
+    assert tail.content == frame[-8:]
+    assert stale_if_range.status_code == 200 and stale_if_range.content == frame
+    assert beyond.status_code == 416
+
+
+def test_paths_outside_artifacts_rejected(artifacts_dir):
+    (artifacts_dir / "2026-01-02_00-00-00_other").mkdir()
+    (artifacts_dir / "2026-01-02_00-00-00_other" / "notes.json").write_text("{}")
+    escaped, other_session, missing = _requests(
+        ("/artifacts/2026-01-01_00-00-00_scan/files/..%2F..%2Fsecret.txt", None),
+        ("/artifacts/2026-01-01_00-00-00_scan/files/..%2F2026-01-02_00-00-00_other%2Fnotes.json", None),
+        ("/artifacts/2026-01-01_00-00-00_scan/files/nope.npy", None),
+    )
+    assert escaped.status_code == 403 and other_session.status_code == 403
+    assert missing.status_code == 404
+
+
+def test_thumbnail_rendered_once_and_cached(artifacts_dir, tmp_path):
+    url = "/artifacts/2026-01-01_00-00-00_scan/thumbnails/frame.npy?size=32"
+    first, second, unsupported = _requests(
+        (url, None),
+        (url, None),
+        ("/artifacts/2026-01-01_00-00-00_scan/thumbnails/step_1.json", None),
+    )
+    assert first.status_code == 200 and first.headers["content-type"] == "image/png"
+    assert first.content.startswith(b"\x89PNG")
+    assert second.headers["etag"] == first.headers["etag"]
+    assert len(list((tmp_path / "thumbs").glob("*.png"))) == 1
+    assert unsupported.status_code == 415
@@ -0,0 +1,137 @@
+import threading
+
+import pytest
+import torch
+from transformers import LlamaConfig, LlamaForCausalLM
+
+from atomonous.agent.batching import BatchScheduler
+from atomonous.agent.models import LocalTransformersModel
+from atomonous.agent.telemetry import ModelCallRecorder
+
+
+class WordTokenizer:
+    pad_token_id = 0
+    eos_token_id = 1
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(f"w{i}" for i in ids)
+
+
+@pytest.fixture(scope="module")
+def tiny_model():
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=128,
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=256,
+        pad_token_id=0,
+        eos_token_id=1,
+    )
+    return LlamaForCausalLM(config).eval()
+
+
+def _prompts():
+    torch.manual_seed(1)
+    return [torch.randint(2, 128, (length,)) for length in (12, 20, 7)]
+
+
+def _submit_concurrently(scheduler, prompts, **kwargs):
+    requests = [None] * len(prompts)
+    barrier = threading.Barrier(len(prompts))
+
+    def submit(i):
+        barrier.wait()
+        requests[i] = scheduler.submit(prompts[i], generate_kwargs={"do_sample": False}, **kwargs)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(prompts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return requests
+
+
+def test_concurrent_requests_share_a_batch_and_match_solo_output(tiny_model):
+    prompts = _prompts()
+    solo = BatchScheduler(tiny_model, WordTokenizer(), max_batch_size=1, max_wait_s=0)
+    expected = [solo.submit(p, 8, generate_kwargs={"do_sample": False}).result() for p in prompts]
+    solo.close()
+
+    scheduler = BatchScheduler(tiny_model, WordTokenizer(), max_batch_size=4, max_wait_s=0.5)
+    requests = _submit_concurrently(scheduler, prompts, max_new_tokens=8)
+    results = [r.result() for r in requests]
+    scheduler.close()
+
+    assert scheduler.stats()["batches"] == 1
+    assert all(r.batch_size == 3 for r in requests)
+    assert results == expected
+
+
+def test_rows_stop_independently(tiny_model):
+    prompts = _prompts()
+    scheduler = BatchScheduler(tiny_model, WordTokenizer(), max_batch_size=4, max_wait_s=0.5)
+    reference = scheduler.submit(prompts[0], 6, generate_kwargs={"do_sample": False}).result()
+    stop = WordTokenizer().decode(reference[2:3])
+
+    first = scheduler.submit(prompts[0], 6, stop_sequences=[stop], generate_kwargs={"do_sample": False})
+    second = scheduler.submit(prompts[1], 3, generate_kwargs={"do_sample": False})
+    third = scheduler.submit(prompts[2], 10, generate_kwargs={"do_sample": False})
+    third.cancel()
+
+    assert first.result() == reference[:3]
+    assert len(second.result()) == 3
+    assert third.result() == []
+    scheduler.close()
+
+
+def test_streamed_tokens_and_caller_streamer(tiny_model):
+    class Recorder:
+        def __init__(self):
+            self.puts, self.ended = 0, False
+
+        def put(self, value):
+            self.puts += 1
+
+        def end(self):
+            self.ended = True
+
+    recorder = Recorder()
+    scheduler = BatchScheduler(tiny_model, WordTokenizer(), max_batch_size=2, max_wait_s=0)
+    request = scheduler.submit(_prompts()[0], 5, generate_kwargs={"do_sample": False}, streamer=recorder)
+
+    streamed = list(request)
+
+    assert streamed == request.tokens and len(streamed) == 5
+    # One put for the prompt, then one per token
+    assert recorder.puts == 6 and recorder.ended
+    scheduler.close()
+
+
+def test_batched_calls_are_accounted(tiny_model):
+    prompt = _prompts()[0]
+    scheduler = BatchScheduler(tiny_model, WordTokenizer(), max_batch_size=2, max_wait_s=0)
+    # Skip __init__, which would load weights from the hub
+    model = LocalTransformersModel.__new__(LocalTransformersModel)
+    model.model_id, model.tokenizer, model.batcher = "tiny", WordTokenizer(), scheduler
+    model.call_recorder = ModelCallRecorder()
+
+    def submit(messages, stop_sequences, kwargs):
+        # Stands in for the chat template; the call's streamer is passed on like in _submit
+        request = scheduler.submit(prompt, 4, stop_sequences, {"do_sample": False}, streamer=kwargs.get("streamer"))
+        return request, len(prompt)
+
+    model._submit = submit
+    messages = [{"role": "user", "content": "hi"}]
+    model.generate(messages)
+    list(model.generate_stream(messages))
+    scheduler.close()
+
+    plain, streamed = model.call_recorder.drain()
+    assert not plain.streaming and plain.prompt_tokens == len(prompt) and plain.completion_tokens == 4
+    # Timed by the batch streamer, not at the end of the call
+    assert plain.ttft_s < plain.total_s
+    assert streamed.streaming and streamed.completed and streamed.completion_tokens == 4
@@ -0,0 +1,68 @@
+import base64
+import hashlib
+import json
+
+import numpy as np
+import pytest
+from mcp import types
+
+from atomonous.data.factory import ConverterFactory
+from atomonous.utils.blobs import iter_b64decode, save_resource
+
+
+def test_sliced_decode_matches_whole_decode():
+    data = bytes(range(256)) * 41
+    encoded = base64.b64encode(data).decode()
+    wrapped = "\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76))
+
+    assert b"".join(iter_b64decode(encoded, chunk_chars=10)) == data
+    assert b"".join(iter_b64decode(wrapped, chunk_chars=64)) == data
+    with pytest.raises(ValueError):
+        list(iter_b64decode(encoded[:-1], chunk_chars=64))
+
+
+def test_array_payload_written_as_memory_mappable_npy(tmp_path):
+    frame = np.arange(64 * 32, dtype=np.uint16).reshape(64, 32)
+    raw = frame.tobytes()
+    text = json.dumps({
+        "payload": base64.b64encode(raw).decode(),
+        "metadata": json.dumps({"dtype": "uint16", "shape": [64, 32]}),
+        "encoding": "base64",
+    })
+    result = types.ReadResourceResult(contents=[
+        types.TextResourceContents(uri="scope://frames/haadf_001", text=text, mimeType="application/json"),
+    ])
+
+    [saved] = save_resource(result, tmp_path, name=None)
+
+    assert saved.path == tmp_path / "haadf_001.npy"
+    assert saved.sha256 == hashlib.sha256(raw).hexdigest() and saved.size == len(raw)
+    array = saved.as_array()
+    assert isinstance(array, np.memmap) and np.array_equal(array, frame)
+    assert ConverterFactory(register_default=True).convert(str(saved.path)).size == (32, 64)
+
+
+def test_blob_extension_and_shape_mismatch(tmp_path):
+    blob = types.BlobResourceContents(uri="scope://tables/cal.csv", blob=base64.b64encode(b"a,b\n1,2\n").decode(), mimeType="text/csv")
+    [saved] = save_resource(types.ReadResourceResult(contents=[blob]), tmp_path)
+    assert saved.path.name == "cal.csv" and saved.path.read_bytes() == b"a,b\n1,2\n"
+
+    bad = json.dumps({"payload": base64.b64encode(b"\x00" * 6).decode(), "metadata": {"dtype": "float32", "shape": [2, 2]}})
+    result = types.ReadResourceResult(contents=[types.TextResourceContents(uri="scope://frames/bad", text=bad)])
+    with pytest.raises(ValueError):
+        save_resource(result, tmp_path)
+    assert not list(tmp_path.glob("bad*"))
+
+
+def test_server_names_cannot_escape_dest_dir(tmp_path):
+    dest = tmp_path / "session"
+    dest.mkdir()
+    escaping = json.dumps({"payload": base64.b64encode(b"x").decode(), "metadata": {"format": "/../../../escaped"}})
+    result = types.ReadResourceResult(contents=[types.TextResourceContents(uri="scope://frames/f", text=escaping)])
+
+    [saved] = save_resource(result, dest)
+    [named] = save_resource(result, dest, name="../../outside")
+
+    assert saved.path.parent == dest.resolve() and saved.path.suffix == ".escaped"
+    assert named.path.parent == dest.resolve()
+    assert sorted(p.name for p in tmp_path.rglob("*") if p.is_file()) == sorted([saved.path.name, named.path.name])
@@ -0,0 +1,86 @@
+from smolagents import ActionStep, TaskStep
+from smolagents.memory import AgentMemory
+from smolagents.monitoring import Timing
+
+from atomonous.agent.context_manager import CompactedSteps, ContextWindowManager
+
+
+def _step(n: int, observation: str) -> ActionStep:
+    return ActionStep(
+        step_number=n,
+        timing=Timing(start_time=0.0),
+        model_output=f"Thought: step {n}",
+        code_action=f"result = acquire_image(frame={n})",
+        observations=observation,
+    )
+
+
+def _memory(n_steps: int, observation_chars: int) -> AgentMemory:
+    memory = AgentMemory(system_prompt="You are a microscope assistant.")
+    memory.steps.append(TaskStep(task="Acquire a tilt series."))
+    for n in range(1, n_steps + 1):
+        memory.steps.append(_step(n, f"Execution logs:\nframe {n} " + "x" * observation_chars))
+    return memory
+
+
+def test_large_observation_truncated_with_pointer(tmp_path):
+    manager = ContextWindowManager(session_dir=tmp_path, observation_max_chars=500, policy="truncate")
+    memory = _memory(1, observation_chars=5000)
+    pending = _step(2, "Execution logs:\n" + "y" * 4000 + "Last output from code snippet:\ndone")
+
+    manager.enforce(memory, pending=[pending])
+
+    assert len(memory.steps[1].observations) < 700
+    assert str(tmp_path / "step_1.json") in memory.steps[1].observations
+    assert pending.observations.endswith("done")
+    assert manager.stats()["truncated_observations"] == 2
+
+
+def test_old_steps_collapsed_into_summary_block(tmp_path):
+    manager = ContextWindowManager(
+        session_dir=tmp_path, token_budget=1000, observation_max_chars=10_000, keep_recent_steps=2
+    )
+    memory = _memory(8, observation_chars=800)
+
+    total = manager.enforce(memory, pending=[_step(9, "ok")])
+
+    assert total <= 1000
+    blocks = [s for s in memory.steps if isinstance(s, CompactedSteps)]
+    assert len(blocks) == 1
+    assert isinstance(memory.steps[0], TaskStep)
+    assert memory.steps[1] is blocks[0]
+    assert blocks[0].first_step == 1
+    assert "Step 1: ran `result = acquire_image(frame=1)`" in blocks[0].text
+    # The most recent steps survive verbatim
+    assert memory.steps[-1].step_number == 8
+
+    # A second pass merges into the same block and reuses cached summaries
+    memory.steps.append(_step(9, "z" * 3000))
+    manager.enforce(memory, pending=[_step(10, "ok")])
+    assert len([s for s in memory.steps if isinstance(s, CompactedSteps)]) == 1
+    assert manager.stats()["cached_summaries"] == manager.stats()["collapsed_steps"]
+
+
+def test_policy_off_leaves_memory_untouched(tmp_path):
+    manager = ContextWindowManager(session_dir=tmp_path, token_budget=10, observation_max_chars=10, policy="off")
+    memory = _memory(3, observation_chars=200)
+    before = [s.observations for s in memory.steps[1:]]
+
+    manager.enforce(memory)
+
+    assert [s.observations for s in memory.steps[1:]] == before
+
+
+def test_summaries_not_reused_across_runs(tmp_path):
+    manager = ContextWindowManager(session_dir=tmp_path)
+    first = _step(1, "Execution logs:\nfirst run")
+    first.code_action = "run_one()"
+    assert "run_one()" in manager.summarize_step(first)
+
+    # The next run numbers its steps from 1 again
+    manager.reset()
+    second = _step(1, "Execution logs:\nsecond run")
+    second.code_action = "second_run_different()"
+    summary = manager.summarize_step(second)
+    assert "second_run_different()" in summary and "run_one()" not in summary
+    assert manager.stats()["cached_summaries"] == 1
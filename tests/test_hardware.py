@@ -0,0 +1,47 @@
+import pytest
+import torch
+
+from atomonous.utils import hardware
+from atomonous.utils.hardware import detect_hardware_profile, scale_max_new_tokens
+
+
+@pytest.fixture
+def cpu_only(monkeypatch):
+    monkeypatch.setattr(torch.cuda, "is_available", lambda: False)
+    monkeypatch.setattr(torch.backends.mps, "is_available", lambda: False)
+    monkeypatch.setattr(hardware, "_physical_core_count", lambda: 16)
+
+
+def test_cpu_profile_without_bf16_uses_float32(cpu_only, monkeypatch):
+    monkeypatch.setattr(hardware, "_cpu_supports_fast_bf16", lambda: False)
+
+    profile = detect_hardware_profile()
+
+    assert profile.device == "cpu"
+    assert profile.device_map == "cpu"
+    assert profile.torch_dtype == torch.float32
+    assert profile.quantization is None
+    assert "load_in_4bit" not in profile.model_kwargs()
+    assert profile.intra_op_threads == 16
+    assert profile.inter_op_threads == 2
+
+
+def test_cpu_profile_int8_forces_float32(cpu_only, monkeypatch):
+    monkeypatch.setattr(hardware, "_cpu_supports_fast_bf16", lambda: True)
+
+    profile = detect_hardware_profile(quantization="int8")
+
+    assert profile.quantization == "int8-dynamic"
+    assert profile.torch_dtype == torch.float32
+
+
+def test_unknown_quantization_rejected(cpu_only):
+    with pytest.raises(ValueError):
+        detect_hardware_profile(quantization="fp4")
+
+
+def test_scale_max_new_tokens_clamps_to_budget():
+    assert scale_max_new_tokens(10.0, time_budget_s=60) == 600
+    assert scale_max_new_tokens(1.0, time_budget_s=60) == 256
+    assert scale_max_new_tokens(500.0, time_budget_s=60) == 2048
+    assert scale_max_new_tokens(0.0, time_budget_s=60) == 256
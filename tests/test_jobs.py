@@ -0,0 +1,159 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from smolagents import FinalAnswerStep
+from smolagents.models import ChatMessageStreamDelta, Model
+
+from atomonous.agent.core import Agent
+from atomonous.api import jobs as jobs_module
+from atomonous.api.jobs import JobManager
+from atomonous.api.scheduler import RunScheduler
+from atomonous.config import settings
+
+WORKFLOW = """
+name: focus-check
+nodes:
+  - {id: context, type: AIContext, params: {query: focus}}
+  - {id: quality, type: AIQuality, params: {evaluate_node: context}}
+edges:
+  - {source: context, target: quality}
+"""
+
+
+class FakeModel(Model):
+    def generate_stream(self, messages, stop_sequences=None, **kwargs):
+        yield ChatMessageStreamDelta(content="")
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "artifacts_dir", str(tmp_path))
+    return Agent(model=FakeModel(model_id="fake"))
+
+
+async def _wait_done(job, timeout: float = 5.0):
+    queue = job.subscribe()
+    events = []
+    while (event := await asyncio.wait_for(queue.get(), timeout)) is not None:
+        events.append(event)
+    return events
+
+
+def test_workflow_job_runs_detached_and_persists(agent):
+    manager = JobManager(RunScheduler(max_workers=1))
+
+    async def main():
+        job = manager.submit(agent, "s1", "workflow", workflow_yaml=WORKFLOW)
+        return job, await _wait_done(job)
+
+    job, events = asyncio.run(main())
+
+    # The AIQuality node fails because AIContext writes to state.context, not state.data
+    assert job.status == "failed"
+    assert [e["type"] for e in events if e["type"].startswith("node_")] == [
+        "node_started", "node_finished", "node_started", "node_finished",
+    ]
+    assert events[-1] == {**events[-1], "type": "status", "status": "failed"}
+
+    persisted = json.loads((job.job_dir / "job.json").read_text())
+    assert persisted["status"] == "failed"
+    assert json.loads((job.job_dir / "result.json").read_text())["result"]["history"]
+    assert len((job.job_dir / "events.jsonl").read_text().splitlines()) == len(events)
+    assert (job.job_dir / "workflow.yaml").read_text() == WORKFLOW
+    assert job.job_dir.parent.parent == agent.memory.session_dir
+
+
+def test_chat_job_records_steps_and_result(agent, monkeypatch):
+    def fake_run(query, stream=False):
+        yield ChatMessageStreamDelta(content="thinking")
+        yield FinalAnswerStep(output=f"answer to {query}")
+
+    monkeypatch.setattr(agent.agent, "run", fake_run)
+    manager = JobManager(RunScheduler(max_workers=1))
+
+    async def main():
+        job = manager.submit(agent, "s1", "chat", query="ping")
+        return job, await _wait_done(job)
+
+    job, events = asyncio.run(main())
+    assert job.status == "succeeded"
+    assert job.result == "answer to ping"
+    assert "delta" not in {e["type"] for e in events}
+    assert "final_answer" in {e["type"] for e in events}
+
+
+def test_finished_jobs_release_their_run_and_are_dropped(agent, monkeypatch):
+    def fake_run(query, stream=False):
+        yield FinalAnswerStep(output=f"answer to {query}")
+
+    monkeypatch.setattr(agent.agent, "run", fake_run)
+    manager = JobManager(RunScheduler(max_workers=1), max_finished=1)
+
+    async def main():
+        first = manager.submit(agent, "s1", "chat", query="one")
+        await _wait_done(first)
+        second = manager.submit(agent, "s1", "chat", query="two")
+        await _wait_done(second)
+        # Finished jobs are dropped once the job function returns
+        await asyncio.wait_for(second.future, 5)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first.run is None and second.run is None
+    assert [j.job_id for j in manager.list_jobs()] == [second.job_id]
+    with pytest.raises(KeyError):
+        manager.get(first.job_id)
+    # Dropped jobs stay on disk
+    assert json.loads((first.job_dir / "result.json").read_text())["result"] == "answer to one"
+
+
+def test_cancel_queued_and_running_jobs(agent, monkeypatch):
+    release = threading.Event()
+
+    class BlockingNode:
+        def __init__(self, name, **params):
+            pass
+
+        def execute(self, state, context=None):
+            release.wait(timeout=5)
+            return state
+
+    registry = {**jobs_module.get_default_registry(), "Blocking": BlockingNode}
+    monkeypatch.setattr(jobs_module, "get_default_registry", lambda: registry)
+    manager = JobManager(RunScheduler(max_workers=1))
+
+    async def main():
+        running = manager.submit(agent, "s1", "workflow", workflow_yaml=WORKFLOW.replace("AIContext", "Blocking"))
+        queued = manager.submit(agent, "s1", "workflow", workflow_yaml=WORKFLOW)
+        await asyncio.sleep(0.1)
+        manager.cancel(queued.job_id)
+        manager.cancel(running.job_id)
+        release.set()
+        await _wait_done(running)
+        return running, queued
+
+    running, queued = asyncio.run(main())
+    assert queued.status == "cancelled" and queued.started_at is None
+    assert running.status == "cancelled"
+    assert "Workflow cancelled before node 'quality'." in running.result["errors"]
+
+
+def test_invalid_workflow_rejected(agent):
+    manager = JobManager(RunScheduler(max_workers=1))
+
+    async def main():
+        with pytest.raises(ValueError):
+            manager.submit(agent, "s1", "workflow", workflow_yaml="name: [unclosed")
+        with pytest.raises(ValueError):
+            manager.submit(agent, "s1", "chat")
+        # Only workflow files in the session directory can be named
+        outside = agent.memory.session_dir.parent / "secret.yaml"
+        outside.write_text(WORKFLOW)
+        for path in (str(outside), f"../{outside.name}", "missing.yaml"):
+            with pytest.raises(ValueError):
+                manager.submit(agent, "s1", "workflow", workflow_path=path)
+
+    asyncio.run(main())
+    assert manager.list_jobs() == []
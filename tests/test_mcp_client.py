@@ -0,0 +1,247 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from mcp import types
+
+from atomonous.agent import deadlines, progress
+from atomonous.agent.deadlines import DeadlineExceeded
+from atomonous.agent.mcp_client import ExtendedMCPClient
+
+
+async def _ignore(message):
+    pass
+
+
+class FakeSession:
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.subscriptions = []
+        self.notifications = []
+        self.active = 0
+        self._request_id = 0
+        self._message_handler = _ignore
+
+    async def list_prompts(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"prompts after {self.delay}"
+
+    async def read_resource(self, uri):
+        self.calls += 1
+        return types.ReadResourceResult(contents=[types.TextResourceContents(uri=uri, text=f"table {self.calls}")])
+
+    def get_server_capabilities(self):
+        return types.ServerCapabilities(resources=types.ResourcesCapability(subscribe=True))
+
+    async def subscribe_resource(self, uri):
+        self.subscriptions.append(str(uri))
+
+    async def call_tool(self, name, arguments=None, progress_callback=None):
+        # Numbered like ClientSession.send_request, before its first await
+        self._request_id += 1
+        self.active += 1
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if progress_callback is not None:
+            await progress_callback(1, 2, "halfway")
+        return types.CallToolResult(content=[types.TextContent(type="text", text=f"{name}({arguments})")])
+
+    async def send_notification(self, notification):
+        self.notifications.append(notification.root)
+
+
+class FakeAdapter:
+    """Stands in for mcpadapt's MCPAdapt: a background loop plus connected sessions."""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.mcp_tools = [[types.Tool(name=f"tool_{i}", inputSchema={"type": "object"})] for i in range(len(sessions))]
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+@pytest.fixture
+def make_client():
+    adapters = []
+
+    def make(sessions, timeout=5.0):
+        # Skip __init__, which would connect to a real server
+        client = ExtendedMCPClient.__new__(ExtendedMCPClient)
+        client._adapter = FakeAdapter(sessions)
+        client._timeout, client._tool_timeouts, client._background = timeout, {}, set()
+        client._cache_enabled, client._caches, client._subscribed = True, {}, set()
+        client._watch_notifications()
+        adapters.append(client._adapter)
+        return client
+
+    yield make
+    for adapter in adapters:
+        adapter.close()
+
+
+def test_fan_out_takes_the_slowest_server(make_client):
+    client = make_client([FakeSession(delay=0.2) for _ in range(5)])
+
+    start = time.perf_counter()
+    results = client.call_all("list_prompts")
+    elapsed = time.perf_counter() - start
+
+    assert [r.server_index for r in results] == list(range(5))
+    assert all(r.ok for r in results)
+    assert elapsed < 0.6
+
+
+def test_fan_out_returns_partial_results(make_client):
+    client = make_client([FakeSession(), FakeSession(error=ConnectionError("down")), FakeSession(delay=5)])
+
+    with pytest.warns(UserWarning):
+        prompts = client.list_all_prompts(timeout=0.2)
+
+    assert prompts == ["prompts after 0.0", None, None]
+    with pytest.raises(AttributeError):
+        client.call_all("_send_request")
+
+
+def _notify(client, session, notification):
+    message = types.ServerNotification(notification)
+    asyncio.run_coroutine_threadsafe(session._message_handler(message), client._adapter.loop).result()
+
+
+def test_listings_cached_until_list_changed(make_client):
+    session = FakeSession()
+    client = make_client([session])
+
+    assert client.list_prompts() == client.list_prompts()
+    assert session.calls == 1
+
+    _notify(client, session, types.PromptListChangedNotification(method="notifications/prompts/list_changed"))
+    client.list_prompts()
+
+    assert session.calls == 2
+    stats = client.cache_stats()[0]
+    assert stats["by_kind"]["prompts"] == {"hits": 1, "misses": 2}
+    assert stats["invalidations"] == 1
+
+
+def test_resource_served_from_memory_until_updated(make_client):
+    session = FakeSession()
+    client = make_client([session])
+    uri = "calibration://beam_table"
+
+    first = client.read_resource(uri)
+    assert client.read_resource(uri) is first
+    assert session.subscriptions == [uri]
+
+    _notify(client, session, types.ResourceUpdatedNotification(
+        method="notifications/resources/updated", params=types.ResourceUpdatedNotificationParams(uri=uri),
+    ))
+
+    assert client.read_resource(uri).contents[0].text == "table 2"
+    assert session.subscriptions == [uri]
+
+
+def test_async_api_awaits_from_another_loop(make_client):
+    client = make_client([FakeSession(delay=0.2), FakeSession(delay=0.2)])
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        results = await asyncio.gather(client.acall_tool("tool_0", {"x": 1}), client.acall_tool("tool_1"))
+        elapsed = time.perf_counter() - start
+        task.cancel()
+        return results, elapsed, ticks
+
+    results, elapsed, ticks = asyncio.run(main())
+
+    assert [r.content[0].text for r in results] == ["tool_0({'x': 1})", "tool_1(None)"]
+    assert elapsed < 0.35
+    # The caller's loop kept running while the calls were in flight
+    assert ticks >= 5
+    with pytest.raises(KeyError):
+        client.call_tool("unknown")
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_expired_call_cancelled_on_loop_and_server(make_client):
+    session = FakeSession(delay=5)
+    client = make_client([session])
+
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        client.call_tool("tool_0", timeout=0.2)
+    assert time.perf_counter() - start < 1.0
+
+    # Nothing is left running on the adapter loop, and the server was told
+    _wait_for(lambda: session.notifications)
+    assert session.active == 0
+    cancelled = session.notifications[0]
+    assert cancelled.method == "notifications/cancelled" and cancelled.params.requestId == 0
+
+    # Later calls are not held up
+    session.delay = 0
+    assert client.call_tool("tool_0").content[0].text == "tool_0(None)"
+
+
+def test_tool_timeouts_and_step_budget(make_client):
+    session = FakeSession(delay=5)
+    client = make_client([session], timeout=10)
+    client._tool_timeouts = {"tool_*": 0.2}
+    assert client.tool_timeout("tool_0") == 0.2 and client.tool_timeout("other") == 10
+
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        client.call_tool("tool_0")
+    assert time.perf_counter() - start < 1.0
+
+    client._tool_timeouts = {}
+    start = time.perf_counter()
+    with deadlines.budget(0.3), pytest.raises(DeadlineExceeded):
+        client.call_tool("tool_0")
+    assert time.perf_counter() - start < 1.0
+
+    # An exhausted budget fails before anything is sent
+    with deadlines.budget(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            client.call_tool("tool_0")
+    assert session._request_id == 2
+
+
+def test_tool_progress_reaches_the_callers_sink(make_client):
+    client = make_client([FakeSession()])
+    events = []
+
+    with progress.reporting(events.append):
+        client.call_tool("tool_0")
+    # Without a sink no progress is requested
+    client.call_tool("tool_0")
+
+    assert [(e.tool, e.fraction, e.message) for e in events] == [("tool_0", 0.5, "halfway")]
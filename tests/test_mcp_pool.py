@@ -0,0 +1,225 @@
+import json
+import time
+
+import pytest
+from mcp import StdioServerParameters, types
+from smolagents import Tool
+
+from atomonous.agent.mcp_client import ServerResult
+from atomonous.agent.mcp_pool import MCPConnectionPool, server_label
+from atomonous.agent.mcp_recorder import MCPCallRecorder
+from atomonous.agent.mcp_schema_cache import CachedMCPTool, ToolSchemaCache
+
+
+class PlaceBeamTool(Tool):
+    name = "place_beam"
+    description = "Place the beam."
+    inputs = {"x": {"type": "number", "description": "Position."}}
+    output_type = "string"
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+    def forward(self, x):
+        if not self.client.alive:
+            raise ConnectionError("transport closed")
+        return f"place_beam {x} on client {self.client.number}"
+
+
+class AcquireImageTool(PlaceBeamTool):
+    name = "acquire_image"
+    description = "Acquire an image."
+
+
+class AdaptedPlaceBeamTool(PlaceBeamTool):
+    def __init__(self, call):
+        Tool.__init__(self)
+        self.call = call
+
+    def forward(self, x):
+        return self.call(0, self.name, {"x": x}).content[0].text
+
+
+class FakeClient:
+    def __init__(self, number, server_parameters, adapter_kwargs=None, structured_output=False, timeout=30, tool_classes=(PlaceBeamTool,)):
+        self.number = number
+        self.tool_classes = tool_classes
+        self.server_parameters = server_parameters
+        self.alive = True
+        self.disconnected = False
+
+    @property
+    def is_alive(self):
+        return self.alive
+
+    def get_tools(self):
+        return [cls(self) for cls in self.tool_classes]
+
+    def tool_definitions(self):
+        return [(0, types.Tool(name=cls.name, inputSchema={"type": "object", "properties": cls.inputs})) for cls in self.tool_classes]
+
+    def call_tool(self, name, arguments, server_index=None):
+        if not self.alive:
+            raise ConnectionError("transport closed")
+        return types.CallToolResult(content=[types.TextContent(type="text", text=f"{name} {arguments['x']} on client {self.number}")])
+
+    def adapt_tools(self, call):
+        return [AdaptedPlaceBeamTool(call)]
+
+    def call_all(self, method, timeout=None):
+        return [ServerResult(0, result=None) if self.alive else ServerResult(0, error=ConnectionError("down"))]
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+class Connector:
+    def __init__(self):
+        self.clients = []
+        self.failures_left = 0
+        self.delay = 0.0
+        self.tool_classes = (PlaceBeamTool,)
+
+    def __call__(self, **kwargs):
+        time.sleep(self.delay)
+        if self.failures_left:
+            self.failures_left -= 1
+            raise ConnectionError("refused")
+        self.clients.append(FakeClient(len(self.clients), tool_classes=self.tool_classes, **kwargs))
+        return self.clients[-1]
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = MCPConnectionPool(
+        connect_fn=Connector(), health_interval_s=0.05, backoff_base_s=0.01, backoff_max_s=0.05, reconnect_wait_s=5.0,
+        schema_cache=ToolSchemaCache(tmp_path),
+    )
+    yield pool
+    pool.shutdown()
+
+
+def test_equivalent_parameters_share_one_refcounted_connection(pool):
+    first = pool.acquire({"url": "http://scope/mcp"})
+    second = pool.acquire({"transport": "streamable-http", "url": "http://scope/mcp"})
+
+    assert len(pool.connect_fn.clients) == 1
+    assert pool.health()[0]["refcount"] == 2
+
+    first.disconnect()
+    first.disconnect()
+    assert pool.health()[0]["refcount"] == 1
+    second.disconnect()
+
+    assert pool.health() == []
+    _wait_for(lambda: pool.connect_fn.clients[0].disconnected)
+
+
+def test_dropped_connection_restored_with_backoff(pool):
+    handle = pool.acquire({"url": "http://scope/mcp"})
+    tool = handle.get_tools()[0]
+    assert tool(x=1) == "place_beam 1 on client 0"
+
+    pool.connect_fn.failures_left = 2
+    pool.connect_fn.clients[0].alive = False
+
+    # The tool object survives the reconnect and routes to the new session
+    _wait_for(lambda: pool.health()[0]["reconnects"] == 1)
+    assert tool(x=2) == "place_beam 2 on client 1"
+    assert len(pool.connect_fn.clients) == 2
+
+    health = handle.health()
+    assert health["state"] == "healthy" and health["consecutive_failures"] == 0
+    assert "refused" in health["last_error"]
+    handle.disconnect()
+
+
+def test_first_connect_failure_raises(pool):
+    pool.connect_fn.failures_left = 1
+    with pytest.raises(ConnectionError):
+        pool.acquire({"url": "http://scope/mcp"})
+    assert pool.health() == []
+
+
+def test_cached_schemas_returned_before_connecting(pool):
+    pool.acquire({"url": "http://scope/mcp"}).disconnect()
+
+    pool.connect_fn.delay = 0.5
+    start = time.perf_counter()
+    handle = pool.acquire({"url": "http://scope/mcp"})
+    tool = handle.get_tools()[0]
+    assert time.perf_counter() - start < 0.2
+    assert isinstance(tool, CachedMCPTool) and tool.inputs == PlaceBeamTool.inputs
+
+    # The call waits for the background connect
+    assert tool(x=3) == "place_beam 3 on client 1"
+    assert handle.health()["state"] == "healthy"
+    handle.disconnect()
+
+
+def test_credentials_kept_out_of_schema_cache(pool, tmp_path):
+    params = {"url": "https://user:pw@scope:8443/mcp?token=query-secret", "headers": {"Authorization": "Bearer header-secret"}}
+    handle = pool.acquire(params)
+
+    assert handle.health()["server"] == "https://scope:8443/mcp"
+    cached = "".join(path.read_text() for path in tmp_path.glob("*.json"))
+    assert cached and not any(secret in cached for secret in ("pw", "query-secret", "header-secret"))
+    handle.disconnect()
+
+    stdio = StdioServerParameters(command="scope-mcp", args=["--api-key", "k1", "--token=t2", "--port", "1"], env={"KEY": "e3"})
+    assert server_label(stdio) == "scope-mcp --api-key *** --token=*** --port 1"
+
+
+def test_changed_listing_updates_listeners(pool):
+    pool.acquire({"url": "http://scope/mcp"}).disconnect()
+
+    pool.connect_fn.tool_classes = (PlaceBeamTool, AcquireImageTool)
+    pool.connect_fn.delay = 0.2
+    handle = pool.acquire({"url": "http://scope/mcp"})
+    updates = []
+    handle.on_tools_changed(updates.append)
+    assert [t.name for t in handle.get_tools()] == ["place_beam"]
+
+    _wait_for(lambda: updates)
+    assert [t.name for t in updates[0]] == ["place_beam", "acquire_image"]
+    assert updates[0][1](x=4) == "place_beam 4 on client 1"
+    # The new listing is what the next agent starts from
+    assert pool.schema_cache.load(handle._connection.key)["version"] == handle.health()["tools_version"]
+    handle.disconnect()
+
+
+def test_recording_pooled_tools_waits_for_the_connection(pool, tmp_path, monkeypatch):
+    failures = []
+    report_failure = pool.report_failure
+    monkeypatch.setattr(pool, "report_failure", lambda connection, error: (failures.append(error), report_failure(connection, error)))
+    pool.acquire({"url": "http://scope/mcp"}).disconnect()
+
+    pool.connect_fn.delay = 0.5
+    recorder = MCPCallRecorder(tmp_path / "mcp_calls.jsonl")
+    handle = pool.acquire({"url": "http://scope/mcp"})
+    start = time.perf_counter()
+    tool = recorder.tools_for(handle)[0]
+    assert time.perf_counter() - start < 0.2
+    assert not (tmp_path / "mcp_calls.jsonl").exists() or not (tmp_path / "mcp_calls.jsonl").read_text()
+
+    # The header is written once the call has connected; the call goes through the handle
+    assert tool(x=5) == "place_beam 5 on client 1"
+    pool.connect_fn.clients[1].alive = False
+    with pytest.raises(ConnectionError):
+        tool(x=6)
+    assert isinstance(failures[0], ConnectionError)
+    recorder.close()
+
+    records = [json.loads(line) for line in (tmp_path / "mcp_calls.jsonl").read_text().splitlines()]
+    assert [r["type"] for r in records] == ["tools", "call", "call"]
+    assert records[0]["tools"][0]["name"] == "place_beam"
+    assert records[2]["error"]["type"] == "ConnectionError"
+    handle.disconnect()
@@ -0,0 +1,64 @@
+import json
+import time
+
+import pytest
+from mcp import types
+
+from atomonous.agent.deadlines import DeadlineExceeded
+from atomonous.agent.mcp_recorder import MCPCallRecorder, MCPCallReplayer
+
+
+def _result(text):
+    return types.CallToolResult(content=[types.TextContent(type="text", text=text)])
+
+
+def _live_call(server_index, name, arguments):
+    if name == "set_beam_current" and arguments["current_pa"] > 1000:
+        raise DeadlineExceeded("MCP tool 'set_beam_current' did not finish within 0.1s and was cancelled.")
+    time.sleep(0.05)
+    return _result(f"{name}({arguments})")
+
+
+def _record(path):
+    recorder = MCPCallRecorder(path)
+    call = recorder.wrap(_live_call)
+    call(0, "place_beam", {"x": 0.1, "y": 0.2})
+    call(0, "place_beam", {"x": 0.3, "y": 0.4})
+    with pytest.raises(DeadlineExceeded):
+        call(0, "set_beam_current", {"current_pa": 5000})
+    recorder.close()
+
+
+def test_recording_is_compact_append_only_jsonl(tmp_path):
+    path = tmp_path / "mcp_calls.jsonl"
+    _record(path)
+    _record(path)
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["seq"] for r in records] == [1, 2, 3, 1, 2, 3]
+    assert records[0]["arguments"] == {"x": 0.1, "y": 0.2} and records[0]["latency_s"] >= 0.05
+    assert records[0]["response"]["content"][0]["text"] == "place_beam({'x': 0.1, 'y': 0.2})"
+    assert records[2]["error"]["type"] == "DeadlineExceeded"
+    assert ", " not in path.read_text().splitlines()[2]
+
+
+def test_replay_serves_matching_records_with_timing(tmp_path):
+    path = tmp_path / "mcp_calls.jsonl"
+    _record(path)
+    replayer = MCPCallReplayer(path, timing=True)
+
+    start = time.perf_counter()
+    # Matched by arguments, not only by order
+    second = replayer.call(0, "place_beam", {"y": 0.4, "x": 0.3})
+    assert time.perf_counter() - start >= 0.05
+    assert second.content[0].text == "place_beam({'x': 0.3, 'y': 0.4})"
+
+    with pytest.warns(UserWarning):
+        first = replayer.call(0, "place_beam", {"x": 9, "y": 9})
+    assert first.content[0].text == "place_beam({'x': 0.1, 'y': 0.2})"
+
+    with pytest.raises(DeadlineExceeded):
+        replayer.call(0, "set_beam_current", {"current_pa": 5000})
+    assert replayer.remaining() == 0
+    with pytest.raises(KeyError):
+        replayer.call(0, "place_beam", {"x": 0.1, "y": 0.2})
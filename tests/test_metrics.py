@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+
+from atomonous.data.factory import ConverterFactory
+from atomonous.utils import metrics
+from atomonous.utils.metrics import MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative_and_labels_escaped():
+    registry = MetricsRegistry(prefix="test_")
+    histogram = registry.histogram("latency_seconds", "Latency.", ("tool",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, tool='say "hi"')
+
+    text = registry.render()
+
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{tool="say \\"hi\\"",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{tool="say \\"hi\\"",le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{tool="say \\"hi\\"",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{tool="say \\"hi\\""} 3' in text
+    assert registry.histogram("latency_seconds", "Latency.", ("tool",)) is histogram
+
+
+def test_gauge_function_is_read_at_scrape_time():
+    registry = MetricsRegistry(prefix="test_")
+    depth = [3]
+    registry.gauge("queue_depth", "Depth.", ("queue",)).set_function(lambda: depth[0], queue="runs")
+
+    assert 'test_queue_depth{queue="runs"} 3' in registry.render()
+    depth[0] = 0
+    assert 'test_queue_depth{queue="runs"} 0' in registry.render()
+
+
+def test_converter_time_recorded_per_class():
+    before, _ = metrics.CONVERTER_LATENCY.snapshot(converter="DictConverter", outcome="ok")
+
+    ConverterFactory(register_default=True).convert({"a": 1})
+
+    after, _ = metrics.CONVERTER_LATENCY.snapshot(converter="DictConverter", outcome="ok")
+    assert after == before + 1
+
+
+def test_metrics_endpoint_serves_request_latency():
+    from atomonous.api.server import app
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get("/health")
+            return await client.get("/metrics")
+
+    response = asyncio.run(main())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/health",status="200"' in response.text
+    assert 'atomonous_queue_depth{queue="chat_runs"} 0' in response.text
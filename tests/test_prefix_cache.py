@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+import torch
+from smolagents.models import TransformersModel
+from transformers import DynamicCache, LlamaConfig, LlamaForCausalLM
+
+from atomonous.agent.models import LocalTransformersModel
+from atomonous.agent.prefix_cache import PrefixKVCache
+from atomonous.agent.telemetry import ModelCallRecorder
+
+
+@pytest.fixture(scope="module")
+def tiny_model():
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=128,
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=256,
+        pad_token_id=0,
+        eos_token_id=1,
+    )
+    return LlamaForCausalLM(config).eval()
+
+
+def _generate(model, input_ids, cache):
+    return model.generate(
+        input_ids, past_key_values=cache, max_new_tokens=6, do_sample=False, min_new_tokens=6
+    )[0, input_ids.shape[1]:]
+
+
+def test_reused_prefix_matches_full_encoding(tiny_model):
+    prefix_cache = PrefixKVCache(min_reuse_tokens=4)
+    torch.manual_seed(1)
+    first = torch.randint(2, 128, (1, 40))
+    second = torch.cat([first, torch.randint(2, 128, (1, 12))], dim=1)
+
+    cache, reused = prefix_cache.take(first)
+    assert cache is None and reused == 0
+    cache = DynamicCache()
+    _generate(tiny_model, first, cache)
+    prefix_cache.put(first, cache)
+    assert prefix_cache.cached_tokens == 40
+
+    cache, reused = prefix_cache.take(second)
+    assert reused == 40
+    cached_output = _generate(tiny_model, second, cache)
+    reference_output = _generate(tiny_model, second, DynamicCache())
+
+    assert torch.equal(cached_output, reference_output)
+    assert prefix_cache.stats()["hits"] == 1
+    assert prefix_cache.stats()["encoded_tokens"] == 40 + 12
+
+
+def test_divergent_prompt_reuses_only_shared_prefix(tiny_model):
+    prefix_cache = PrefixKVCache(min_reuse_tokens=4)
+    first = torch.arange(2, 42).unsqueeze(0)
+    cache = DynamicCache()
+    _generate(tiny_model, first, cache)
+    prefix_cache.put(first, cache)
+
+    second = first.clone()
+    second[0, 25] = 127
+    cache, reused = prefix_cache.take(second)
+
+    assert reused == 25
+    assert cache.get_seq_length() == 25
+    # The slot is handed over, not shared
+    assert prefix_cache.take(second) == (None, 0)
+
+
+def test_put_respects_token_and_byte_caps(tiny_model):
+    input_ids = torch.arange(2, 66).unsqueeze(0)
+
+    token_capped = PrefixKVCache(max_tokens=32, min_reuse_tokens=4)
+    cache = DynamicCache()
+    _generate(tiny_model, input_ids, cache)
+    token_capped.put(input_ids, cache)
+    assert token_capped.cached_tokens == 32
+
+    # 2 layers * (k + v) * 2 kv heads * 8 head dim * 4 bytes = 256 bytes per token
+    byte_capped = PrefixKVCache(max_bytes=256 * 10, min_reuse_tokens=4)
+    cache = DynamicCache()
+    _generate(tiny_model, input_ids, cache)
+    byte_capped.put(input_ids, cache)
+    assert byte_capped.cached_tokens == 10
+    assert byte_capped.stats()["cached_bytes"] <= 256 * 10
+
+
+class WordTokenizer:
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(f"w{i}" for i in ids)
+
+
+def _references(value, cls) -> bool:
+    if isinstance(value, cls):
+        return True
+    if isinstance(value, dict):
+        return any(_references(v, cls) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_references(v, cls) for v in value)
+    return False
+
+
+def test_generated_message_does_not_keep_the_kv_cache(tiny_model, monkeypatch):
+    prompt = torch.arange(2, 22).unsqueeze(0)
+    monkeypatch.setattr(
+        TransformersModel, "_prepare_completion_args",
+        lambda self, **kwargs: {"inputs": prompt, "max_new_tokens": 4, "min_new_tokens": 4, "do_sample": False},
+    )
+    # Skip __init__, which would load weights from the hub
+    model = LocalTransformersModel.__new__(LocalTransformersModel)
+    model.model_id, model.model, model.tokenizer, model.batcher = "tiny", tiny_model, WordTokenizer(), None
+    model.prefix_cache, model._pending_prefix = PrefixKVCache(min_reuse_tokens=4), threading.local()
+    model.call_recorder = ModelCallRecorder()
+
+    response = model.generate([{"role": "user", "content": "hi"}])
+
+    assert not _references(response.raw, DynamicCache)
+    assert response.raw["completion_kwargs"]["max_new_tokens"] == 4
+    # The cache went to the prefix cache instead
+    assert model.prefix_cache.cached_tokens > 0
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from atomonous.api.scheduler import QueueFullError, RunScheduler
+
+
+def _job(log: list, name: str, seconds: float = 0.02):
+    def run():
+        log.append(("start", name, threading.current_thread().name))
+        time.sleep(seconds)
+        log.append(("end", name))
+        return name
+    return run
+
+
+def test_runs_of_one_session_are_serial_and_ordered():
+    scheduler = RunScheduler(max_workers=4)
+    log = []
+
+    async def main():
+        futures = [scheduler.submit("s1", _job(log, f"r{i}")) for i in range(3)]
+        return await asyncio.gather(*futures)
+
+    assert asyncio.run(main()) == ["r0", "r1", "r2"]
+    assert [entry[:2] for entry in log] == [
+        ("start", "r0"), ("end", "r0"), ("start", "r1"), ("end", "r1"), ("start", "r2"), ("end", "r2"),
+    ]
+
+
+def test_sessions_run_concurrently_up_to_worker_limit():
+    scheduler = RunScheduler(max_workers=2)
+    log = []
+
+    async def main():
+        start = time.perf_counter()
+        await asyncio.gather(*(scheduler.submit(f"s{i}", _job(log, f"s{i}", 0.1)) for i in range(4)))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(main())
+    assert 0.2 <= elapsed < 0.35
+    assert len({entry[2] for entry in log if entry[0] == "start"}) == 2
+
+
+def test_full_queue_rejects_with_depth():
+    scheduler = RunScheduler(max_workers=1, max_queue_per_session=2, max_queued_total=3)
+
+    async def main():
+        futures = [scheduler.submit("s1", _job([], "r", 0.05)) for _ in range(3)]
+        with pytest.raises(QueueFullError) as session_full:
+            scheduler.submit("s1", _job([], "r"))
+        # The only worker is busy, so this run waits too
+        futures.append(scheduler.submit("s2", _job([], "r", 0.05)))
+        with pytest.raises(QueueFullError) as server_full:
+            scheduler.submit("s3", _job([], "r"))
+        await asyncio.gather(*futures)
+        return session_full.value, server_full.value
+
+    session_full, server_full = asyncio.run(main())
+    assert session_full.detail()["scope"] == "session"
+    assert session_full.queue_depth == 2
+    assert server_full.detail()["scope"] == "server"
+    assert server_full.queue_depth == 3
+
+
+def test_cancel_skips_queued_run_and_interrupts_active_one():
+    scheduler = RunScheduler(max_workers=1)
+    log = []
+    interrupted = threading.Event()
+
+    def long_run():
+        log.append("long")
+        interrupted.wait(timeout=2)
+        return "interrupted"
+
+    async def main():
+        active = scheduler.submit("s1", long_run, on_cancel=interrupted.set)
+        queued = scheduler.submit("s1", _job(log, "queued"))
+        await asyncio.sleep(0.05)
+        assert scheduler.queue_depth("s1") == 1
+
+        queued.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth("s1") == 0
+        active.cancel()
+        follow_up = await scheduler.submit("s1", _job(log, "next"))
+        return follow_up
+
+    assert asyncio.run(main()) == "next"
+    assert interrupted.is_set()
+    assert [entry if isinstance(entry, str) else entry[1] for entry in log] == ["long", "next", "next"]
+
+
+def test_schedulers_sharing_sessions_do_not_overlap_a_session():
+    chat = RunScheduler(max_workers=2)
+    jobs = RunScheduler(max_workers=1, share_sessions_with=chat)
+    log = []
+
+    async def main():
+        job = jobs.submit("s1", _job(log, "job", 0.1))
+        await asyncio.sleep(0.02)
+        # Another session still runs right away; the same session waits for the job
+        other = chat.submit("s2", _job(log, "other", 0.01))
+        same = chat.submit("s1", _job(log, "chat", 0.01))
+        await asyncio.gather(job, other, same)
+
+    asyncio.run(main())
+    events = [entry[:2] for entry in log]
+    assert events.index(("end", "other")) < events.index(("end", "job")) < events.index(("start", "chat"))
@@ -0,0 +1,139 @@
+import pytest
+from smolagents import Tool
+from smolagents.models import ChatMessage, ChatMessageStreamDelta, Model
+
+from atomonous.api.sessions import SessionPool
+from atomonous.config import settings
+
+
+class FakeModel(Model):
+    def generate_stream(self, messages, stop_sequences=None, **kwargs):
+        yield ChatMessageStreamDelta(content="")
+
+
+class EchoTool(Tool):
+    name = "echo"
+    description = "Echo the input."
+    inputs = {"text": {"type": "string", "description": "Text to echo."}}
+    output_type = "string"
+
+    def forward(self, text: str) -> str:
+        return text
+
+
+class FakeMCPClient:
+    def __init__(self):
+        self.tool = EchoTool()
+        self.disconnected = False
+
+    def get_tools(self):
+        return [self.tool]
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "artifacts_dir", str(tmp_path))
+    pool = SessionPool(max_sessions=3, idle_timeout_s=60)
+    pool.register_model("fake", FakeModel(model_id="fake"))
+    return pool
+
+
+def test_sessions_share_model_and_mcp_client_but_not_state(pool):
+    client = FakeMCPClient()
+    pool.add_mcp_client(client)
+
+    a = pool.create(session_name="alpha")
+    b = pool.create(session_name="beta")
+
+    assert a.agent.model is b.agent.model
+    assert a.agent.memory.session_dir != b.agent.memory.session_dir
+    assert a.agent.agent is not b.agent.agent
+    # Tools are copied so executor wrapping in one session does not leak into another
+    assert a.agent.agent.tools["echo"] is not b.agent.agent.tools["echo"]
+
+    pool.close(a.session_id)
+    assert not client.disconnected
+    assert [s["session_id"] for s in pool.list_sessions()] == [b.session_id]
+
+
+def test_unknown_model_and_duplicate_session_rejected(pool):
+    with pytest.raises(KeyError):
+        pool.create(model_id="missing")
+    pool.create(session_id="s1")
+    with pytest.raises(KeyError):
+        pool.create(session_id="s1")
+
+
+def test_lru_eviction_spares_busy_sessions(pool):
+    busy = set()
+    pool.is_busy = lambda session_id: session_id in busy
+    for name in ["s1", "s2", "s3"]:
+        pool.create(session_id=name)
+    busy.add("s1")
+    pool.get("s2")
+
+    pool.create(session_id="s4")
+
+    assert sorted(s["session_id"] for s in pool.list_sessions()) == ["s1", "s2", "s4"]
+    assert pool.stats()["evicted"] == 1
+
+
+def test_idle_and_memory_pressure_eviction(pool):
+    pool.create(session_id="old")
+    pool.create(session_id="new")
+    pool.get("old").last_used -= 120
+
+    assert pool.evict() == ["old"]
+
+    pool._available_ram_gb = lambda: 0.1
+    pool.create(session_id="newest")
+    assert [s["session_id"] for s in pool.list_sessions()] == ["newest"]
+
+
+class RecordingModel(FakeModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.prompts = []
+
+    def generate(self, messages, stop_sequences=None, **kwargs):
+        self.prompts.append(messages)
+        return ChatMessage(role="assistant", content="")
+
+
+def test_load_reports_phases_and_warms_default_session(pool, monkeypatch):
+    seen = []
+    model = RecordingModel(model_id="new")
+
+    def fake_load(model_id, progress=None):
+        progress("loading_weights")
+        seen.append(pool.model_load(model_id).info())
+        return model
+
+    monkeypatch.setattr("atomonous.api.sessions.Agent.load_model", fake_load)
+    pool.create(session_id="default")
+
+    pool.load_model("new", warmup_session_id="default", warmup_tokens=2)
+
+    assert seen[0]["state"] == "loading" and seen[0]["phase"] == "loading_weights"
+    assert pool.model_load("new").state == "ready"
+    assert pool.default_model_id == "new"
+    # The default session was rebuilt on the new model and its system prompt generated on
+    assert pool.get("default").model_id == "new"
+    assert model.prompts[0][0].role == "system"
+
+
+def test_failed_load_is_reported_and_can_be_retried(pool, monkeypatch):
+    def broken_load(model_id, progress=None):
+        raise RuntimeError("out of memory")
+
+    monkeypatch.setattr("atomonous.api.sessions.Agent.load_model", broken_load)
+    with pytest.raises(RuntimeError):
+        pool.load_model("big")
+
+    load = pool.model_load("big")
+    assert load.state == "failed" and load.error == "out of memory"
+    assert "big" not in pool.model_ids and pool.default_model_id == "fake"
+    assert pool.begin_load("big").state == "loading"
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import time
+
+from mcp.shared.memory import create_connected_server_and_client_session
+from PIL import Image
+
+from atomonous.agent import progress
+from atomonous.agent.supervised_executor import SupervisedExecutor
+from atomonous.api.streaming import to_event
+from atomonous.data.default_converters.mcp_converter import MCPJsonConverter
+from atomonous.data.factory import ConverterFactory
+from atomonous.sim import SimConfig, SimulatedMicroscope, create_sim_server
+
+
+def _call(server, calls):
+    async def main():
+        async with create_connected_server_and_client_session(server) as session:
+            return [await session.call_tool(name, arguments) for name, arguments in calls]
+
+    return asyncio.run(main())
+
+
+def test_image_payload_decodes_with_mcp_converter():
+    server = create_sim_server(SimConfig(image_size=64, image_dtype="uint16", latency="fixed", latency_mean_s=0, seed=0))
+
+    result, blanked = _call(server, [("get_scanned_image", {}), ("blank_beam", {})])
+    text = result.content[0].text
+    assert json.loads(text)["metadata"]["shape"] == [64, 64]
+
+    image = MCPJsonConverter().convert(text)
+    assert isinstance(image, Image.Image) and image.size == (64, 64)
+    assert server.microscope.beam_blanked and not blanked.isError
+
+
+def test_injected_failures_and_range_checks_are_tool_errors():
+    server = create_sim_server(SimConfig(latency="fixed", latency_mean_s=0, failure_rate=1.0))
+    failed, = _call(server, [("place_beam", {"x": 0.5, "y": 0.5})])
+    assert failed.isError and "Simulated instrument error" in failed.content[0].text
+    assert server.microscope.stats()["failures"] == {"place_beam": 1}
+
+    server = create_sim_server(SimConfig(latency="fixed", latency_mean_s=0))
+    rejected, = _call(server, [("set_beam_current", {"current_pa": 5000})])
+    assert rejected.isError and server.microscope.beam_current_pa == 50.0
+
+
+def test_latency_follows_configured_distribution():
+    scope = SimulatedMicroscope(SimConfig(latency="lognormal", latency_mean_s=0.02, latency_spread=0.5, seed=1))
+    samples = [scope.sample_latency() for _ in range(5000)]
+    assert abs(sum(samples) / len(samples) - 0.02) < 0.002
+
+    server = create_sim_server(SimConfig(latency="fixed", latency_mean_s=0.1))
+    start = time.perf_counter()
+
+    async def main():
+        async with create_connected_server_and_client_session(server) as session:
+            await asyncio.gather(*(session.call_tool("get_stage", {}) for _ in range(5)))
+
+    asyncio.run(main())
+    # Calls overlap instead of queueing behind each other
+    assert time.perf_counter() - start < 0.4
+
+
+def test_tilt_series_progress_streams_converted_frames():
+    server = create_sim_server(SimConfig(image_size=32, latency="fixed", latency_mean_s=0, seed=0))
+    executor = SupervisedExecutor(data_factory=ConverterFactory(register_default=True), additional_authorized_imports=[])
+    events = []
+
+    def slow_consumer(event):
+        time.sleep(0.1)
+        events.append(event)
+
+    executor.progress_sink = slow_consumer
+
+    async def main():
+        async with create_connected_server_and_client_session(server) as session:
+            callback = progress.callback("acquire_tilt_series", executor.progress_queue)
+            return await session.call_tool(
+                "acquire_tilt_series", {"start_deg": -20, "stop_deg": 20, "step_deg": 10}, progress_callback=callback
+            )
+
+    start = time.perf_counter()
+    result = asyncio.run(main())
+    # A slow consumer does not hold up the session
+    assert time.perf_counter() - start < 0.4
+    executor.progress_queue.join()
+
+    assert json.loads(result.content[0].text)["angles_deg"] == [-20.0, -10.0, 0.0, 10.0, 20.0]
+    assert [(e.progress, e.total) for e in events] == [(i, 5) for i in range(1, 6)]
+    # Frames are converted as they arrive; the stream only carries their description
+    assert all(e.partial == {"type": "image", "width": 32, "height": 32, "mode": "L"} for e in events)
+    assert executor.latest_partials["acquire_tilt_series"].size == (32, 32)
+    name, payload = to_event(events[0])
+    assert name == "tool_progress" and payload["message"] == "Tilt 1/5 at -20 deg"
@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from smolagents import FinalAnswerStep
+from smolagents.models import ChatMessageStreamDelta
+
+from atomonous.agent.streamed_run import StreamedRun
+
+
+def _run_factory(calls: list, n_deltas: int = 20, delay: float = 0.0):
+    def factory():
+        calls.append(1)
+        for i in range(n_deltas):
+            if delay:
+                time.sleep(delay)
+            yield ChatMessageStreamDelta(content=f"{i},")
+        yield "step"
+        yield FinalAnswerStep(output="answer")
+    return factory
+
+
+def _text(items) -> str:
+    return "".join(i.content for i in items if isinstance(i, ChatMessageStreamDelta))
+
+
+def test_subscribers_share_one_execution():
+    calls = []
+    run = StreamedRun(_run_factory(calls, delay=0.001))
+    subs = [run.subscribe() for _ in range(3)]
+    results = [None] * 3
+
+    def consume(i):
+        results[i] = list(subs[i])
+
+    threads = [threading.Thread(target=consume, args=(i,)) for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == [1]
+    assert all(r == results[0] for r in results)
+    assert run.final().output == "answer"
+
+
+def test_late_subscriber_replays_from_start():
+    calls = []
+    run = StreamedRun(_run_factory(calls))
+    assert run.final().output == "answer"
+
+    replay = list(run.stream())
+    assert _text(replay) == "".join(f"{i}," for i in range(20))
+    assert isinstance(replay[-1], FinalAnswerStep)
+    assert calls == [1]
+
+
+def test_bounded_buffer_evicts_deltas_before_steps():
+    run = StreamedRun(_run_factory([], n_deltas=50), replay_size=10)
+    run.final()
+
+    replay = list(run.stream())
+    assert len(replay) == 10
+    assert replay[-2:] == ["step", replay[-1]]
+    assert isinstance(replay[-1], FinalAnswerStep)
+
+
+def test_coalesce_and_drop_policies_for_slow_consumers():
+    run = StreamedRun(_run_factory([], n_deltas=30))
+    coalesced = run.subscribe(policy="coalesce")
+    dropped = run.subscribe(policy="drop", max_lag=5)
+    run.final()
+
+    coalesced_items = list(coalesced)
+    assert len(coalesced_items) == 3
+    assert _text(coalesced_items) == "".join(f"{i}," for i in range(30))
+
+    dropped_items = list(dropped)
+    assert dropped_items[0] == "step"
+    assert dropped.dropped == 30
+
+
+def test_block_policy_applies_backpressure():
+    produced = []
+
+    def factory():
+        for i in range(20):
+            produced.append(i)
+            yield ChatMessageStreamDelta(content=str(i))
+
+    run = StreamedRun(factory, replay_size=4)
+    sub = run.subscribe(policy="block")
+    time.sleep(0.1)
+    assert len(produced) <= 5
+
+    assert len(list(sub)) == 20
+
+
+def test_abandoned_stream_does_not_block_the_run():
+    run = StreamedRun(_run_factory([]), replay_size=4)
+    stream = run.stream()
+    next(stream)
+    # Dropped without close(): the run must not wait for it
+    del stream
+
+    finished = threading.Thread(target=run.final, daemon=True)
+    finished.start()
+    finished.join(timeout=2)
+    assert run.done and run.final().output == "answer"
+
+
+def test_errors_propagate_to_consumers():
+    def factory():
+        yield ChatMessageStreamDelta(content="partial")
+        raise RuntimeError("model failed")
+
+    run = StreamedRun(factory)
+    with pytest.raises(RuntimeError):
+        list(run.stream())
+    with pytest.raises(RuntimeError):
+        run.final()
+
+
+def test_async_subscription_bridges_events_to_event_loop():
+    run = StreamedRun(_run_factory([], delay=0.001))
+
+    async def consume():
+        items = []
+        async for item in run.asubscribe():
+            items.append(item)
+            await asyncio.sleep(0)
+        return items
+
+    items = asyncio.run(consume())
+    assert _text(items) == "".join(f"{i}," for i in range(20))
+    assert isinstance(items[-1], FinalAnswerStep)
+
+
+def test_async_subscription_propagates_errors():
+    def factory():
+        yield ChatMessageStreamDelta(content="partial")
+        raise RuntimeError("model failed")
+
+    async def consume():
+        return [item async for item in StreamedRun(factory).asubscribe()]
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(consume())
+
+
+def test_async_subscription_applies_backpressure():
+    run = StreamedRun(_run_factory([], n_deltas=50), replay_size=8)
+
+    async def consume():
+        items = []
+        async for item in run.asubscribe(queue_size=2):
+            if not items:
+                # While this consumer stalls, the run gets at most the queue, the bridge's
+                # batch and the replay buffer ahead of it
+                await asyncio.sleep(0.2)
+                assert not run.done and run._seq <= 1 + 2 + 1 + 8 + 8
+            items.append(item)
+        return items
+
+    items = asyncio.run(consume())
+    assert _text(items) == "".join(f"{i}," for i in range(50))
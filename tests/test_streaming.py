@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+from smolagents import ActionStep, FinalAnswerStep
+from smolagents.memory import ToolCall
+from smolagents.models import ChatMessageStreamDelta
+from smolagents.monitoring import Timing
+
+from atomonous.api.streaming import KEEP_ALIVE, sse_events
+
+
+async def _items(script):
+    for delay, item in script:
+        await asyncio.sleep(delay)
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def _collect(script, **kwargs) -> list[str]:
+    async def main():
+        return [message async for message in sse_events(_items(script), **kwargs)]
+    return asyncio.run(main())
+
+
+def _parse(message: str) -> tuple[str, str]:
+    lines = message.strip().splitlines()
+    return lines[0].removeprefix("event: "), "\n".join(l.removeprefix("data: ") for l in lines[1:])
+
+
+def test_deltas_batched_after_first_and_events_in_order():
+    step = ActionStep(step_number=1, timing=Timing(start_time=0.0, end_time=1.0), observations="ok")
+    script = [(0, ChatMessageStreamDelta(content=f"t{i} ")) for i in range(10)]
+    script += [
+        (0, ToolCall(name="python_interpreter", arguments="print(1)", id="call_1")),
+        (0, step),
+        (0, FinalAnswerStep(output="answer")),
+    ]
+
+    events = [_parse(m) for m in _collect(script, batch_window_s=1.0)]
+
+    assert [name for name, _ in events] == ["delta", "delta", "tool_call", "step", "final_answer", "done"]
+    assert json.loads(events[0][1])["content"] == "t0 "
+    assert json.loads(events[1][1])["content"] == "".join(f"t{i} " for i in range(1, 10))
+    assert json.loads(events[2][1])["arguments"] == "print(1)"
+    assert json.loads(events[3][1])["step_number"] == 1
+    assert json.loads(events[4][1])["output"] == "answer"
+
+
+def test_batch_flushed_by_size_and_window():
+    script = [(0, ChatMessageStreamDelta(content="x" * 10)) for _ in range(5)]
+    script += [(0.1, ChatMessageStreamDelta(content="late"))]
+
+    events = [_parse(m) for m in _collect(script, batch_window_s=0.02, batch_max_chars=20)]
+
+    contents = [json.loads(data)["content"] for name, data in events if name == "delta"]
+    assert contents == ["x" * 10, "x" * 20, "x" * 20, "late"]
+
+
+def test_heartbeat_during_silence_and_error_event():
+    script = [(0.15, ChatMessageStreamDelta(content="slow")), (0, RuntimeError("model failed"))]
+
+    messages = _collect(script, heartbeat_s=0.05)
+
+    assert messages.count(KEEP_ALIVE) >= 2
+    name, data = _parse(messages[-1])
+    assert name == "error" and "model failed" in data
@@ -0,0 +1,65 @@
+import threading
+import time
+
+from smolagents.models import ChatMessage, ChatMessageStreamDelta, MessageRole, Model
+from smolagents.monitoring import TokenUsage
+
+from atomonous.agent.telemetry import CallAccountingMixin, UsageSummary
+
+
+class SlowModel(Model):
+    def generate(self, messages, stop_sequences=None, **kwargs):
+        time.sleep(0.02)
+        return ChatMessage(role=MessageRole.ASSISTANT, content="done", token_usage=TokenUsage(100, 20))
+
+    def generate_stream(self, messages, stop_sequences=None, **kwargs):
+        time.sleep(0.02)
+        yield ChatMessageStreamDelta(content="", token_usage=None)
+        for i in range(5):
+            yield ChatMessageStreamDelta(content=f"t{i}", token_usage=TokenUsage(input_tokens=50 if i == 0 else 0, output_tokens=1))
+            time.sleep(0.01)
+
+
+class AccountedModel(CallAccountingMixin, SlowModel):
+    pass
+
+
+def test_non_streaming_call_recorded():
+    model = AccountedModel(model_id="fake")
+    model.generate([{"role": "user", "content": "hi"}])
+
+    [record] = model.call_recorder.drain()
+    assert not record.streaming
+    assert record.prompt_tokens == 100
+    assert record.completion_tokens == 20
+    assert record.ttft_s == record.total_s >= 0.02
+    assert model.call_recorder.drain() == []
+
+
+def test_streaming_call_records_ttft_and_usage():
+    model = AccountedModel(model_id="fake")
+    deltas = list(model.generate_stream([{"role": "user", "content": "hi"}]))
+
+    [record] = model.call_recorder.drain()
+    assert len(deltas) == 6
+    assert record.streaming and record.completed
+    assert record.prompt_tokens == 50
+    assert record.completion_tokens == 5
+    assert 0.02 <= record.ttft_s < record.total_s
+    assert record.decode_tokens_per_s is not None
+
+
+def test_records_are_isolated_per_thread_and_rolled_up():
+    model = AccountedModel(model_id="fake")
+    model.generate([{"role": "user", "content": "hi"}])
+    worker = threading.Thread(target=lambda: model.generate([{"role": "user", "content": "hi"}]))
+    worker.start()
+    worker.join()
+
+    records = model.call_recorder.drain()
+    assert len(records) == 1
+
+    summary = UsageSummary.from_records(records * 3).dict()
+    assert summary["calls"] == 3
+    assert summary["total_tokens"] == 360
+    assert summary["tokens_per_s"] > 0